@@ -0,0 +1,199 @@
+"""
+In-process stand-in for the Airtable, Notion and HubSpot APIs, used by the load test.
+
+install() routes every outbound httpx.AsyncClient and requests call to FakeUpstream,
+which answers with synthetic but well-formed payloads after a configurable latency.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+
+import httpx
+import requests
+from requests.adapters import BaseAdapter
+
+HUBSPOT_OBJECT_PAGE_SIZE = 100
+
+
+class FakeUpstream:
+    """Synthetic provider APIs with a fixed dataset per access token"""
+
+    def __init__(
+        self,
+        latency_ms: float = 50,
+        airtable_bases: int = 2,
+        airtable_tables_per_base: int = 3,
+        notion_pages: int = 50,
+        hubspot_objects_per_type: int = 300,
+        hubspot_search_results: int = 10,
+    ):
+        self.latency = latency_ms / 1000
+        self.airtable_bases = airtable_bases
+        self.airtable_tables_per_base = airtable_tables_per_base
+        self.notion_pages = notion_pages
+        self.hubspot_objects_per_type = hubspot_objects_per_type
+        self.hubspot_search_results = hubspot_search_results
+        self.calls = {}
+        self._calls_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._calls_lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    # Routing
+
+    def route(self, request: httpx.Request) -> httpx.Response:
+        host, path = request.url.host, request.url.path
+        if path.endswith('/oauth2/v1/token') or path in ('/v1/oauth/token', '/oauth/v1/token'):
+            self._count(f'{host} token')
+            return httpx.Response(200, json={
+                'access_token': f'token-{time.monotonic_ns()}',
+                'refresh_token': 'refresh',
+                'expires_in': 1800,
+            })
+        if host == 'api.airtable.com':
+            return self._airtable(request, path)
+        if host == 'api.notion.com' and path == '/v1/search':
+            self._count('notion search')
+            return httpx.Response(200, json={'results': [self._notion_page(i) for i in range(self.notion_pages)]})
+        if host == 'api.hubapi.com':
+            return self._hubspot(request, path)
+        return httpx.Response(404, json={'message': f'No fake route for {request.method} {request.url}'})
+
+    def _airtable(self, request, path):
+        if path == '/v0/meta/bases':
+            self._count('airtable bases')
+            return httpx.Response(200, json={'bases': [
+                {'id': f'app{i}', 'name': f'Base {i}', 'permissionLevel': 'create'} for i in range(self.airtable_bases)
+            ]})
+
+        match = re.fullmatch(r'/v0/meta/bases/([^/]+)/tables', path)
+        if match:
+            self._count('airtable tables')
+            base_id = match.group(1)
+            return httpx.Response(200, json={'tables': [
+                {
+                    'id': f'tbl{base_id}{j}',
+                    'name': f'Table {j}',
+                    'primaryFieldId': 'fldName',
+                    'fields': [{'id': 'fldName', 'name': 'Name', 'type': 'singleLineText'}],
+                }
+                for j in range(self.airtable_tables_per_base)
+            ]})
+
+        self._count('airtable records')
+        return httpx.Response(200, json={'records': [
+            {'id': f'rec{i}', 'createdTime': '2024-01-01T00:00:00.000Z', 'fields': {'Name': f'Record {i}'}} for i in range(10)
+        ]})
+
+    def _notion_page(self, i):
+        return {
+            'object': 'page',
+            'id': f'page-{i}',
+            'created_time': '2024-01-01T00:00:00.000Z',
+            'last_edited_time': '2024-02-01T00:00:00.000Z',
+            'parent': {'type': 'workspace', 'workspace': True},
+            'properties': {'title': {'title': [{'text': {'content': f'Page {i}'}}]}},
+        }
+
+    def _hubspot_object(self, object_type, i):
+        return {
+            'id': str(i),
+            'properties': {
+                'firstname': f'First{i}', 'lastname': f'Last{i}', 'email': f'user{i}@example.com',
+                'name': f'{object_type} {i}', 'dealname': f'Deal {i}', 'hs_object_id': str(i),
+            },
+            'createdAt': '2024-01-01T00:00:00.000Z',
+            'updatedAt': '2024-02-01T00:00:00.000Z',
+            'archived': False,
+        }
+
+    def _hubspot(self, request, path):
+        if path.startswith('/oauth/v1/access-tokens/'):
+            self._count('hubspot portal')
+            return httpx.Response(200, json={'hub_id': 1234})
+        if path == '/crm/v3/schemas':
+            self._count('hubspot schemas')
+            return httpx.Response(200, json={'results': []})
+        if path.startswith('/crm/v3/properties/'):
+            self._count('hubspot properties')
+            return httpx.Response(200, json={'results': [
+                {'name': name} for name in ('firstname', 'lastname', 'email', 'name', 'dealname', 'hs_object_id')
+            ]})
+
+        match = re.fullmatch(r'/crm/v3/objects/([^/]+)/search', path)
+        if match:
+            self._count('hubspot search')
+            body = json.loads(request.content or b'{}')
+            if body.get('limit') == 1:
+                return httpx.Response(200, json={'total': self.hubspot_objects_per_type, 'results': []})
+            return httpx.Response(200, json={
+                'total': self.hubspot_search_results,
+                'results': [self._hubspot_object(match.group(1), i) for i in range(self.hubspot_search_results)],
+            })
+
+        match = re.fullmatch(r'/crm/v3/objects/([^/]+)', path)
+        if match:
+            self._count('hubspot objects')
+            start = int(request.url.params.get('after') or 0)
+            end = min(start + HUBSPOT_OBJECT_PAGE_SIZE, self.hubspot_objects_per_type)
+            page = {'results': [self._hubspot_object(match.group(1), i) for i in range(start, end)]}
+            if end < self.hubspot_objects_per_type:
+                page['paging'] = {'next': {'after': str(end)}}
+            return httpx.Response(200, json=page)
+
+        return httpx.Response(404, json={'message': f'No fake route for {request.method} {request.url}'})
+
+    # Transports
+
+    async def handle_async(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.latency)
+        return self.route(request)
+
+    def handle_sync(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self.latency)
+        return self.route(request)
+
+
+class FakeRequestsAdapter(BaseAdapter):
+    """Serves requests-library calls from FakeUpstream"""
+
+    def __init__(self, upstream: FakeUpstream):
+        super().__init__()
+        self.upstream = upstream
+
+    def send(self, request, **kwargs):
+        upstream_response = self.upstream.handle_sync(
+            httpx.Request(request.method, request.url, headers=dict(request.headers), content=request.body or b'')
+        )
+        response = requests.Response()
+        response.status_code = upstream_response.status_code
+        response.headers.update(upstream_response.headers)
+        response._content = upstream_response.content
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def install(upstream: FakeUpstream):
+    """
+    Route all outbound provider traffic to upstream. Returns the real httpx.AsyncClient,
+    which callers that must reach the network (the load generator) should use instead.
+    """
+    real_async_client = httpx.AsyncClient
+    transport = httpx.MockTransport(upstream.handle_async)
+
+    class UpstreamAsyncClient(real_async_client):
+        def __init__(self, *args, **kwargs):
+            kwargs['transport'] = transport
+            super().__init__(*args, **kwargs)
+
+    httpx.AsyncClient = UpstreamAsyncClient
+    adapter = FakeRequestsAdapter(upstream)
+    requests.Session.get_adapter = lambda self, url: adapter
+    return real_async_client
@@ -0,0 +1,383 @@
+"""
+Load test and SLO gate for the backend routes.
+
+Runs main:app in a local uvicorn server with fakeredis in place of Redis and a fake
+upstream (benchmarks/fake_upstream.py) in place of Airtable, Notion and HubSpot, then
+drives each scenario with concurrent users. Reports throughput, latency percentiles,
+error rate and memory growth, and exits non-zero when an SLO or the baseline regresses.
+
+Run from the backend directory:
+    python benchmarks/load_test.py --users 20 --iterations 10
+    python benchmarks/load_test.py --save-report baseline.json
+    python benchmarks/load_test.py --baseline baseline.json --tolerance 0.25
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import os
+import resource
+import socket
+import statistics
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fake_upstream import FakeUpstream, install  # noqa: E402
+
+PROVIDERS = ('airtable', 'notion', 'hubspot')
+TYPEAHEAD_QUERIES = ('a', 'ac', 'acm', 'acme')
+
+# Per-scenario SLOs for the default 20 users x 10 iterations at 50 ms upstream latency; override with --slo-file
+DEFAULT_SLOS = {
+    'oauth': {'p99_ms': 500, 'max_error_rate': 0.0},
+    'load_airtable': {'p99_ms': 4000, 'max_error_rate': 0.0},
+    'load_notion': {'p99_ms': 2500, 'max_error_rate': 0.0},
+    'load_hubspot': {'p99_ms': 4500, 'max_error_rate': 0.0},
+    'search_hubspot': {'p99_ms': 2000, 'max_error_rate': 0.0},
+}
+# fakeredis lives in this process, so every cached crawl counts towards memory growth
+DEFAULT_MAX_MEMORY_GROWTH_MB = 400
+# Application output starting like this reports a failure (e.g. a lock fakeredis could not release)
+APP_ERROR_PREFIXES = ('Error', 'Failed', 'Timed out', 'Shared cache unavailable', 'Redis health check failed')
+APP_ERROR_SAMPLES = 5
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb() -> float:
+    """
+    Current resident set size of this process (which hosts the server) in MB
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        # Peak rather than current RSS, still catches unbounded growth; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Collects per-request latencies and failures for one scenario"""
+
+    def __init__(self):
+        self.latencies_ms = []
+        self.errors = 0
+        self.error_samples = []
+
+    async def timed(self, request):
+        started = time.perf_counter()
+        try:
+            response = await request
+            ok = response.status_code < 400
+            detail = None if ok else f'{response.status_code} {response.text[:200]}'
+        except Exception as e:
+            response = None
+            ok = False
+            detail = f'{type(e).__name__}: {e}'
+        self.latencies_ms.append((time.perf_counter() - started) * 1000)
+        if not ok:
+            self.errors += 1
+            if len(self.error_samples) < 5:
+                self.error_samples.append(detail)
+        return response if ok else None
+
+    def summary(self, elapsed, memory_growth_mb) -> dict:
+        latencies = sorted(self.latencies_ms)
+        requests_count = len(latencies)
+        return {
+            'requests': requests_count,
+            'throughput_rps': round(requests_count / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(statistics.median(latencies), 1) if latencies else 0.0,
+            'p95_ms': round(_percentile(latencies, 0.95), 1),
+            'p99_ms': round(_percentile(latencies, 0.99), 1),
+            'error_rate': round(self.errors / requests_count, 4) if requests_count else 0.0,
+            'memory_growth_mb': round(memory_growth_mb, 1),
+            'error_samples': self.error_samples,
+        }
+
+
+def _state_from_url(url):
+    return parse_qs(urlsplit(url).query)['state'][0]
+
+
+async def oauth_flow(client, recorder, user, iteration, accounts):
+    """
+    authorize -> provider redirect to oauth2callback -> credentials, rotating providers
+    """
+    provider = PROVIDERS[(user + iteration) % len(PROVIDERS)]
+    form = {'user_id': f'user-{user}-{iteration}', 'org_id': f'org-{user % 4}'}
+    response = await recorder.timed(client.post(f'/integrations/{provider}/authorize', data=form))
+    if response is None:
+        return
+    state = _state_from_url(response.json())
+    response = await recorder.timed(client.get(f'/integrations/{provider}/oauth2callback', params={'code': 'code', 'state': state}))
+    if response is None:
+        return
+    await recorder.timed(client.post(f'/integrations/{provider}/credentials', data=form))
+
+
+def _credentials(user, iteration, accounts):
+    # Distinct access tokens are distinct accounts, so they miss the shared crawl cache
+    account = f'{user}-{iteration}' if not accounts else (user * 7919 + iteration) % accounts
+    return json.dumps({'access_token': f'token-{account}'})
+
+
+def load_flow(provider):
+    async def flow(client, recorder, user, iteration, accounts):
+        await recorder.timed(client.post(f'/integrations/{provider}/load', data={
+            'credentials': _credentials(user, iteration, accounts),
+            'org_id': f'org-{user % 4}',
+            'limit': 200,
+        }))
+    return flow
+
+
+async def search_flow(client, recorder, user, iteration, accounts):
+    """
+    A type-ahead burst: one search per keystroke, fired without waiting for the previous one
+    """
+    credentials = _credentials(user, 0, accounts or 1)
+    await asyncio.gather(*[
+        recorder.timed(client.post('/integrations/hubspot/search', data={
+            'credentials': credentials, 'query': query, 'type': 'contacts', 'org_id': f'org-{user % 4}',
+        }))
+        for query in TYPEAHEAD_QUERIES
+    ])
+
+
+SCENARIOS = {
+    'oauth': oauth_flow,
+    'load_airtable': load_flow('airtable'),
+    'load_notion': load_flow('notion'),
+    'load_hubspot': load_flow('hubspot'),
+    'search_hubspot': search_flow,
+}
+
+
+class AppOutput(io.TextIOBase):
+    """
+    Stands in for stdout while the server runs: normal application output is dropped
+    (or echoed with --verbose), but error lines are counted and sampled, so a broken
+    run is reported even when the output is hidden
+    """
+
+    def __init__(self, echo=None):
+        self.echo = echo
+        self.partial = ''
+        self.error_count = 0
+        self.error_samples = []
+        self.lock = threading.Lock()
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if self.echo is not None:
+            self.echo.write(text)
+        with self.lock:
+            lines = (self.partial + text).split('\n')
+            self.partial = lines.pop()
+            for line in lines:
+                if line.startswith(APP_ERROR_PREFIXES):
+                    self.error_count += 1
+                    if len(self.error_samples) < APP_ERROR_SAMPLES:
+                        self.error_samples.append(line[:300])
+        return len(text)
+
+
+async def check_redis_stand_in(fake_redis_class):
+    """
+    The cache and checkpoint locks are released with Lua scripts, which fakeredis only runs with lupa installed
+    """
+    try:
+        await fake_redis_class().eval('return 1', 0)
+    except Exception as e:
+        sys.exit(f"fakeredis cannot run Lua scripts ({str(e)}), install it with: pip install 'fakeredis[lua]'")
+
+
+class LocalServer:
+    """main:app under uvicorn on its own thread and event loop, like a separate process would be"""
+
+    def __init__(self, port):
+        import uvicorn
+        import main
+
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(main.app, host='127.0.0.1', port=port, log_level='warning'))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.monotonic() + 30
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError('Local server did not start')
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+async def run_scenario(async_client_class, base_url, name, users, iterations, accounts) -> dict:
+    flow = SCENARIOS[name]
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=users * len(TYPEAHEAD_QUERIES))
+
+    async with async_client_class(base_url=base_url, timeout=60.0, limits=limits) as client:
+
+        async def user_session(user):
+            for iteration in range(iterations):
+                await flow(client, recorder, user, iteration, accounts)
+
+        gc.collect()
+        memory_before = rss_mb()
+        started = time.perf_counter()
+        await asyncio.gather(*[user_session(user) for user in range(users)])
+        elapsed = time.perf_counter() - started
+        gc.collect()
+
+    return recorder.summary(elapsed, rss_mb() - memory_before)
+
+
+def check_slos(report: dict, slos: dict, max_memory_growth_mb: float) -> list:
+    failures = []
+    for name, result in report.items():
+        slo = slos.get(name, {})
+        if 'p99_ms' in slo and result['p99_ms'] > slo['p99_ms']:
+            failures.append(f"{name}: p99 {result['p99_ms']} ms > SLO {slo['p99_ms']} ms")
+        if 'p95_ms' in slo and result['p95_ms'] > slo['p95_ms']:
+            failures.append(f"{name}: p95 {result['p95_ms']} ms > SLO {slo['p95_ms']} ms")
+        if result['error_rate'] > slo.get('max_error_rate', 0.0):
+            failures.append(f"{name}: error rate {result['error_rate']:.2%} > SLO {slo.get('max_error_rate', 0.0):.2%}")
+        if 'min_throughput_rps' in slo and result['throughput_rps'] < slo['min_throughput_rps']:
+            failures.append(f"{name}: throughput {result['throughput_rps']} rps < SLO {slo['min_throughput_rps']} rps")
+        if result['memory_growth_mb'] > max_memory_growth_mb:
+            failures.append(f"{name}: memory grew {result['memory_growth_mb']} MB > {max_memory_growth_mb} MB")
+    return failures
+
+
+def check_baseline(report: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Compare against a previous report: latency may not grow and throughput may not drop by more than tolerance
+    """
+    failures = []
+    for name, result in report.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in ('p95_ms', 'p99_ms'):
+            if previous[metric] and result[metric] > previous[metric] * (1 + tolerance):
+                failures.append(f"{name}: {metric} regressed {previous[metric]} -> {result[metric]}")
+        if result['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            failures.append(f"{name}: throughput regressed {previous['throughput_rps']} -> {result['throughput_rps']} rps")
+    return failures
+
+
+def _print_report(report):
+    print(f"{'scenario':<16}{'requests':>10}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}{'mem MB':>9}")
+    for name, result in report.items():
+        print(
+            f"{name:<16}{result['requests']:>10}{result['throughput_rps']:>9}{result['p50_ms']:>10}"
+            f"{result['p95_ms']:>10}{result['p99_ms']:>10}{result['error_rate']:>9.2%}{result['memory_growth_mb']:>9}"
+        )
+        for sample in result['error_samples']:
+            print(f'    error: {sample}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='concurrent users per scenario')
+    parser.add_argument('--iterations', type=int, default=10, help='flows each user runs per scenario')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma separated subset of scenarios')
+    parser.add_argument('--accounts', type=int, default=0, help='distinct provider accounts to load (0: every load is a new account, so nothing is cached)')
+    parser.add_argument('--upstream-latency-ms', type=float, default=50, help='latency of every fake upstream call')
+    parser.add_argument('--slo-file', help='JSON file of per-scenario SLOs overriding the defaults')
+    parser.add_argument('--max-memory-growth-mb', type=float, default=DEFAULT_MAX_MEMORY_GROWTH_MB)
+    parser.add_argument('--baseline', help='previous --save-report output to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression against the baseline')
+    parser.add_argument('--save-report', help='write the JSON report here')
+    parser.add_argument('--verbose', action='store_true', help='show the application output')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f'unknown scenarios {unknown}, expected any of {list(SCENARIOS)}')
+
+    slos = {name: dict(slo) for name, slo in DEFAULT_SLOS.items()}
+    if args.slo_file:
+        with open(args.slo_file) as f:
+            for name, slo in json.load(f).items():
+                slos.setdefault(name, {}).update(slo)
+
+    # Redis and connectors are only touched once the server starts, so the stand-ins go in first
+    import fakeredis.aioredis
+    import redis_client
+
+    asyncio.run(check_redis_stand_in(fakeredis.aioredis.FakeRedis))
+    redis_client.redis_client = fakeredis.aioredis.FakeRedis()
+    os.environ.setdefault('PRELOAD_CONNECTORS', ','.join(PROVIDERS))
+    upstream = FakeUpstream(latency_ms=args.upstream_latency_ms)
+    async_client_class = install(upstream)
+
+    port = _free_port()
+    report = {}
+    app_output = AppOutput(sys.stdout if args.verbose else None)
+    with contextlib.redirect_stdout(app_output), LocalServer(port):
+        for name in scenarios:
+            report[name] = asyncio.run(run_scenario(
+                async_client_class, f'http://127.0.0.1:{port}', name, args.users, args.iterations, args.accounts
+            ))
+
+    _print_report(report)
+    print(f"upstream calls: {json.dumps(dict(sorted(upstream.calls.items())))}")
+    from integrations.outbound import upstream_metrics
+    print(f"upstream concurrency: {json.dumps({provider: metrics['limit'] for provider, metrics in upstream_metrics().items()})}")
+
+    if args.save_report:
+        with open(args.save_report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failures = check_slos(report, slos, args.max_memory_growth_mb)
+    if app_output.error_count:
+        failures.append(f'application logged {app_output.error_count} errors')
+        print(f'\napplication errors: {app_output.error_count}', file=sys.stderr)
+        for sample in app_output.error_samples:
+            print(f'    {sample}', file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures.extend(check_baseline(report, json.load(f), args.tolerance))
+
+    if failures:
+        print('\nFAILED')
+        for failure in failures:
+            print(f'  {failure}')
+        sys.exit(1)
+    print('\nAll SLOs met')
+
+
+if __name__ == '__main__':
+    main()
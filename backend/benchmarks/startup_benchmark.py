@@ -0,0 +1,85 @@
+"""
+Startup benchmark for the backend: import time of main and time-to-first-request of a fresh uvicorn process.
+
+Run from the backend directory:
+    python benchmarks/startup_benchmark.py --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def measure_import_time() -> float:
+    """
+    Import main in a fresh interpreter and return the seconds spent importing it
+    """
+    output = subprocess.check_output([sys.executable, '-c', IMPORT_SNIPPET], cwd=BACKEND_DIR, text=True)
+    return float(output.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def measure_time_to_first_request(timeout: float = 30.0) -> float:
+    """
+    Start uvicorn and return the seconds until GET / first answers 200
+    """
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.01)
+        raise TimeoutError(f'uvicorn did not answer within {timeout}s')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _summary(name: str, samples) -> str:
+    milliseconds = sorted(sample * 1000 for sample in samples)
+    return (
+        f'{name}: median {statistics.median(milliseconds):.0f} ms, '
+        f'min {milliseconds[0]:.0f} ms, max {milliseconds[-1]:.0f} ms ({len(milliseconds)} runs)'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='number of cold starts to measure')
+    parser.add_argument('--skip-server', action='store_true', help='only measure import time')
+    args = parser.parse_args()
+
+    print(_summary('import main', [measure_import_time() for _ in range(args.runs)]))
+    if not args.skip_server:
+        print(_summary('time to first request', [measure_time_to_first_request() for _ in range(args.runs)]))
+
+
+if __name__ == '__main__':
+    main()
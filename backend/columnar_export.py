@@ -0,0 +1,403 @@
+"""
+Columnar export of IntegrationItems to Parquet or Arrow IPC, streamed in record batches:
+at most one batch of items is held in memory, however many are exported.
+
+Also usable from the command line, run from the backend directory:
+    python columnar_export.py --provider hubspot --credentials @hubspot_credentials.json --output items.parquet
+    python columnar_export.py --input items.ndjson --format arrow --flatten --output items.arrow
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from typing import List, Optional
+
+from integrations.pagination import parse_timestamp
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 10000))
+PARQUET_COMPRESSION = 'zstd'
+# Flattened payload columns are prefixed so they never collide with item columns
+FLATTEN_PREFIX = 'api_response.'
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+EXPORT_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.file', 'arrow'),
+}
+
+ITEM_COLUMNS = [
+    'id', 'type', 'directory', 'parent_path_or_name', 'parent_id', 'name',
+    'creation_time', 'last_modified_time', 'url', 'children', 'mime_type',
+    'delta', 'drive_id', 'visibility', 'email', 'phone', 'api_response',
+]
+TIMESTAMP_COLUMNS = ('creation_time', 'last_modified_time')
+BOOLEAN_COLUMNS = ('directory', 'visibility')
+
+
+def _import_pyarrow():
+    # pyarrow is heavy and only needed here, keep it off the startup path
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+    return pyarrow
+
+
+def _item_column_type(pa, column):
+    if column in TIMESTAMP_COLUMNS:
+        return pa.timestamp('us', tz='UTC')
+    if column in BOOLEAN_COLUMNS:
+        return pa.bool_()
+    if column == 'children':
+        return pa.list_(pa.string())
+    return pa.string()
+
+
+def flatten_payload(payload, prefix: str = FLATTEN_PREFIX) -> dict:
+    """
+    Flatten nested dicts into dotted keys. Lists are kept whole and exported as JSON strings.
+    """
+    flat = {}
+    if not isinstance(payload, dict):
+        return flat
+    for key, value in payload.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict) and value:
+            flat.update(flatten_payload(value, f'{name}.'))
+        else:
+            flat[name] = value
+    return flat
+
+
+def _value_kind(value):
+    """
+    Classify one flattened value. Integers outside the int64 range (e.g. 20 digit ids) count as strings,
+    so their column keeps every digit.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int' if INT64_MIN <= value <= INT64_MAX else 'string'
+    if isinstance(value, float):
+        return 'float'
+    return 'string'
+
+
+def _infer_value_type(kinds):
+    """
+    Pick the narrowest Arrow type for a flattened column from the kinds of its values: bool, int64, float64, else string
+    """
+    kinds = set(kinds) - {None}
+    if 'string' in kinds:
+        return 'string'
+    if kinds == {'bool'}:
+        return 'bool'
+    if kinds == {'int'}:
+        return 'int'
+    if kinds and kinds <= {'int', 'float'}:
+        return 'float'
+    return 'string'
+
+
+def _to_string(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+def _to_item_dict(item):
+    return item.to_dict() if hasattr(item, 'to_dict') else item
+
+
+class FlattenedColumns:
+    """
+    Discovers the flattened payload columns of a stream of items, keeping only the kinds of values
+    seen per column (not the values), so the schema pass costs memory per column, not per item
+    """
+
+    def __init__(self):
+        self.kinds = {}
+
+    def observe(self, item: dict):
+        for name, value in flatten_payload(item.get('api_response')).items():
+            self.kinds.setdefault(name, set()).add(_value_kind(value))
+
+
+def _check_columns(columns: Optional[List[str]]) -> List[str]:
+    columns = columns or ITEM_COLUMNS
+    unknown = [column for column in columns if column not in ITEM_COLUMNS]
+    if unknown:
+        raise ValueError(f'Unknown export columns: {unknown}')
+    return columns
+
+
+def build_schema(columns: Optional[List[str]] = None, flattened: Optional[FlattenedColumns] = None):
+    """
+    Build the export schema. With flattened (observed from every item), api_response is replaced
+    by its typed payload columns, so all record batches share one schema.
+    """
+    pa = _import_pyarrow()
+    columns = _check_columns(columns)
+
+    fields = [
+        pa.field(column, _item_column_type(pa, column))
+        for column in columns
+        if not (flattened is not None and column == 'api_response')
+    ]
+
+    if flattened is not None and 'api_response' in columns:
+        types = {'bool': pa.bool_(), 'int': pa.int64(), 'float': pa.float64(), 'string': pa.string()}
+        fields.extend(
+            pa.field(name, types[_infer_value_type(kinds)])
+            for name, kinds in sorted(flattened.kinds.items())
+        )
+
+    return pa.schema(fields)
+
+
+def _column_value(field, value):
+    if field.name in TIMESTAMP_COLUMNS:
+        return parse_timestamp(value)
+    if field.name == 'children':
+        return [str(child) for child in value] if value else value
+    if str(field.type) == 'string':
+        return _to_string(value)
+    if str(field.type) == 'double' and value is not None:
+        return float(value)
+    return value
+
+
+def record_batch(items: List[dict], schema):
+    """
+    Convert one batch of items into a record batch of the export schema
+    """
+    pa = _import_pyarrow()
+    flattened = any(field.name.startswith(FLATTEN_PREFIX) for field in schema)
+    rows = [flatten_payload(item.get('api_response')) if flattened else {} for item in items]
+    arrays = []
+    for field in schema:
+        if field.name.startswith(FLATTEN_PREFIX):
+            values = [row.get(field.name) for row in rows]
+        else:
+            values = [item.get(field.name) for item in items]
+        arrays.append(pa.array([_column_value(field, value) for value in values], type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _write_batch(writer, items, schema):
+    writer.write_batch(record_batch(items, schema))
+
+
+async def write_item_stream(open_items, output, export_format: str = 'parquet', columns: Optional[List[str]] = None, flatten: bool = False, batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """
+    Write items to output (a path or binary file object) as Parquet or an Arrow IPC file.
+    open_items() returns a new async iterator over the items on every call. With flatten the items
+    are read twice: once to discover and type the payload columns, once to write them.
+    Batches are converted and written in a worker thread, so the event loop keeps serving requests.
+    Returns the number of rows written.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported export format: {export_format}, expected one of {list(EXPORT_FORMATS)}')
+
+    pa = _import_pyarrow()
+    flattened = None
+    if flatten and 'api_response' in _check_columns(columns):
+        flattened = FlattenedColumns()
+        async for item in open_items():
+            flattened.observe(_to_item_dict(item))
+    schema = build_schema(columns, flattened)
+
+    if export_format == 'parquet':
+        writer = pa.parquet.ParquetWriter(output, schema, compression=PARQUET_COMPRESSION)
+    else:
+        writer = pa.ipc.new_file(output, schema)
+
+    count = 0
+    with writer:
+        batch = []
+        async for item in open_items():
+            batch.append(_to_item_dict(item))
+            if len(batch) >= batch_size:
+                await asyncio.to_thread(_write_batch, writer, batch, schema)
+                count += len(batch)
+                batch = []
+        # An empty export still gets one (empty) batch, so readers see the schema
+        if batch or not count:
+            await asyncio.to_thread(_write_batch, writer, batch, schema)
+            count += len(batch)
+
+    return count
+
+
+def _items_from_document(data) -> List[dict]:
+    if isinstance(data, dict):
+        return data.get('items', [])
+    return data
+
+
+def _items_from_line(data) -> List[dict]:
+    # Federated NDJSON lines carry one item each; other lines report provider status
+    if isinstance(data, dict) and 'item' in data:
+        return [data['item']]
+    if isinstance(data, list) or (isinstance(data, dict) and 'items' in data):
+        return _items_from_document(data)
+    return []
+
+
+async def iter_items_file(path: str):
+    """
+    Stream items saved from the API: the NDJSON stream of /integrations/load is read line by line,
+    a pretty-printed JSON list or /load page ({"items": [...]}) is read whole
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        first_line = f.readline()
+        try:
+            first = json.loads(first_line)
+        except json.JSONDecodeError:
+            f.seek(0)
+            for item in _items_from_document(json.load(f)):
+                yield item
+            return
+
+        for item in _items_from_line(first):
+            yield item
+        for line in f:
+            if line.strip():
+                for item in _items_from_line(json.loads(line)):
+                    yield item
+
+
+def read_items_file(path: str) -> List[dict]:
+    """
+    Read items saved from the API: a JSON list, a /load page ({"items": [...]}),
+    or the NDJSON stream of /integrations/load
+    """
+    with (sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')) as f:
+        text = f.read()
+
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        lines = [json.loads(line) for line in text.splitlines() if line.strip()]
+        return [line['item'] for line in lines if 'item' in line]
+
+    if isinstance(data, dict):
+        return data.get('items', [])
+    return data
+
+
+async def _iter_list(items):
+    for item in items:
+        yield item
+
+
+async def iter_provider_items(provider: str, credentials: str, org_id: Optional[str] = None, options: Optional[dict] = None, resume: bool = False):
+    """
+    Run a provider's crawl with the given credentials and load options (see crawl_options),
+    as the load endpoints do, yielding items as they arrive. resume continues the org's interrupted crawls.
+    """
+    from integrations.registry import get_crawl
+
+    crawl = get_crawl(provider)
+    kwargs = dict(options or {}) if provider == 'notion' else {**(options or {}), 'org_id': org_id, 'resume': resume}
+    items = crawl(credentials, **kwargs)
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in await items:
+            yield item
+
+
+async def export_provider_items(provider: str, credentials: str, output, export_format: str = 'parquet', columns: Optional[List[str]] = None, flatten: bool = False, batch_size: int = EXPORT_BATCH_SIZE, org_id: Optional[str] = None, options: Optional[dict] = None, resume: bool = False) -> int:
+    """
+    Crawl a provider once and export the result. Items are spooled to a temporary NDJSON file
+    as they arrive, so the crawl is never held in memory and flatten can read it twice.
+    """
+    from redis_client import close_redis_client, init_redis_client
+
+    # Connectors keep OAuth state, schemas and crawl checkpoints in Redis
+    init_redis_client()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            spool = os.path.join(directory, 'items.ndjson')
+            with open(spool, 'w', encoding='utf-8') as f:
+                async for item in iter_provider_items(provider, credentials, org_id, options, resume):
+                    f.write(json.dumps({'item': _to_item_dict(item)}, default=str) + '\n')
+            return await write_item_stream(lambda: iter_items_file(spool), output, export_format, columns, flatten, batch_size)
+    finally:
+        await close_redis_client()
+
+
+def _read_credentials(value: str) -> str:
+    # '@path' reads the credentials JSON from a file, keeping tokens out of shell history
+    if value.startswith('@'):
+        with open(value[1:], 'r', encoding='utf-8') as f:
+            value = f.read()
+    json.loads(value)
+    return value
+
+
+def _split(value: Optional[str]) -> Optional[List[str]]:
+    return [part.strip() for part in value.split(',') if part.strip()] if value else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export IntegrationItems to Parquet or Arrow IPC')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help="JSON or NDJSON file saved from the load endpoints, '-' for stdin")
+    source.add_argument('--provider', choices=['airtable', 'notion', 'hubspot'], help='Crawl this provider and export the result (requires --credentials)')
+    parser.add_argument('--credentials', help="Provider credentials JSON as returned by /credentials, or '@file'")
+    parser.add_argument('--org-id', help='Org the crawl runs for; its pages are checkpointed')
+    parser.add_argument('--resume', action='store_true', help="Continue the org's interrupted crawl from its checkpoint (requires --org-id)")
+    parser.add_argument('--include-records', action='store_true', help='Airtable: also crawl every table\'s records')
+    parser.add_argument('--record-fields', help='Airtable: comma separated record fields to fetch')
+    parser.add_argument('--object-types', help='HubSpot: comma separated object types, including custom ones')
+    parser.add_argument('--properties', help='HubSpot: comma separated properties to fetch')
+    parser.add_argument('--output', required=True, help='Destination file')
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='parquet')
+    parser.add_argument('--columns', help='Comma separated item columns to export (default: all)')
+    parser.add_argument('--flatten', action='store_true', help='Flatten api_response into api_response.* columns')
+    parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.provider and not args.credentials:
+        parser.error('--provider requires --credentials')
+    if args.resume and not (args.provider and args.org_id):
+        parser.error('--resume requires --provider and --org-id')
+
+    columns = _split(args.columns)
+    export = (args.output, args.format, columns, args.flatten, args.batch_size)
+    if args.input == '-':
+        # stdin cannot be read twice, so it is the one source held in memory
+        items = read_items_file(args.input)
+        count = asyncio.run(write_item_stream(lambda: _iter_list(items), *export))
+    elif args.input:
+        count = asyncio.run(write_item_stream(lambda: iter_items_file(args.input), *export))
+    else:
+        from integrations.checkpoints import crawl_options
+        from integrations.registry import unsupported_load_options
+
+        try:
+            credentials = _read_credentials(args.credentials)
+        except (OSError, json.JSONDecodeError) as e:
+            parser.error(f'Invalid --credentials: {str(e)}')
+        options = crawl_options(
+            include_records=args.include_records,
+            record_fields=_split(args.record_fields),
+            object_types=_split(args.object_types),
+            properties=_split(args.properties),
+        )
+        unsupported = unsupported_load_options(args.provider, options)
+        if unsupported:
+            parser.error(f'{args.provider} does not take {", ".join(unsupported)}')
+        count = asyncio.run(export_provider_items(args.provider, credentials, *export, org_id=args.org_id, options=options, resume=args.resume))
+
+    print(f"Exported {count} items to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
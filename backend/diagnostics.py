@@ -0,0 +1,88 @@
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+
+from redis_client import add_key_value_redis, get_value_redis
+
+# Opt-in diagnostics mode: blocked-loop stack logging and per-request profiling
+DIAGNOSTICS_ENABLED = os.environ.get('DIAGNOSTICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+BLOCKING_THRESHOLD_MS = float(os.environ.get('BLOCKING_THRESHOLD_MS', 100 if DIAGNOSTICS_ENABLED else 0))
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 5)) / 1000
+PROFILE_TTL_SECONDS = 3600
+PROFILED_PATH_SUFFIXES = ('/load', '/search')
+PROFILE_HEADER = 'X-Profile'
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples one thread's Python stack at a fixed interval and counts collapsed stacks
+    ('outer;inner;leaf'), the input format of flamegraph tools
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILE_SAMPLE_INTERVAL_SECONDS):
+        super().__init__(name='request-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return '\n'.join(f'{stack} {count}' for stack, count in self.samples.most_common())
+
+
+def wants_profile(request: Request) -> bool:
+    if not DIAGNOSTICS_ENABLED or not request.url.path.endswith(PROFILED_PATH_SUFFIXES):
+        return False
+    return request.headers.get(PROFILE_HEADER) == '1' or request.query_params.get('profile') == '1'
+
+
+async def profile_request(request: Request, call_next):
+    """
+    Sample the event loop thread while one request runs and store the profile in Redis.
+    The loop is shared, so samples also include whatever else it ran concurrently.
+    """
+    sampler = StackSampler(threading.get_ident())
+    started = time.perf_counter()
+    sampler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        sampler.stop()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    profile_id = secrets.token_hex(8)
+    header = f'# {request.method} {request.url.path} {elapsed_ms:.0f} ms, {sum(sampler.samples.values())} samples\n'
+    try:
+        await add_key_value_redis(f'profile:{profile_id}', header + sampler.collapsed(), expire=PROFILE_TTL_SECONDS)
+        response.headers['X-Profile-Id'] = profile_id
+    except Exception as e:
+        print(f"Failed to store profile for {request.url.path}: {str(e)}")
+    return response
+
+
+async def get_profile(profile_id: str):
+    profile = await get_value_redis(f'profile:{profile_id}')
+    if profile is None:
+        return PlainTextResponse('Profile not found or expired', status_code=404)
+    return PlainTextResponse(profile.decode('utf-8') if isinstance(profile, bytes) else profile)
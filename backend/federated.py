@@ -0,0 +1,53 @@
+import asyncio
+import json
+import os
+import time
+
+FEDERATED_PROVIDER_TIMEOUT_SECONDS = float(os.environ.get('FEDERATED_PROVIDER_TIMEOUT', 30))
+
+
+async def _run_provider(provider, load, timeout):
+    started = time.perf_counter()
+    try:
+        items = await asyncio.wait_for(load(), timeout)
+        status = {'status': 'ok', 'count': len(items)}
+    except asyncio.TimeoutError:
+        items = []
+        status = {'status': 'timeout', 'detail': f'No response within {timeout:g}s'}
+    except Exception as e:
+        items = []
+        status = {'status': 'error', 'detail': getattr(e, 'detail', None) or str(e)}
+    status['elapsed_ms'] = round((time.perf_counter() - started) * 1000)
+    return provider, items, status
+
+
+async def federated_items(loaders: dict, timeout: float = FEDERATED_PROVIDER_TIMEOUT_SECONDS):
+    """
+    Run every provider's loader concurrently and yield NDJSON lines as each one finishes:
+    one {"provider", "item"} line per unique item, then a final {"providers": {...}} status line.
+    A failing or slow provider only drops its own items, and total latency is the slowest provider's.
+    """
+    seen = set()
+    statuses = {}
+    tasks = [asyncio.create_task(_run_provider(provider, load, timeout)) for provider, load in loaders.items()]
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            provider, items, status = await next_done
+            duplicates = 0
+            for item in items:
+                key = (provider, item.get('id'))
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                yield json.dumps({'provider': provider, 'item': item}, default=str) + '\n'
+            if duplicates:
+                status['duplicates'] = duplicates
+            statuses[provider] = status
+
+        yield json.dumps({'providers': statuses}) + '\n'
+    finally:
+        # The client went away or the stream was closed early: stop the crawls nobody will read
+        for task in tasks:
+            task.cancel()
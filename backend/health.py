@@ -0,0 +1,86 @@
+import asyncio
+import os
+import time
+
+from loop_monitor import loop_monitor
+from redis_client import ping_redis, redis_pool_stats
+from scheduler import crawl_scheduler
+
+# Readiness degrades (503) when any of these is exceeded
+READY_MAX_REDIS_LATENCY_MS = float(os.environ.get('READY_MAX_REDIS_LATENCY_MS', 100))
+READY_MAX_LOOP_LAG_MS = float(os.environ.get('READY_MAX_LOOP_LAG_MS', 250))
+READY_MAX_POOL_UTILIZATION = float(os.environ.get('READY_MAX_POOL_UTILIZATION', 0.9))
+READY_MAX_QUEUED_CRAWLS = int(os.environ.get('READY_MAX_QUEUED_CRAWLS', crawl_scheduler.global_limit * 2))
+REDIS_PING_TIMEOUT_SECONDS = 1.0
+
+provider_status = {}
+
+
+def record_provider_result(provider: str, ok: bool, error: str = None):
+    """
+    Remember the latest upstream outcome for a provider, reported by the readiness probe
+    """
+    status = provider_status.setdefault(provider, {'last_success': None, 'last_failure': None, 'last_error': None})
+    if ok:
+        status['last_success'] = time.time()
+    else:
+        status['last_failure'] = time.time()
+        status['last_error'] = error
+
+
+async def check_redis() -> dict:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(ping_redis(), REDIS_PING_TIMEOUT_SECONDS)
+    except Exception as e:
+        return {'ok': False, 'error': str(e) or type(e).__name__}
+
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    return {'ok': latency_ms <= READY_MAX_REDIS_LATENCY_MS, 'latency_ms': latency_ms}
+
+
+def check_pool() -> dict:
+    stats = redis_pool_stats()
+    utilization = stats['in_use'] / stats['max_connections'] if stats['max_connections'] else 0
+    return {'ok': utilization < READY_MAX_POOL_UTILIZATION, 'utilization': round(utilization, 3), **stats}
+
+
+def check_event_loop() -> dict:
+    stats = loop_monitor.stats()
+    return {'ok': stats['last_lag_ms'] <= READY_MAX_LOOP_LAG_MS, **stats}
+
+
+def check_scheduler() -> dict:
+    metrics = crawl_scheduler.metrics()
+    return {
+        'ok': metrics['queued'] <= READY_MAX_QUEUED_CRAWLS,
+        'running': metrics['running'],
+        'queued': metrics['queued'],
+        'global_limit': metrics['global_limit'],
+    }
+
+
+def check_workers(tasks: dict) -> dict:
+    """
+    Background tasks are healthy while they keep running; a finished task has crashed or been cancelled
+    """
+    states = {name: ('running' if task is not None and not task.done() else 'stopped') for name, task in tasks.items()}
+    return {'ok': all(state == 'running' for state in states.values()), **states}
+
+
+async def check_readiness(background_tasks: dict) -> dict:
+    """
+    Run every dependency check and report whether this replica should receive traffic
+    """
+    checks = {
+        'redis': await check_redis(),
+        'redis_pool': check_pool(),
+        'event_loop': check_event_loop(),
+        'scheduler': check_scheduler(),
+        'workers': check_workers(background_tasks),
+    }
+    return {
+        'status': 'ok' if all(check['ok'] for check in checks.values()) else 'degraded',
+        'checks': checks,
+        'providers': provider_status,
+    }
@@ -0,0 +1,99 @@
+import hashlib
+import json
+from typing import Optional
+
+from fastapi import Request, Response
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+
+# Responses smaller than this are sent uncompressed, gzip would only add overhead
+GZIP_MINIMUM_SIZE = 1024
+# Streams whose chunks must reach the client as they are produced; gzip would buffer them
+UNCOMPRESSED_MEDIA_TYPES = ('application/x-ndjson', 'text/event-stream')
+
+SUMMARY_CACHE_CONTROL = 'public, max-age=86400'
+
+
+def serialize_json(content) -> bytes:
+    """
+    Serialize a JSON-compatible payload once into compact bytes
+    """
+    return json.dumps(content, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
+
+def compute_etag(body: bytes) -> str:
+    """
+    Build a weak content-hash ETag. Weak because GZipMiddleware may re-encode the body.
+    """
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Check the request's If-None-Match header against an ETag
+    """
+    if_none_match = request.headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+
+    # Weak comparison: ignore the W/ prefix on both sides
+    candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return etag.removeprefix('W/') in candidates
+
+
+def cached_response(request: Request, body: bytes, etag: str, cache_control: Optional[str] = None) -> Response:
+    """
+    Return 304 when the client already holds this ETag, otherwise the pre-serialized JSON body.
+    Only GET and HEAD are conditional: on other methods a matching If-None-Match would call for 412, not 304.
+    """
+    if request.method in ('GET', 'HEAD') and etag_matches(request, etag):
+        return not_modified_response(etag, cache_control)
+    return Response(content=body, media_type='application/json', headers={'ETag': etag, 'Cache-Control': cache_control or 'no-cache'})
+
+
+def request_etag(*parts) -> str:
+    """
+    Build a weak ETag from what identifies an immutable response, so it can be checked
+    before the body is loaded or serialized
+    """
+    return compute_etag(serialize_json(parts))
+
+
+def not_modified_response(etag: str, cache_control: Optional[str] = None) -> Response:
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': cache_control or 'no-cache'})
+
+
+def json_response(content, headers: Optional[dict] = None) -> Response:
+    """
+    Serialize content once into a JSON response, skipping FastAPI's jsonable_encoder pass
+    """
+    return Response(content=serialize_json(content), media_type='application/json', headers=headers)
+
+
+class _StreamingAwareGZipResponder(GZipResponder):
+    passthrough = False
+
+    async def send_with_gzip(self, message):
+        if message['type'] == 'http.response.start':
+            content_type = Headers(raw=message['headers']).get('content-type', '')
+            self.passthrough = content_type.startswith(UNCOMPRESSED_MEDIA_TYPES)
+        if self.passthrough:
+            await self.send(message)
+            return
+        await super().send_with_gzip(message)
+
+
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that leaves incremental streams such as NDJSON uncompressed,
+    so each line is flushed to the client as soon as it is written
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and 'gzip' in Headers(scope=scope).get('Accept-Encoding', ''):
+            responder = _StreamingAwareGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
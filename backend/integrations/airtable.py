@@ -1,8 +1,11 @@
 # airtable.py
 
 import datetime
+from contextlib import aclosing
 import json
+import os
 import secrets
+import time
 from fastapi import Request, HTTPException
 from fastapi.responses import HTMLResponse
 import httpx
@@ -10,10 +13,13 @@ import asyncio
 import base64
 import hashlib
 
-import requests
 from integrations.integration_item import IntegrationItem
+from integrations.checkpoints import CrawlCheckpoint, crawl_options, paginate_with_checkpoint
+from integrations.outbound import upstream_request
+from integrations.streams import merge_streams
 
 from redis_client import add_key_value_redis, get_value_redis, delete_key_redis
+from shared_cache import get_or_load, make_cache_key
 
 # CLIENT_ID = 'XXX'
 # CLIENT_SECRET = 'XXX'
@@ -25,6 +31,16 @@ authorization_url = f'https://airtable.com/oauth2/v1/authorize?client_id={CLIENT
 encoded_client_id_secret = base64.b64encode(f'{CLIENT_ID}:{CLIENT_SECRET}'.encode()).decode()
 scope = 'data.records:read data.records:write data.recordComments:read data.recordComments:write schema.bases:read schema.bases:write'
 
+# Airtable allows 5 requests per second per base, and asks for a 30 second back-off after a 429
+REQUESTS_PER_SECOND_PER_BASE = 5
+RATE_LIMIT_BACKOFF_SECONDS = 30
+MAX_RATE_LIMIT_RETRIES = 3
+RECORD_PAGE_SIZE = 100
+# Bounds how many crawled records wait for the consumer, so memory stays flat on huge bases
+RECORD_BUFFER_SIZE = int(os.environ.get('AIRTABLE_RECORD_BUFFER_SIZE', 1000))
+# How long a base's table listing is shared between crawls; a webhook notification for the base drops it
+TABLES_CACHE_TTL_SECONDS = int(os.environ.get('AIRTABLE_TABLES_TTL', 300))
+
 async def authorize_airtable(user_id, org_id):
     state_data = {
         'state': secrets.token_urlsafe(32),
@@ -120,53 +136,209 @@ def create_integration_item_metadata_object(
     return integration_item_metadata
 
 
-def fetch_items(
-    access_token: str, url: str, aggregated_response: list, offset=None
-) -> dict:
-    """Fetching the list of bases"""
-    params = {'offset': offset} if offset is not None else {}
+async def fetch_items(access_token: str, url: str, checkpoint: CrawlCheckpoint = None) -> list:
+    """
+    Fetching the list of bases, following offsets iteratively and checkpointing each page.
+    Any failed page fails the crawl, so a load missing bases is never cached as complete.
+    """
     headers = {'Authorization': f'Bearer {access_token}'}
-    response = requests.get(url, headers=headers, params=params)
+    aggregated_response = []
+
+    async with httpx.AsyncClient() as client:
+
+        async def fetch_page(offset):
+            params = {'offset': offset} if offset is not None else {}
+            response = await airtable_request(client, url, headers, params)
+            if response.status_code != 200:
+                raise HTTPException(status_code=response.status_code, detail=f'Failed to list bases: {response.text}')
+            data = response.json()
+            return data.get('bases', []), data.get('offset', None)
+
+        async for page in paginate_with_checkpoint(checkpoint, fetch_page):
+            aggregated_response.extend(page)
+
+    return aggregated_response
+
+
+class BaseRateLimiter:
+    """Spaces out requests to one base so all concurrent table crawls share its rate limit"""
+
+    def __init__(self, requests_per_second: int):
+        self.interval = 1.0 / requests_per_second
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+base_rate_limiters = {}
+
+
+def get_base_rate_limiter(base_id: str) -> BaseRateLimiter:
+    if base_id not in base_rate_limiters:
+        base_rate_limiters[base_id] = BaseRateLimiter(REQUESTS_PER_SECOND_PER_BASE)
+    return base_rate_limiters[base_id]
+
+
+async def airtable_request(client: httpx.AsyncClient, url: str, headers: dict, params=None, base_id: str = None) -> httpx.Response:
+    """
+    Send a GET to Airtable, within the base's rate limit when base_id is given,
+    backing off and retrying as Airtable asks after a 429. Returns the last response.
+    """
+    limiter = get_base_rate_limiter(base_id) if base_id else None
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        if limiter is not None:
+            await limiter.wait()
+        response = await upstream_request('airtable', client, 'GET', url, headers=headers, params=params)
+        if response.status_code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+            return response
+        await asyncio.sleep(RATE_LIMIT_BACKOFF_SECONDS)
+
+
+async def fetch_base_tables(client: httpx.AsyncClient, access_token: str, base_id: str) -> list:
+    """Lists one base's tables, counted against the base's rate limit like its record pages"""
+    url = f'https://api.airtable.com/v0/meta/bases/{base_id}/tables'
+    response = await airtable_request(client, url, {'Authorization': f'Bearer {access_token}'}, base_id=base_id)
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=f'Failed to list tables for base {base_id}: {response.text}')
+    return response.json().get('tables', [])
+
+
+def base_tables_cache_key(base_id: str) -> str:
+    return make_cache_key('airtable_tables', base_id)
+
+
+async def get_base_tables(access_token: str, base_id: str) -> list:
+    """
+    Lists one base's tables through the shared cache. A base's schema is the same for every token
+    that can list the base, so concurrent crawls of it spend one request of its rate limit, not one each.
+    """
+    async def load():
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            return await fetch_base_tables(client, access_token, base_id)
+
+    return await get_or_load(base_tables_cache_key(base_id), load, TABLES_CACHE_TTL_SECONDS)
+
+
+def create_record_integration_item(record: dict, table: dict, base_id: str) -> IntegrationItem:
+    """Creates an integration item for a record, as a child of its table item"""
+    fields = record.get('fields', {})
+    primary_field_name = next(
+        (field.get('name') for field in table.get('fields', []) if field.get('id') == table.get('primaryFieldId')),
+        None,
+    )
+    name = fields.get(primary_field_name) if primary_field_name else None
+    created_time = record.get('createdTime')
+
+    return IntegrationItem(
+        id=record.get('id') + '_Record',
+        name=str(name) if name is not None else record.get('id'),
+        type='Record',
+        parent_id=table.get('id') + '_Table',
+        parent_path_or_name=table.get('name'),
+        creation_time=datetime.datetime.fromisoformat(created_time.replace('Z', '+00:00')) if created_time else None,
+        drive_id=base_id,
+        api_response=record,
+    )
 
-    if response.status_code == 200:
-        results = response.json().get('bases', {})
-        offset = response.json().get('offset', None)
 
-        for item in results:
-            aggregated_response.append(item)
+async def fetch_table_records(client: httpx.AsyncClient, access_token: str, base_id: str, table: dict, fields=None, checkpoint: CrawlCheckpoint = None):
+    """Pages through one table's records with offset pagination, one page at a time"""
+    url = f'https://api.airtable.com/v0/{base_id}/{table.get("id")}'
+    headers = {'Authorization': f'Bearer {access_token}'}
 
+    async def fetch_page(offset):
+        params = [('pageSize', RECORD_PAGE_SIZE)]
+        params.extend(('fields[]', field) for field in fields or [])
         if offset is not None:
-            fetch_items(access_token, url, aggregated_response, offset)
-        else:
-            return
+            params.append(('offset', offset))
+
+        response = await airtable_request(client, url, headers, params, base_id=base_id)
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail=f'Failed to fetch records for table {table.get("id")}: {response.text}')
+        data = response.json()
+        return data.get('records', []), data.get('offset')
+
+    # Closed explicitly so an abandoned crawl releases its checkpoint now, not when the generator is collected
+    async with aclosing(paginate_with_checkpoint(checkpoint, fetch_page)) as pages:
+        async for records in pages:
+            yield records
+
+
+async def crawl_airtable_records(access_token: str, tables: list, fields=None, org_id=None, resume=False):
+    """
+    Crawls the records of many tables concurrently and yields record IntegrationItems as they arrive.
+    tables is a list of (base_id, table metadata) pairs. Each table's crawl is checkpointed,
+    so with resume a table that failed midway replays its stored pages and continues.
+    A failing table fails the whole crawl, so an incomplete record set is never cached as complete.
+    """
+    fields_hash = hashlib.sha256(','.join(fields or []).encode('utf-8')).hexdigest()[:8]
+    options = crawl_options(include_records=True, record_fields=fields)
 
+    async with httpx.AsyncClient(timeout=30.0) as client:
 
-async def get_items_airtable(credentials) -> list[IntegrationItem]:
+        async def crawl_table(base_id, table):
+            checkpoint = CrawlCheckpoint(org_id, 'airtable', access_token, f'records:{table.get("id")}:{fields_hash}', options, resume)
+            try:
+                async with aclosing(fetch_table_records(client, access_token, base_id, table, fields, checkpoint)) as pages:
+                    async for records in pages:
+                        for record in records:
+                            yield create_record_integration_item(record, table, base_id)
+            except Exception as e:
+                print(f'Error crawling table {table.get("id")}: {getattr(e, "detail", None) or str(e)}')
+                raise
+
+        async for item in merge_streams([crawl_table(base_id, table) for base_id, table in tables], RECORD_BUFFER_SIZE):
+            yield item
+
+
+async def iter_items_airtable(credentials, include_records=False, record_fields=None, org_id=None, resume=False):
+    """
+    Stream Airtable IntegrationItems: bases and tables first, then records as they are crawled.
+    resume continues the org's interrupted crawls from their checkpoints.
+    """
     credentials = json.loads(credentials)
     url = 'https://api.airtable.com/v0/meta/bases'
-    list_of_integration_item_metadata = []
-    list_of_responses = []
+    tables_to_crawl = []
+    count = 0
 
-    fetch_items(credentials.get('access_token'), url, list_of_responses)
-    for response in list_of_responses:
-        list_of_integration_item_metadata.append(
-            create_integration_item_metadata_object(response, 'Base')
-        )
-        tables_response = requests.get(
-            f'https://api.airtable.com/v0/meta/bases/{response.get("id")}/tables',
-            headers={'Authorization': f'Bearer {credentials.get("access_token")}'},
-        )
-        if tables_response.status_code == 200:
-            tables_response = tables_response.json()
-            for table in tables_response['tables']:
-                list_of_integration_item_metadata.append(
-                    create_integration_item_metadata_object(
-                        table,
-                        'Table',
-                        response.get('id', None),
-                        response.get('name', None),
-                    )
-                )
-
-    print(f'list_of_integration_item_metadata: {list_of_integration_item_metadata}')
-    return list_of_integration_item_metadata
+    list_of_responses = await fetch_items(
+        credentials.get('access_token'), url,
+        CrawlCheckpoint(org_id, 'airtable', credentials.get('access_token'), 'bases', crawl_options(include_records=include_records, record_fields=record_fields), resume),
+    )
+    # Every base's tables are listed at once, each within its base's rate limit.
+    # A base whose tables cannot be listed fails the crawl rather than appear empty.
+    base_tables = await asyncio.gather(*[
+        get_base_tables(credentials.get('access_token'), response.get('id'))
+        for response in list_of_responses
+    ])
+
+    for response, tables in zip(list_of_responses, base_tables):
+        yield create_integration_item_metadata_object(response, 'Base')
+        count += 1
+        for table in tables:
+            tables_to_crawl.append((response.get('id'), table))
+            yield create_integration_item_metadata_object(
+                table,
+                'Table',
+                response.get('id', None),
+                response.get('name', None),
+            )
+            count += 1
+
+    if include_records:
+        async for record_item in crawl_airtable_records(credentials.get('access_token'), tables_to_crawl, record_fields, org_id, resume):
+            yield record_item
+            count += 1
+
+    print(f'Total Airtable items fetched: {count}')
+
+
+async def get_items_airtable(credentials, include_records=False, record_fields=None, org_id=None, resume=False) -> list[IntegrationItem]:
+    return [item async for item in iter_items_airtable(credentials, include_records, record_fields, org_id, resume)]
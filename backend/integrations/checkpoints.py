@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import time
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from redis_client import (
+    acquire_lock_redis,
+    add_key_value_redis,
+    append_list_redis,
+    delete_key_redis,
+    extend_lock_redis,
+    get_list_range_redis,
+    get_value_redis,
+    release_lock_redis,
+    scan_keys_redis,
+)
+
+# Interrupted crawls can be resumed for this long; older progress is dropped and the crawl starts over
+CHECKPOINT_TTL_SECONDS = int(os.environ.get('CRAWL_CHECKPOINT_TTL', 3600))
+REPLAY_CHUNK_PAGES = 20
+DEFAULT_TENANT = 'default'
+# A crawl owns its checkpoint for this long and extends it with every page; a dead crawl's claim lapses
+CHECKPOINT_LOCK_TTL_MS = 60000
+
+
+def account_fingerprint(access_token: str) -> str:
+    """
+    Identify the upstream account without storing its token in a Redis key
+    """
+    return hashlib.sha256(access_token.encode('utf-8')).hexdigest()[:16]
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def crawl_options(**options) -> dict:
+    """
+    Normalize the load options a crawl was started with, dropping unset ones,
+    so the same load always produces the same options (and cache key)
+    """
+    return {name: value for name, value in options.items() if value}
+
+
+class CrawlCheckpoint:
+    """
+    Progress of one paginated crawl (tenant, provider, account, object type).
+    Every fetched page is appended to Redis together with the cursor for the next page,
+    so a crawl that dies midway can be resumed: the stored pages are replayed and it continues
+    from that cursor instead of calling the provider again from page one.
+    Only a crawl created with resume=True (the resume API) replays; stored pages can be up to
+    CHECKPOINT_TTL_SECONDS old, so any other crawl discards them and fetches current data.
+    options are the load options (see crawl_options) the crawl was started with, kept so it can be resumed as the same load.
+    """
+
+    def __init__(self, tenant: Optional[str], provider: str, access_token: str, object_type: str, options: Optional[dict] = None, resume: bool = False):
+        self.key = f'crawl_checkpoint:{tenant or DEFAULT_TENANT}:{provider}:{account_fingerprint(access_token)}:{object_type}'
+        self.pages_key = f'{self.key}:pages'
+        self.lock_key = f'{self.key}:lock'
+        self.options = options or {}
+        self.resume = resume
+        self.lock_token = None
+
+    async def acquire(self) -> bool:
+        """
+        Claim the checkpoint for one crawl, so two crawls of the same object never both append pages
+        """
+        token = secrets.token_hex(16)
+        if await acquire_lock_redis(self.lock_key, token, CHECKPOINT_LOCK_TTL_MS):
+            self.lock_token = token
+            return True
+        return False
+
+    async def release(self):
+        if self.lock_token is None:
+            return
+        try:
+            # Shielded: a crawl cancelled while finishing up must still hand its checkpoint back
+            await asyncio.shield(release_lock_redis(self.lock_key, self.lock_token))
+        except RedisError as e:
+            # The claim lapses on its own after CHECKPOINT_LOCK_TTL_MS
+            print(f"Failed to release checkpoint lock {self.lock_key}: {str(e)}")
+        self.lock_token = None
+
+    async def load(self) -> Optional[dict]:
+        state = await get_value_redis(self.key)
+        return json.loads(_decode(state)) if state else None
+
+    async def iter_pages(self):
+        """
+        Replay stored pages a chunk at a time, so a large resumed crawl is never read all at once
+        """
+        start = 0
+        while True:
+            chunk = await get_list_range_redis(self.pages_key, start, start + REPLAY_CHUNK_PAGES - 1)
+            if not chunk:
+                return
+            for page in chunk:
+                yield json.loads(_decode(page))
+            start += len(chunk)
+
+    async def save_page(self, results: list, next_cursor, pages_done: int):
+        await append_list_redis(self.pages_key, json.dumps(results), expire=CHECKPOINT_TTL_SECONDS)
+        state = {'cursor': next_cursor, 'pages': pages_done, 'options': self.options, 'updated_at': time.time()}
+        await add_key_value_redis(self.key, json.dumps(state), expire=CHECKPOINT_TTL_SECONDS)
+        if self.lock_token is not None:
+            await extend_lock_redis(self.lock_key, self.lock_token, CHECKPOINT_LOCK_TTL_MS)
+
+    async def clear(self):
+        await delete_key_redis(self.key)
+        await delete_key_redis(self.pages_key)
+
+
+async def paginate_with_checkpoint(checkpoint: Optional[CrawlCheckpoint], fetch_page):
+    """
+    Drive a cursor-paginated crawl, yielding one page of results at a time.
+    fetch_page(cursor) returns (results, next_cursor); next_cursor None ends the crawl.
+    When resuming, stored pages of an interrupted crawl are replayed first; otherwise they are
+    discarded. The checkpoint is cleared once the last page has been fetched.
+    While another crawl holds the checkpoint, this one runs from page one without it.
+    """
+    cursor = None
+    pages_done = 0
+
+    if checkpoint is not None and not await checkpoint.acquire():
+        print(f"Crawl {checkpoint.key} is already running elsewhere, crawling without a checkpoint")
+        checkpoint = None
+
+    try:
+        if checkpoint is not None:
+            state = await checkpoint.load()
+            if state and checkpoint.resume:
+                print(f"Resuming crawl {checkpoint.key} after {state['pages']} pages")
+                async for page in checkpoint.iter_pages():
+                    yield page
+                cursor = state['cursor']
+                pages_done = state['pages']
+            elif state:
+                # Left by an abandoned or failed crawl: start over, and record this crawl's own progress
+                await checkpoint.clear()
+
+        while True:
+            results, cursor = await fetch_page(cursor)
+            pages_done += 1
+            if checkpoint is not None and cursor is not None:
+                await checkpoint.save_page(results, cursor, pages_done)
+            yield results
+            if cursor is None:
+                break
+
+        if checkpoint is not None:
+            await checkpoint.clear()
+    finally:
+        if checkpoint is not None:
+            await checkpoint.release()
+
+
+async def _is_running(key: str) -> bool:
+    return await get_value_redis(f'{key}:lock') is not None
+
+
+async def list_checkpoints(tenant: Optional[str] = None) -> list:
+    """
+    Describe the resumable crawls of a tenant. running marks a checkpoint a crawl holds right now.
+    """
+    checkpoints = []
+    for key in await scan_keys_redis(f'crawl_checkpoint:{tenant or DEFAULT_TENANT}:*'):
+        key = _decode(key)
+        if key.endswith((':pages', ':lock')):
+            continue
+        state = await get_value_redis(key)
+        if not state:
+            continue
+        _, tenant_id, provider, account, object_type = key.split(':', 4)
+        checkpoints.append({
+            'provider': provider,
+            'account': account,
+            'object_type': object_type,
+            'options': {},
+            **json.loads(_decode(state)),
+            'running': await _is_running(key),
+        })
+    return checkpoints
+
+
+async def clear_checkpoints(tenant: Optional[str] = None, provider: Optional[str] = None) -> int:
+    """
+    Discard stored progress so the next crawl starts from page one. Returns the number of checkpoints cleared.
+    Checkpoints held by a running crawl are left alone: deleting its pages under it would desync
+    the page count it keeps saving. It clears its own progress when it finishes.
+    """
+    checkpoint_keys = set()
+    for key in await scan_keys_redis(f'crawl_checkpoint:{tenant or DEFAULT_TENANT}:{provider or "*"}:*'):
+        key = _decode(key)
+        if key.endswith(':lock'):
+            continue
+        checkpoint_keys.add(key.removesuffix(':pages'))
+
+    cleared = 0
+    for key in checkpoint_keys:
+        if await _is_running(key):
+            continue
+        await delete_key_redis(key)
+        await delete_key_redis(f'{key}:pages')
+        cleared += 1
+    return cleared
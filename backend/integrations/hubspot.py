@@ -1,11 +1,20 @@
 import json
+import os
+import csv
+import io
 import secrets
 import base64
+import hashlib
+import tempfile
+import zipfile
 from fastapi import Request, HTTPException
 from fastapi.responses import HTMLResponse
 import httpx
 import asyncio
 from integrations.integration_item import IntegrationItem
+from integrations.checkpoints import CrawlCheckpoint, crawl_options, paginate_with_checkpoint
+from integrations.outbound import upstream_request
+from integrations.streams import merge_streams
 from redis_client import add_key_value_redis, get_value_redis, delete_key_redis
 from typing import Dict, Optional
 from datetime import datetime
@@ -25,9 +34,34 @@ SCOPES = [
     'crm.objects.deals.read',
     'crm.schemas.contacts.read',
     'crm.schemas.companies.read',
+    'crm.schemas.deals.read',
+    'crm.schemas.custom.read',
+    'crm.objects.custom.read',
+    'crm.export',
     'oauth'
 ]
 
+# Object types with more records than this are pulled through the CRM export API instead of paging
+BULK_EXPORT_THRESHOLD = int(os.environ.get('HUBSPOT_BULK_EXPORT_THRESHOLD', 10000))
+EXPORT_POLL_INTERVAL_SECONDS = 5
+EXPORT_TIMEOUT_SECONDS = 30 * 60
+EXPORT_PARSE_BATCH_SIZE = 1000
+EXPORT_URL = 'https://api.hubapi.com/crm/v3/exports/export/async'
+# The export API names standard objects in the singular; custom objects go by their objectTypeId
+EXPORT_OBJECT_TYPES = {
+    'contacts': 'CONTACT',
+    'companies': 'COMPANY',
+    'deals': 'DEAL',
+}
+# Bounds how many crawled objects wait for the consumer while several object types stream at once
+OBJECT_BUFFER_SIZE = 1000
+
+# Discovered property schemas are cached per portal for this long
+SCHEMA_CACHE_TTL_SECONDS = int(os.environ.get('HUBSPOT_SCHEMA_TTL', 3600))
+STANDARD_OBJECT_TYPES = ['contacts', 'companies', 'deals']
+# Always fetched so items keep their id and timestamps whatever the projection
+BASE_PROPERTIES = ['hs_object_id', 'createdate', 'lastmodifieddate', 'hs_lastmodifieddate']
+
 object_type_map = {
     'contacts': 'Contact',
     'companies': 'Company',
@@ -190,9 +224,11 @@ async def get_hubspot_credentials(user_id, org_id):
         raise HTTPException(status_code=500, detail=f"Failed to retrieve credentials: {str(e)}")
 
 
-async def get_items_hubspot(credentials):
+async def iter_items_hubspot(credentials, object_types=None, properties=None, org_id=None, resume=False):
     """
-    Fetch HubSpot data using credentials and return IntegrationItem objects
+    Stream HubSpot IntegrationItems as they are fetched, crawling object types concurrently.
+    object_types may include custom object types; properties is an optional projection.
+    Paged crawls are checkpointed per org_id; with resume, a failed load continues where it stopped.
     """
     try:
         credentials_data = json.loads(credentials)
@@ -201,34 +237,66 @@ async def get_items_hubspot(credentials):
         if not access_token:
             raise HTTPException(status_code=400, detail='Missing access_token in credentials')
 
-        items = []
-
-        # Fetch contacts
-        contacts_results = await fetch_hubspot_objects("contacts", access_token)
-        if contacts_results:
-            items.extend([await create_integration_item_metadata_object(item, object_type_map.get("contacts")) for item in contacts_results])
-
-        # Fetch deals
-        deals_results = await fetch_hubspot_objects("deals", access_token)
-        if deals_results:
-            items.extend([await create_integration_item_metadata_object(item, object_type_map.get("deals")) for item in deals_results])
+        schemas = await get_hubspot_object_schemas(access_token)
+        portal_id = await get_hubspot_portal_id(access_token)
+        options = crawl_options(object_types=object_types, properties=properties)
+
+        async def iter_object_type(object_type):
+            schema = get_object_schema(schemas, object_type)
+            if schema is None:
+                print(f"Skipping unknown HubSpot object type: {object_type}")
+                return
+            item_type = object_type_map.get(object_type, schema['label'])
+            object_properties = resolve_hubspot_properties(object_type, schema, properties)
+            export_object_type = EXPORT_OBJECT_TYPES.get(object_type) or schema.get('object_type_id')
+
+            total = await get_hubspot_object_count(portal_id, object_type, access_token)
+            if total is not None and total > BULK_EXPORT_THRESHOLD and export_object_type:
+                # Large portals: one export job instead of thousands of paged requests, streamed row by row
+                print(f"Using bulk export for {total} HubSpot {object_type}")
+                exported = 0
+                async for item in stream_hubspot_export(object_type, export_object_type, access_token, object_properties):
+                    yield await create_integration_item_metadata_object(item, item_type, schema.get('display_property'))
+                    exported += 1
+                await set_hubspot_object_count(portal_id, object_type, exported)
+                return
+
+            # Below the export threshold a type is at most BULK_EXPORT_THRESHOLD objects
+            projection_hash = hashlib.sha256(','.join(object_properties).encode('utf-8')).hexdigest()[:8]
+            checkpoint = CrawlCheckpoint(org_id, 'hubspot', access_token, f'{object_type}:{projection_hash}', options, resume)
+            results = await fetch_hubspot_objects(object_type, access_token, properties=object_properties, checkpoint=checkpoint)
+            # Only reached when every page succeeded, so the count is the type's real size
+            await set_hubspot_object_count(portal_id, object_type, len(results))
+            for item in results:
+                yield await create_integration_item_metadata_object(item, item_type, schema.get('display_property'))
+
+        # Object types are crawled concurrently; the outbound limiter keeps the request rate safe
+        count = 0
+        async for item in merge_streams(
+            [iter_object_type(object_type) for object_type in (object_types or ["contacts", "deals", "companies"])],
+            OBJECT_BUFFER_SIZE,
+        ):
+            count += 1
+            yield item
+
+        print(f"Total items fetched: {count}")
+    except Exception as e:
+        detail = getattr(e, 'detail', None) or str(e)
+        print(f"Error in get_items_hubspot: {detail}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch HubSpot items: {detail}")
 
-        # Fetch companies
-        companies_results = await fetch_hubspot_objects("companies", access_token)
-        if companies_results:
-            items.extend([await create_integration_item_metadata_object(item, object_type_map.get("companies")) for item in companies_results])
 
-        print("Final Items List:", json.dumps(items, indent=2))
-        print(f"Total items fetched: {len(items)}")
-        return items
-    except Exception as e:
-        print(f"Error in get_items_hubspot: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to fetch HubSpot items: {str(e)}")
+async def get_items_hubspot(credentials, object_types=None, properties=None, org_id=None, resume=False):
+    """
+    Fetch HubSpot data using credentials and return IntegrationItem objects
+    """
+    return [item async for item in iter_items_hubspot(credentials, object_types, properties, org_id, resume)]
 
 
-async def fetch_hubspot_objects(object_type, access_token, limit=50):
+async def fetch_hubspot_objects(object_type, access_token, limit=100, properties=None, checkpoint=None):
     """
-    Fetch objects of a given type from HubSpot
+    Fetch all objects of a given type from HubSpot, following the paging cursor.
+    With a checkpoint, an interrupted crawl resumes after the last stored page.
     """
     url = f'https://api.hubapi.com/crm/v3/objects/{object_type}'
     headers = {
@@ -238,21 +306,203 @@ async def fetch_hubspot_objects(object_type, access_token, limit=50):
     }
     params = {
         'limit': limit,
-        'properties': ','.join(get_default_properties(object_type)),
+        'properties': ','.join(properties or get_default_properties(object_type)),
         'associations': ','.join(get_associations_for_object(object_type))
     }
 
     async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=params)
-        if response.status_code == 200:
+
+        async def fetch_page(after):
+            page_params = {**params, 'after': after} if after else params
+            response = await upstream_request('hubspot', client, 'GET', url, headers=headers, params=page_params)
+            if response.status_code != 200:
+                raise HTTPException(status_code=response.status_code, detail=f"Failed to fetch {object_type}: {response.text}")
             data = response.json()
-            return data.get('results', [])
-        else:
-            print(f"Failed to fetch {object_type}: {response.status_code} - {response.text}")
-            return []
+            return data.get('results', []), data.get('paging', {}).get('next', {}).get('after')
+
+        # Any failed page fails the crawl: a partial or empty result must never be cached as complete.
+        # Pages fetched before the failure stay in the checkpoint for the resumed crawl.
+        results = []
+        async for page in paginate_with_checkpoint(checkpoint, fetch_page):
+            results.extend(page)
+        return results
+
+
+def hubspot_item_identity(object_type, object_id):
+    """
+    The (id, type) a crawl gives a standard object's IntegrationItem
+    """
+    item_type = object_type_map[object_type]
+    return f"hubspot_{item_type}_{object_id}", item_type
+
+
+async def fetch_hubspot_item(object_type, object_id, access_token):
+    """
+    Fetch one object by id as the IntegrationItem dict a crawl would produce, or None if it no longer exists
+    """
+    schema = get_object_schema(await get_hubspot_object_schemas(access_token), object_type)
+    params = {
+        'properties': ','.join(resolve_hubspot_properties(object_type, schema)),
+        'associations': ','.join(get_associations_for_object(object_type))
+    }
 
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await upstream_request(
+            'hubspot',
+            client,
+            'GET',
+            f'https://api.hubapi.com/crm/v3/objects/{object_type}/{object_id}',
+            headers={'Authorization': f'Bearer {access_token}'},
+            params=params,
+        )
+    if response.status_code == 404:
+        return None
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=f"Failed to fetch {object_type} {object_id}: {response.text}")
+
+    item_type = object_type_map.get(object_type, schema['label'])
+    return await create_integration_item_metadata_object(response.json(), item_type, schema.get('display_property'))
+
+
+async def count_hubspot_objects(object_type, access_token):
+    """
+    Get the total record count for an object type with a single one-result search
+    """
+    url = f'https://api.hubapi.com/crm/v3/objects/{object_type}/search'
+    headers = {
+        'Authorization': f'Bearer {access_token}',
+        'Content-Type': 'application/json'
+    }
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await upstream_request('hubspot', client, 'POST', url, headers=headers, json={'limit': 1})
+        if response.status_code == 200:
+            return response.json().get('total')
+        print(f"Failed to count {object_type}: {response.status_code} - {response.text}")
+        return None
 
-async def search_hubspot_objects(credentials: str, query: str, object_type: str = "contacts"):
+
+def _object_count_key(portal_id, object_type):
+    return f'hubspot_count:{portal_id}:{object_type}'
+
+
+async def get_hubspot_object_count(portal_id, object_type, access_token):
+    """
+    Get an object type's record count, cached per portal like the schema. Counting costs a search
+    request, which shares HubSpot's search rate limit with type-ahead, so it is only sent on a miss.
+    """
+    cached = await get_value_redis(_object_count_key(portal_id, object_type))
+    if cached is not None:
+        return int(cached)
+
+    total = await count_hubspot_objects(object_type, access_token)
+    if total is not None:
+        await set_hubspot_object_count(portal_id, object_type, total)
+    return total
+
+
+async def set_hubspot_object_count(portal_id, object_type, total):
+    # Every crawl knows the real size for free; keep the cached count current with it
+    await add_key_value_redis(_object_count_key(portal_id, object_type), total, expire=SCHEMA_CACHE_TTL_SECONDS)
+
+
+async def start_hubspot_export(object_type, export_object_type, access_token, properties=None):
+    """
+    Start an asynchronous CRM export of every record of an object type, returns the task id.
+    export_object_type is the export API's name for it: CONTACT, COMPANY, DEAL or a custom objectTypeId.
+    """
+    headers = {
+        'Authorization': f'Bearer {access_token}',
+        'Content-Type': 'application/json'
+    }
+    payload = {
+        'exportType': 'VIEW',
+        'exportName': f'integrata_{object_type}_{secrets.token_hex(4)}',
+        'format': 'CSV',
+        'language': 'EN',
+        # Internal names as column headers so rows map straight onto properties
+        'exportInternalValuesOptions': ['NAMES', 'VALUES'],
+        'objectType': export_object_type,
+        'objectProperties': properties or get_default_properties(object_type)
+    }
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await upstream_request('hubspot', client, 'POST', EXPORT_URL, headers=headers, json=payload)
+        if response.status_code not in (200, 202):
+            raise HTTPException(status_code=response.status_code, detail=f"HubSpot export failed to start: {response.text}")
+        return response.json().get('id')
+
+
+async def wait_for_hubspot_export(task_id, access_token):
+    """
+    Poll an export task until it completes, returns the download URL
+    """
+    url = f'{EXPORT_URL}/tasks/{task_id}/status'
+    headers = {'Authorization': f'Bearer {access_token}'}
+    deadline = asyncio.get_running_loop().time() + EXPORT_TIMEOUT_SECONDS
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        while True:
+            response = await upstream_request('hubspot', client, 'GET', url, headers=headers)
+            if response.status_code != 200:
+                raise HTTPException(status_code=response.status_code, detail=f"HubSpot export status failed: {response.text}")
+
+            status = response.json()
+            if status.get('status') == 'COMPLETE':
+                return status.get('result')
+            if status.get('status') in ('CANCELED', 'CANCELLED', 'FAILED'):
+                raise HTTPException(status_code=502, detail=f"HubSpot export {task_id} ended with status {status.get('status')}")
+            if asyncio.get_running_loop().time() > deadline:
+                raise HTTPException(status_code=504, detail=f"HubSpot export {task_id} did not complete in time")
+
+            await asyncio.sleep(EXPORT_POLL_INTERVAL_SECONDS)
+
+
+def _open_export_csv(export_file):
+    """
+    Open the downloaded export as a text stream; large exports arrive as a zip of CSV files
+    """
+    export_file.seek(0)
+    if zipfile.is_zipfile(export_file):
+        archive = zipfile.ZipFile(export_file)
+        for name in archive.namelist():
+            if name.lower().endswith('.csv'):
+                yield io.TextIOWrapper(archive.open(name), encoding='utf-8-sig', newline='')
+        return
+
+    export_file.seek(0)
+    yield io.TextIOWrapper(export_file, encoding='utf-8-sig', newline='')
+
+
+async def stream_hubspot_export(object_type, export_object_type, access_token, properties=None):
+    """
+    Export an object type and yield each row as an API-shaped {'id', 'properties'} dict.
+    The file is streamed to a temporary file and parsed row by row, never held in memory.
+    """
+    task_id = await start_hubspot_export(object_type, export_object_type, access_token, properties)
+    download_url = await wait_for_hubspot_export(task_id, access_token)
+
+    with tempfile.TemporaryFile() as export_file:
+        async with httpx.AsyncClient(timeout=None, follow_redirects=True) as client:
+            async with client.stream('GET', download_url) as response:
+                if response.status_code != 200:
+                    raise HTTPException(status_code=response.status_code, detail=f"HubSpot export download failed for {object_type}")
+                async for chunk in response.aiter_bytes():
+                    export_file.write(chunk)
+
+        for text_stream in _open_export_csv(export_file):
+            for row_number, row in enumerate(csv.DictReader(text_stream), start=1):
+                object_id = row.get('hs_object_id') or row.get('Record ID')
+                yield {
+                    'id': object_id,
+                    'properties': {key: value for key, value in row.items() if value not in (None, '')}
+                }
+                # Let other requests run between batches of synchronous CSV parsing
+                if row_number % EXPORT_PARSE_BATCH_SIZE == 0:
+                    await asyncio.sleep(0)
+
+
+async def search_hubspot_objects(credentials: str, query: str, object_type: str = "contacts", properties=None):
     """
     Search HubSpot objects by query and type using the correct CRM API v3 format
     """
@@ -269,12 +519,18 @@ async def search_hubspot_objects(credentials: str, query: str, object_type: str
             'Content-Type': 'application/json'
         }
 
+        schemas = await get_hubspot_object_schemas(access_token)
+        schema = get_object_schema(schemas, object_type)
+        if schema is None:
+            raise HTTPException(status_code=400, detail=f'Unknown HubSpot object type: {object_type}')
+
         payload = {
             "query": query,
+            "properties": resolve_hubspot_properties(object_type, schema, properties),
         }
 
         async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, headers=headers, json=payload)
+            response = await upstream_request('hubspot', client, 'POST', url, headers=headers, json=payload)
 
             if response.status_code == 200:
                 data = response.json()
@@ -285,7 +541,7 @@ async def search_hubspot_objects(credentials: str, query: str, object_type: str
                 items = []
                 for item in results:
                     try:
-                        integration_item = await create_integration_item_metadata_object(item, object_type_map.get(object_type, object_type.capitalize()))
+                        integration_item = await create_integration_item_metadata_object(item, object_type_map.get(object_type, schema['label']), schema.get('display_property'))
                         items.append(integration_item)
                     except Exception as e:
                         print(f"Error processing item {item.get('id', 'unknown')}: {str(e)}")
@@ -318,7 +574,7 @@ async def search_hubspot_objects(credentials: str, query: str, object_type: str
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
-async def create_integration_item_metadata_object(response_json, object_type: str):
+async def create_integration_item_metadata_object(response_json, object_type: str, display_property: Optional[str] = None):
     """
     Convert a HubSpot API response object to an IntegrationItem
     """
@@ -329,6 +585,8 @@ async def create_integration_item_metadata_object(response_json, object_type: st
 
         # Extract fields
         name = get_object_display_name(properties, object_type)
+        if object_type not in object_type_map.values() and display_property and properties.get(display_property):
+            name = properties[display_property]
         email = properties.get('email')
         phone = properties.get('phone')
         created_at = parse_hubspot_timestamp(response_json.get('createdAt', properties.get('createdate')))
@@ -405,6 +663,126 @@ async def get_hubspot_integration_summary():
         return {"error": str(e)}
 
 
+async def get_hubspot_portal_id(access_token):
+    """
+    Look up the portal (hub) id an access token belongs to, cached alongside the schema
+    """
+    token_key = f'hubspot_portal:{hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:32]}'
+    cached = await get_value_redis(token_key)
+    if cached:
+        return cached.decode('utf-8') if isinstance(cached, bytes) else cached
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await upstream_request('hubspot', client, 'GET', f'https://api.hubapi.com/oauth/v1/access-tokens/{access_token}')
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=f'Failed to look up HubSpot portal: {response.text}')
+
+    portal_id = str(response.json().get('hub_id'))
+    await add_key_value_redis(token_key, portal_id, expire=SCHEMA_CACHE_TTL_SECONDS)
+    return portal_id
+
+
+def _schema_entry(label, properties, display_property=None, object_type_id=None):
+    return {
+        'label': label,
+        'object_type_id': object_type_id,
+        'display_property': display_property,
+        'properties': [prop.get('name') for prop in properties if not prop.get('hidden')],
+    }
+
+
+async def discover_hubspot_object_schemas(access_token):
+    """
+    Discover properties for the standard objects and all custom object schemas of a portal
+    """
+    headers = {'Authorization': f'Bearer {access_token}'}
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        responses = await asyncio.gather(
+            upstream_request('hubspot', client, 'GET', 'https://api.hubapi.com/crm/v3/schemas', headers=headers),
+            *[
+                upstream_request('hubspot', client, 'GET', f'https://api.hubapi.com/crm/v3/properties/{object_type}', headers=headers)
+                for object_type in STANDARD_OBJECT_TYPES
+            ]
+        )
+
+    custom_response, standard_responses = responses[0], responses[1:]
+    schemas = {}
+
+    for object_type, response in zip(STANDARD_OBJECT_TYPES, standard_responses):
+        if response.status_code == 200:
+            schemas[object_type] = _schema_entry(object_type_map[object_type], response.json().get('results', []))
+        else:
+            print(f"Failed to fetch {object_type} properties: {response.status_code} - {response.text}")
+
+    if custom_response.status_code == 200:
+        for custom in custom_response.json().get('results', []):
+            entry = _schema_entry(
+                custom.get('labels', {}).get('singular') or custom.get('name'),
+                custom.get('properties', []),
+                custom.get('primaryDisplayProperty'),
+                custom.get('objectTypeId'),
+            )
+            # Custom objects are addressable by name, fully qualified name or object type id
+            for alias in {custom.get('name'), custom.get('fullyQualifiedName'), custom.get('objectTypeId')}:
+                if alias:
+                    schemas[alias] = entry
+    else:
+        print(f"Failed to fetch custom object schemas: {custom_response.status_code} - {custom_response.text}")
+
+    return schemas
+
+
+async def get_hubspot_object_schemas(access_token):
+    """
+    Get the portal's object schemas from Redis, discovering and caching them on a miss
+    """
+    portal_id = await get_hubspot_portal_id(access_token)
+    cache_key = f'hubspot_schema:{portal_id}'
+
+    cached = await get_value_redis(cache_key)
+    if cached:
+        return json.loads(cached)
+
+    schemas = await discover_hubspot_object_schemas(access_token)
+    # Don't pin a partial discovery (e.g. a transient error) for the whole TTL
+    if all(object_type in schemas for object_type in STANDARD_OBJECT_TYPES):
+        await add_key_value_redis(cache_key, json.dumps(schemas), expire=SCHEMA_CACHE_TTL_SECONDS)
+    return schemas
+
+
+def get_object_schema(schemas, object_type):
+    """
+    Find an object type's schema, falling back to an open schema for standard objects
+    whose properties could not be discovered
+    """
+    schema = schemas.get(object_type)
+    if schema is None and object_type in STANDARD_OBJECT_TYPES:
+        schema = _schema_entry(object_type_map[object_type], [])
+    return schema
+
+
+def resolve_hubspot_properties(object_type, schema, requested=None):
+    """
+    Build the property list to fetch: the requested projection limited to properties
+    that exist in the schema, or the defaults for the object type
+    """
+    # An empty schema means discovery failed, so every property is passed through
+    known = set(schema.get('properties', []))
+
+    if requested:
+        unknown = [prop for prop in requested if known and prop not in known]
+        if unknown:
+            print(f"Ignoring unknown {object_type} properties: {unknown}")
+        selected = [prop for prop in requested if prop not in unknown]
+    elif object_type in STANDARD_OBJECT_TYPES:
+        selected = get_default_properties(object_type)
+    else:
+        selected = [schema['display_property']] if schema.get('display_property') else []
+
+    return list(dict.fromkeys(selected + [prop for prop in BASE_PROPERTIES if prop in known or not known]))
+
+
 def get_associations_for_object(object_type):
     """
     Get relevant associations for each object type
@@ -1,6 +1,13 @@
 from datetime import datetime
 from typing import Optional, List
 
+def _isoformat(value):
+    # Some connectors pass the provider's timestamp string through unparsed
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
 class IntegrationItem:
     def __init__(
         self,
@@ -48,8 +55,8 @@ class IntegrationItem:
             "parent_path_or_name": self.parent_path_or_name,
             "parent_id": self.parent_id,
             "name": self.name,
-            "creation_time": self.creation_time.isoformat() if self.creation_time else None,
-            "last_modified_time": self.last_modified_time.isoformat() if self.last_modified_time else None,
+            "creation_time": _isoformat(self.creation_time),
+            "last_modified_time": _isoformat(self.last_modified_time),
             "url": self.url,
             "children": self.children,
             "mime_type": self.mime_type,
@@ -7,8 +7,8 @@ from fastapi.responses import HTMLResponse
 import httpx
 import asyncio
 import base64
-import requests
 from integrations.integration_item import IntegrationItem
+from integrations.outbound import upstream_request
 
 from redis_client import add_key_value_redis, get_value_redis, delete_key_redis
 
@@ -135,24 +135,52 @@ def create_integration_item_metadata_object(
 
     return integration_item_metadata
 
+async def fetch_notion_item(entity_type, entity_id, access_token):
+    """Fetches one page or database as the item dict a crawl would produce, or None if it is gone"""
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await upstream_request(
+            'notion',
+            client,
+            'GET',
+            f'https://api.notion.com/v1/{"databases" if entity_type == "database" else "pages"}/{entity_id}',
+            headers={
+                'Authorization': f'Bearer {access_token}',
+                'Notion-Version': '2022-06-28',
+            },
+        )
+
+    if response.status_code == 404:
+        return None
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=f'Failed to fetch Notion {entity_type} {entity_id}: {response.text}')
+    result = response.json()
+    # Search never returns archived pages, so neither does the overlay
+    if result.get('archived') or result.get('in_trash'):
+        return None
+    return create_integration_item_metadata_object(result).to_dict()
+
 async def get_items_notion(credentials) -> list[IntegrationItem]:
     """Aggregates all metadata relevant for a notion integration"""
     credentials = json.loads(credentials)
-    response = requests.post(
-        'https://api.notion.com/v1/search',
-        headers={
-            'Authorization': f'Bearer {credentials.get("access_token")}',
-            'Notion-Version': '2022-06-28',
-        },
-    )
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await upstream_request(
+            'notion',
+            client,
+            'POST',
+            'https://api.notion.com/v1/search',
+            headers={
+                'Authorization': f'Bearer {credentials.get("access_token")}',
+                'Notion-Version': '2022-06-28',
+            },
+        )
 
+    list_of_integration_item_metadata = []
     if response.status_code == 200:
         results = response.json()['results']
-        list_of_integration_item_metadata = []
         for result in results:
             list_of_integration_item_metadata.append(
                 create_integration_item_metadata_object(result)
             )
 
         print(list_of_integration_item_metadata)
-    return
+    return list_of_integration_item_metadata
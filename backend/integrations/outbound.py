@@ -0,0 +1,208 @@
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import httpx
+
+# Starting concurrency per provider; the controller moves each limit from there
+INITIAL_CONCURRENCY = {
+    'airtable': 5,
+    'notion': 3,
+    'hubspot': 10,
+}
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = int(os.environ.get('UPSTREAM_MAX_CONCURRENCY', 64))
+
+# Multiplicative decrease applied on throttling, server errors and timeouts
+BACKOFF_RATIO = float(os.environ.get('UPSTREAM_BACKOFF_RATIO', 0.7))
+# Smoothed latency above this multiple of its route's baseline pauses growth
+LATENCY_TOLERANCE = float(os.environ.get('UPSTREAM_LATENCY_TOLERANCE', 2.0))
+LATENCY_SMOOTHING = 0.2
+# Each sample lifts a route's baseline this fraction of the way to it, so the minimum follows lasting shifts
+BASELINE_DECAY = 0.01
+API_VERSION_SEGMENT = re.compile(r'v\d+')
+
+
+def is_overloaded(status_code: int) -> bool:
+    """Providers answer 429 when throttling us and 5xx when overloaded"""
+    return status_code == 429 or status_code >= 500
+
+
+def route_class(method: str, url: str) -> str:
+    """
+    Group requests that should take about as long: same method and path, with ids masked.
+    Path segments containing a digit (record ids, base ids, tokens), other than API versions, are treated as ids.
+    """
+    segments = [
+        '*' if re.search(r'\d', segment) and not API_VERSION_SEGMENT.fullmatch(segment) else segment
+        for segment in urlsplit(url).path.split('/')
+    ]
+    return f"{method} {'/'.join(segments)}"
+
+
+class RouteLatency:
+    """Smoothed latency of one route class, against a decaying minimum"""
+
+    def __init__(self, latency: float):
+        self.smoothed = self.baseline = latency
+
+    def observe(self, latency: float):
+        self.smoothed += LATENCY_SMOOTHING * (latency - self.smoothed)
+        self.baseline = min(latency, self.baseline + BASELINE_DECAY * (latency - self.baseline))
+
+    @property
+    def spiking(self) -> bool:
+        return self.smoothed > self.baseline * LATENCY_TOLERANCE
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit for one upstream provider.
+    A healthy response adds 1/limit while at least half the window is in use, about +1 per round trip.
+    A 429, 5xx or timeout multiplies the limit by BACKOFF_RATIO, at most once per smoothed round trip
+    so a burst of 429s from one window counts as a single signal.
+    Latency is tracked per route class, since a provider's endpoints differ widely (a token lookup vs.
+    a search vs. a page with associations). A route running slow against its own baseline only pauses
+    growth; latency alone never shrinks the limit.
+    """
+
+    def __init__(self, provider: str, initial_limit: int, min_limit: int = MIN_CONCURRENCY, max_limit: int = MAX_CONCURRENCY):
+        self.provider = provider
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.in_flight = 0
+        self.waiters = deque()
+        self.routes = {}
+        self.smoothed_latency = None
+        self.last_decrease = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.increases = 0
+        self.decreases = 0
+
+    def _dispatch(self):
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    async def acquire(self):
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before cancellation, hand the slot back
+                self.in_flight -= 1
+                self._dispatch()
+            raise
+
+    def _observe_latency(self, route, latency) -> RouteLatency:
+        # The provider-wide average only paces decreases, it is never compared against a baseline
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+        else:
+            self.smoothed_latency += LATENCY_SMOOTHING * (latency - self.smoothed_latency)
+
+        if route not in self.routes:
+            self.routes[route] = RouteLatency(latency)
+        else:
+            self.routes[route].observe(latency)
+        return self.routes[route]
+
+    def _decrease(self, now):
+        # Responses already in flight when we backed off carry no new information
+        if now - self.last_decrease < (self.smoothed_latency or 0):
+            return
+        self.limit = max(self.min_limit, self.limit * BACKOFF_RATIO)
+        self.last_decrease = now
+        self.decreases += 1
+
+    def release(self, latency: float = None, overloaded: bool = False, route: str = ''):
+        """
+        Return a slot and feed the outcome to the controller. latency is None when the request
+        failed without telling us anything about upstream health. route is the request's route_class.
+        """
+        was_saturated = self.in_flight * 2 >= self.limit
+        self.in_flight -= 1
+        self.requests += 1
+        now = time.monotonic()
+
+        if overloaded:
+            self.throttled += 1
+            self._decrease(now)
+        elif latency is not None:
+            route_latency = self._observe_latency(route, latency)
+            # Only grow while the window is actually used, otherwise idle periods inflate the limit.
+            # A slow route holds the limit; if we are really too many, the provider answers 429.
+            if was_saturated and self.limit < self.max_limit and not route_latency.spiking:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.increases += 1
+
+        self._dispatch()
+
+    def metrics(self) -> dict:
+        return {
+            'limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'queued': sum(1 for waiter in self.waiters if not waiter.done()),
+            'smoothed_latency_ms': round(self.smoothed_latency * 1000, 1) if self.smoothed_latency is not None else None,
+            'routes': {
+                route: {'baseline_ms': round(latency.baseline * 1000, 1), 'smoothed_ms': round(latency.smoothed * 1000, 1)}
+                for route, latency in self.routes.items()
+            },
+            'requests': self.requests,
+            'throttled': self.throttled,
+            'increases': self.increases,
+            'decreases': self.decreases,
+        }
+
+
+limiters = {}
+
+
+def get_limiter(provider: str) -> AdaptiveConcurrencyLimiter:
+    if provider not in limiters:
+        limiters[provider] = AdaptiveConcurrencyLimiter(provider, INITIAL_CONCURRENCY.get(provider, MIN_CONCURRENCY))
+    return limiters[provider]
+
+
+def upstream_metrics() -> dict:
+    return {provider: limiter.metrics() for provider, limiter in limiters.items()}
+
+
+async def upstream_request(provider: str, client: 'httpx.AsyncClient', method: str, url: str, **kwargs) -> 'httpx.Response':
+    """
+    Send one request to a provider API under that provider's adaptive concurrency limit
+    """
+    # Imported here so that importing this module (e.g. for /metrics/upstream) keeps httpx off startup
+    import httpx
+
+    limiter = get_limiter(provider)
+    route = route_class(method, url)
+    await limiter.acquire()
+    started = time.monotonic()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.TimeoutException:
+        limiter.release(overloaded=True)
+        raise
+    except BaseException:
+        limiter.release()
+        raise
+
+    limiter.release(time.monotonic() - started, overloaded=is_overloaded(response.status_code), route=route)
+    return response
@@ -0,0 +1,148 @@
+import base64
+import json
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from integrations.integration_item import IntegrationItem
+from snapshots import SnapshotOverlay, get_overlay, iter_overlaid_items
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(snapshot_id: str, position: int) -> str:
+    """
+    Encode a position in a crawl snapshot into an opaque cursor string
+    """
+    payload = json.dumps({'snapshot': snapshot_id, 'position': position}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('utf-8')
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[Optional[str], int]:
+    """
+    Decode a cursor produced by encode_cursor into (snapshot id, position).
+    No cursor means the first page of a new snapshot.
+    """
+    if not cursor:
+        return None, 0
+
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor).decode('utf-8'))
+        snapshot_id, position = payload['snapshot'], payload['position']
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f'Invalid cursor: {str(e)}')
+
+    if not isinstance(snapshot_id, str) or not isinstance(position, int) or position < 0:
+        raise HTTPException(status_code=400, detail='Invalid cursor: position out of range')
+    return snapshot_id, position
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """
+    Normalize a datetime or ISO-8601 string into a timezone-aware datetime
+    """
+    if not value:
+        return None
+
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Parse a comma separated field projection, e.g. 'id,name,type'
+    """
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(',') if field.strip()]
+
+
+def _get_attr(item, key):
+    if isinstance(item, dict):
+        return item.get(key)
+    return getattr(item, key, None)
+
+
+def _to_dict(item) -> dict:
+    if isinstance(item, IntegrationItem):
+        return item.to_dict()
+    return item
+
+
+def _matches(item, wanted_types, since) -> bool:
+    if wanted_types and str(_get_attr(item, 'type') or '').lower() not in wanted_types:
+        return False
+    if since is not None:
+        modified = parse_timestamp(_get_attr(item, 'last_modified_time'))
+        return modified is not None and modified >= since
+    return True
+
+
+async def paginate_snapshot(
+    snapshot: dict,
+    limit: int = DEFAULT_PAGE_SIZE,
+    position: int = 0,
+    item_type: Optional[str] = None,
+    modified_since: Optional[str] = None,
+    fields: Optional[str] = None,
+    overlay: Optional[SnapshotOverlay] = None,
+) -> dict:
+    """
+    Filter, slice and project one page of a crawl snapshot, reading only the chunks the page covers.
+    The changes webhooks reported since the crawl are merged in from the snapshot's overlay, which is
+    read unless given. Positions index the unfiltered snapshot, with created items after its last one,
+    so a cursor stays valid whatever filters the next page uses.
+    total is None when modified_since is set, since counting would mean reading the whole snapshot.
+    """
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f'limit must be between 1 and {MAX_PAGE_SIZE}')
+
+    since = None
+    if modified_since:
+        since = parse_timestamp(modified_since)
+        if since is None:
+            raise HTTPException(status_code=400, detail=f'Invalid modified_since timestamp: {modified_since}')
+
+    wanted_types = {t.strip().lower() for t in item_type.split(',') if t.strip()} if item_type else None
+    projection = parse_fields(fields)
+
+    if overlay is None:
+        overlay = await get_overlay(snapshot)
+
+    results = []
+    next_position = None
+    async for index, item in iter_overlaid_items(snapshot, overlay, position):
+        if not _matches(item, wanted_types, since):
+            continue
+        if len(results) == limit:
+            # Point the cursor at the next match, so the last page is never an empty one
+            next_position = index
+            break
+        item_dict = _to_dict(item)
+        if projection:
+            item_dict = {field: item_dict.get(field) for field in projection}
+        results.append(item_dict)
+
+    if since is not None:
+        total = None
+    elif wanted_types:
+        total = sum(overlay.type_count(snapshot, t) for t in wanted_types)
+    else:
+        total = overlay.total(snapshot)
+
+    return {
+        'items': results,
+        'total': total,
+        'next_cursor': encode_cursor(snapshot['id'], next_position) if next_position is not None else None,
+    }
@@ -0,0 +1,61 @@
+import importlib
+import time
+
+# Connector modules are imported on first use: each pulls in httpx/requests and friends,
+# which dominates cold start when imported eagerly from main
+CONNECTOR_MODULES = {
+    'airtable': 'integrations.airtable',
+    'notion': 'integrations.notion',
+    'hubspot': 'integrations.hubspot'
+}
+
+# Load options each connector's crawl accepts (see crawl_options)
+CONNECTOR_LOAD_OPTIONS = {
+    'airtable': ('include_records', 'record_fields'),
+    'notion': (),
+    'hubspot': ('object_types', 'properties'),
+}
+
+_loaded_connectors = {}
+connector_import_times = {}
+
+
+def get_connector(provider: str):
+    """
+    Return the connector module for a provider, importing it on first use
+    """
+    module = _loaded_connectors.get(provider)
+    if module is None:
+        module_name = CONNECTOR_MODULES.get(provider)
+        if module_name is None:
+            raise KeyError(f'Unknown integration provider: {provider}')
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        connector_import_times[provider] = round(time.perf_counter() - started, 4)
+        _loaded_connectors[provider] = module
+    return module
+
+
+def get_crawl(provider: str):
+    """
+    Return a provider's crawl: iter_items_<provider> for connectors that stream their items,
+    get_items_<provider> (returning a list) for the rest
+    """
+    connector = get_connector(provider)
+    return getattr(connector, f'iter_items_{provider}', None) or getattr(connector, f'get_items_{provider}')
+
+
+def unsupported_load_options(provider: str, options: dict) -> list:
+    return [name for name in options if name not in CONNECTOR_LOAD_OPTIONS.get(provider, ())]
+
+
+def is_connector_loaded(provider: str) -> bool:
+    return provider in _loaded_connectors
+
+
+def preload_connectors(providers=None):
+    """
+    Import connectors ahead of the first request, e.g. from a warm-up thread
+    """
+    for provider in providers or CONNECTOR_MODULES:
+        get_connector(provider)
@@ -0,0 +1,46 @@
+import asyncio
+from contextlib import aclosing
+
+
+class _Failed:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+async def merge_streams(streams, buffer_size: int):
+    """
+    Run several async iterators concurrently and yield their items as they arrive.
+    At most buffer_size items wait for the consumer, so memory stays flat however much the streams produce.
+    The first error cancels the other streams and is raised to the consumer, so a partial
+    result is never mistaken for a complete one.
+    """
+    queue = asyncio.Queue(maxsize=buffer_size)
+    done = object()
+
+    async def drain(stream):
+        try:
+            # Closing the stream when the worker is cancelled lets it release what it holds (e.g. checkpoint locks)
+            async with aclosing(stream):
+                async for item in stream:
+                    await queue.put(item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(_Failed(e))
+            return
+        await queue.put(done)
+
+    workers = [asyncio.create_task(drain(stream)) for stream in streams]
+    remaining = len(workers)
+    try:
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+                continue
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+    finally:
+        for worker in workers:
+            worker.cancel()
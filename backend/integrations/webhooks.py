@@ -0,0 +1,350 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from datetime import datetime
+
+from fastapi import Request, HTTPException
+
+from integrations.registry import get_connector
+from redis_client import (
+    add_key_value_redis,
+    add_key_value_redis_if_absent,
+    add_set_members_redis,
+    get_value_redis,
+    pop_list_redis,
+    pop_set_members_redis,
+    push_list_redis,
+)
+from shared_cache import DEFAULT_TTL_SECONDS, invalidate
+from snapshots import SNAPSHOT_TTL_SECONDS, overlay_key, record_overlay_change
+
+WEBHOOK_QUEUE_KEY = 'webhook_events'
+# Providers retry deliveries for up to a few days; remember event ids for a week
+DEDUPE_TTL_SECONDS = 7 * 24 * 3600
+# HubSpot v3 signatures older than this are rejected to prevent replays
+HUBSPOT_MAX_TIMESTAMP_SKEW_MS = 5 * 60 * 1000
+
+NOTION_VERIFICATION_TOKEN_KEY = 'notion_webhook_verification_token'
+AIRTABLE_WEBHOOK_MAC_SECRET = os.environ.get('AIRTABLE_WEBHOOK_MAC_SECRET', '')
+
+# Providers whose events name the changed object, so it is fetched into the account's overlay.
+# Airtable notifications are pings without object data: they invalidate the account's cached loads instead.
+OVERLAY_PROVIDERS = ('hubspot', 'notion')
+# HubSpot subscription types are '<object>.<action>'; only standard objects map to crawled items
+HUBSPOT_EVENT_OBJECT_TYPES = {'contact': 'contacts', 'company': 'companies', 'deal': 'deals'}
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _parse_body(body: bytes):
+    try:
+        return json.loads(body)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f'Invalid webhook payload: {str(e)}')
+
+
+async def _enqueue_events(provider: str, events) -> dict:
+    """
+    Drop events already seen (providers deliver at least once) and queue the rest
+    """
+    accepted = 0
+    duplicates = 0
+    for event_id, account_id, event in events:
+        is_new = await add_key_value_redis_if_absent(f'webhook_event:{provider}:{event_id}', 1, expire=DEDUPE_TTL_SECONDS)
+        if not is_new:
+            duplicates += 1
+            continue
+        envelope = {'provider': provider, 'account_id': account_id, 'event': event}
+        await push_list_redis(WEBHOOK_QUEUE_KEY, json.dumps(envelope))
+        accepted += 1
+
+    return {'accepted': accepted, 'duplicates': duplicates}
+
+
+def verify_hubspot_signature(method: str, url: str, body: bytes, signature: str, timestamp: str) -> bool:
+    """
+    Verify a HubSpot v3 webhook signature: base64(HMAC-SHA256(secret, method + uri + body + timestamp))
+    """
+    if not signature or not timestamp:
+        return False
+
+    try:
+        if abs(time.time() * 1000 - int(timestamp)) > HUBSPOT_MAX_TIMESTAMP_SKEW_MS:
+            return False
+    except ValueError:
+        return False
+
+    source = f'{method}{url}{body.decode("utf-8")}{timestamp}'.encode('utf-8')
+    expected = base64.b64encode(hmac.new(get_connector('hubspot').CLIENT_SECRET.encode('utf-8'), source, hashlib.sha256).digest()).decode('utf-8')
+    return hmac.compare_digest(expected, signature)
+
+
+def verify_notion_signature(body: bytes, signature: str, verification_token: str) -> bool:
+    """
+    Verify a Notion webhook signature: 'sha256=' + hex(HMAC-SHA256(verification_token, body))
+    """
+    if not signature or not verification_token:
+        return False
+    expected = 'sha256=' + hmac.new(verification_token.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def verify_airtable_signature(body: bytes, signature: str, mac_secret: str) -> bool:
+    """
+    Verify an Airtable webhook notification: 'hmac-sha256=' + hex(HMAC-SHA256(base64decode(macSecret), body))
+    """
+    if not signature or not mac_secret:
+        return False
+    expected = 'hmac-sha256=' + hmac.new(base64.b64decode(mac_secret), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+async def receive_hubspot_webhook(request: Request):
+    """
+    Verify and queue a batch of HubSpot CRM webhook events
+    """
+    body = await request.body()
+    if not verify_hubspot_signature(
+        request.method,
+        str(request.url),
+        body,
+        request.headers.get('X-HubSpot-Signature-v3'),
+        request.headers.get('X-HubSpot-Request-Timestamp'),
+    ):
+        raise HTTPException(status_code=401, detail='Invalid HubSpot webhook signature')
+
+    events = _parse_body(body)
+    if isinstance(events, dict):
+        events = [events]
+
+    return await _enqueue_events('hubspot', [
+        (event.get('eventId'), str(event.get('portalId')), event) for event in events
+    ])
+
+
+async def receive_notion_webhook(request: Request):
+    """
+    Verify and queue a Notion webhook event, or store the verification token on subscription setup
+    """
+    body = await request.body()
+    payload = _parse_body(body)
+
+    # The first request after creating a subscription only carries the verification token. It is unsigned,
+    # so it is only accepted while no token is configured: NOTION_WEBHOOK_VERIFICATION_TOKEN always wins,
+    # and a stored token is never replaced.
+    if 'verification_token' in payload and 'type' not in payload:
+        if os.environ.get('NOTION_WEBHOOK_VERIFICATION_TOKEN') or not await add_key_value_redis_if_absent(
+            NOTION_VERIFICATION_TOKEN_KEY, payload['verification_token']
+        ):
+            raise HTTPException(status_code=409, detail='A Notion webhook verification token is already configured')
+        return {'verified': True}
+
+    verification_token = os.environ.get('NOTION_WEBHOOK_VERIFICATION_TOKEN') or _decode(await get_value_redis(NOTION_VERIFICATION_TOKEN_KEY))
+    if not verify_notion_signature(body, request.headers.get('X-Notion-Signature'), verification_token):
+        raise HTTPException(status_code=401, detail='Invalid Notion webhook signature')
+
+    return await _enqueue_events('notion', [
+        (payload.get('id'), payload.get('workspace_id'), payload)
+    ])
+
+
+async def receive_airtable_webhook(request: Request):
+    """
+    Verify and queue an Airtable webhook notification
+    """
+    body = await request.body()
+    if not verify_airtable_signature(body, request.headers.get('X-Airtable-Content-MAC'), AIRTABLE_WEBHOOK_MAC_SECRET):
+        raise HTTPException(status_code=401, detail='Invalid Airtable webhook signature')
+
+    payload = _parse_body(body)
+    base_id = payload.get('base', {}).get('id')
+    webhook_id = payload.get('webhook', {}).get('id')
+
+    return await _enqueue_events('airtable', [
+        (f"{webhook_id}:{payload.get('timestamp')}", base_id, payload)
+    ])
+
+
+def _account_index_key(provider: str, account_id: str) -> str:
+    return f'cache_accounts:{provider}:{account_id}'
+
+
+def _account_token_key(provider: str, account_id: str) -> str:
+    return f'webhook_account_token:{provider}:{account_id}'
+
+
+class CrawlAccounts:
+    """
+    The upstream accounts a crawl covers, identified the way their webhooks identify them:
+    HubSpot portal id, Notion workspace id, Airtable base id
+    """
+
+    def __init__(self, provider: str, credentials: str):
+        self.provider = provider
+        self.credentials = credentials
+        self.account_ids = set()
+
+    def observe(self, item: dict):
+        # An Airtable token can reach many bases; each base's notifications come separately
+        if self.provider == 'airtable' and item.get('type') == 'Base':
+            self.account_ids.add(item['id'].removesuffix('_Base'))
+
+    async def resolve(self) -> set:
+        credentials = json.loads(self.credentials)
+        if self.provider == 'hubspot':
+            try:
+                self.account_ids.add(await get_connector('hubspot').get_hubspot_portal_id(credentials.get('access_token')))
+            except HTTPException as e:
+                print(f"Cannot watch HubSpot webhooks for this crawl: {e.detail}")
+        elif self.provider == 'notion' and credentials.get('workspace_id'):
+            self.account_ids.add(credentials['workspace_id'])
+        return self.account_ids
+
+
+def crawl_overlays(provider: str, account_ids) -> list:
+    """
+    The overlay keys a crawl's snapshot merges (see SnapshotWriter.close)
+    """
+    if provider not in OVERLAY_PROVIDERS:
+        return []
+    return [overlay_key(provider, account_id) for account_id in account_ids]
+
+
+async def watch_accounts(provider: str, account_ids, cache_key: str, credentials: str):
+    """
+    Prepare each account's webhook events to reach the crawl: remember the access token the worker
+    fetches changed objects with, or for Airtable which cached load covers the base, to invalidate it
+    """
+    access_token = json.loads(credentials).get('access_token')
+    for account_id in account_ids:
+        if provider in OVERLAY_PROVIDERS:
+            # Kept as long as a snapshot of the account may be read; every new crawl refreshes it
+            await add_key_value_redis(_account_token_key(provider, account_id), access_token, expire=SNAPSHOT_TTL_SECONDS)
+        else:
+            # Outlives no cache entry it points at; every new crawl refreshes it
+            await add_set_members_redis(_account_index_key(provider, account_id), cache_key, expire=DEFAULT_TTL_SECONDS)
+
+
+async def invalidate_account(provider: str, account_id: str) -> int:
+    """
+    Drop every cached load covering an account, so the next load crawls it again.
+    Snapshots already being paged through are left alone and stay consistent.
+    """
+    cache_keys = await pop_set_members_redis(_account_index_key(provider, account_id))
+    for cache_key in cache_keys:
+        await invalidate(_decode(cache_key))
+    return len(cache_keys)
+
+
+def _event_time(value) -> float:
+    # HubSpot sends epoch milliseconds, Notion an ISO-8601 timestamp
+    try:
+        if isinstance(value, (int, float)):
+            return value / 1000
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return time.time()
+
+
+async def _record_fetched(provider: str, account_id: str, item_id: str, item_type: str, item, at: float, created: bool):
+    # A fetch that finds nothing means the object is gone by now; a created one never reached any snapshot
+    if item is None and created:
+        return
+    await record_overlay_change(overlay_key(provider, account_id), item_id, item_type, item, at, created=created)
+
+
+async def apply_hubspot_event(portal_id: str, event: dict, access_token: str):
+    """
+    Fetch the object a HubSpot event names into the portal's overlay, or record its deletion
+    """
+    subject, _, action = str(event.get('subscriptionType', '')).partition('.')
+    object_type = HUBSPOT_EVENT_OBJECT_TYPES.get(subject)
+    if object_type is None:
+        print(f"Ignoring HubSpot webhook event: {event.get('subscriptionType')}")
+        return
+
+    hubspot = get_connector('hubspot')
+    at = _event_time(event.get('occurredAt', time.time() * 1000))
+    if action in ('deletion', 'privacyDeletion'):
+        item_id, item_type = hubspot.hubspot_item_identity(object_type, event.get('objectId'))
+        await record_overlay_change(overlay_key('hubspot', portal_id), item_id, item_type, None, at)
+        return
+    if action == 'merge':
+        # The merged objects live on as the primary one, which is refetched below
+        for merged_id in event.get('mergedObjectIds', []):
+            item_id, item_type = hubspot.hubspot_item_identity(object_type, merged_id)
+            await record_overlay_change(overlay_key('hubspot', portal_id), item_id, item_type, None, at)
+    elif action not in ('creation', 'propertyChange', 'restore', 'associationChange'):
+        print(f"Ignoring HubSpot webhook event: {event.get('subscriptionType')}")
+        return
+
+    # Association changes name both ends; the subscribed object is the 'from' side
+    object_id = event.get('fromObjectId') if action == 'associationChange' else event.get('objectId')
+    item_id, item_type = hubspot.hubspot_item_identity(object_type, object_id)
+    item = await hubspot.fetch_hubspot_item(object_type, object_id, access_token)
+    await _record_fetched('hubspot', portal_id, item_id, item_type, item, at, action == 'creation')
+
+
+async def apply_notion_event(workspace_id: str, event: dict, access_token: str):
+    """
+    Fetch the page or database a Notion event names into the workspace's overlay, or record its deletion
+    """
+    entity = event.get('entity') or {}
+    entity_type = entity.get('type')
+    if entity_type not in ('page', 'database') or not entity.get('id'):
+        # e.g. comment events: comments are not crawled
+        print(f"Ignoring Notion webhook event: {event.get('type')}")
+        return
+
+    action = str(event.get('type', '')).partition('.')[2]
+    at = _event_time(event.get('timestamp'))
+    if action == 'deleted':
+        await record_overlay_change(overlay_key('notion', workspace_id), entity['id'], entity_type, None, at)
+        return
+    item = await get_connector('notion').fetch_notion_item(entity_type, entity['id'], access_token)
+    await _record_fetched('notion', workspace_id, entity['id'], entity_type, item, at, action == 'created')
+
+
+async def apply_webhook_event(envelope: dict):
+    provider = envelope.get('provider')
+    account_id = str(envelope.get('account_id'))
+    if provider == 'airtable':
+        await invalidate_account(provider, account_id)
+        # The notification may be a schema change
+        await invalidate(get_connector('airtable').base_tables_cache_key(account_id))
+        return
+    if provider not in OVERLAY_PROVIDERS:
+        print(f"Ignoring webhook event for unknown provider: {provider}")
+        return
+
+    access_token = _decode(await get_value_redis(_account_token_key(provider, account_id)))
+    if not access_token:
+        # No live snapshot covers this account, so there is nothing to keep current
+        return
+    if provider == 'hubspot':
+        await apply_hubspot_event(account_id, envelope.get('event') or {}, access_token)
+    else:
+        await apply_notion_event(account_id, envelope.get('event') or {}, access_token)
+
+
+async def run_webhook_worker(poll_timeout=5):
+    """
+    Drain the webhook queue forever, applying each event to its account's overlay, or for Airtable
+    invalidating the account's cached loads
+    """
+    while True:
+        try:
+            raw = await pop_list_redis(WEBHOOK_QUEUE_KEY, timeout=poll_timeout)
+            if raw is None:
+                continue
+            await apply_webhook_event(json.loads(_decode(raw)))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error applying webhook event: {str(e)}")
+            await asyncio.sleep(1)
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+
+LOOP_MONITOR_INTERVAL_SECONDS = float(os.environ.get('LOOP_MONITOR_INTERVAL', 0.5))
+
+
+class EventLoopLagMonitor:
+    """
+    Measures event loop lag: how late a periodic sleep wakes up compared to when it was due.
+    A blocked loop (synchronous I/O, huge json.dumps) shows up as lag.
+    """
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL_SECONDS):
+        self.interval = interval
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.last_tick = None
+        self.task = None
+        self.heartbeat = time.monotonic()
+        self.loop_thread_id = None
+        self.watchdog = None
+        self.blocked_episodes = 0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        while True:
+            self.heartbeat = time.monotonic()
+            due = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - due)
+            self.max_lag = max(self.max_lag, self.last_lag)
+            self.last_tick = time.time()
+
+    def start(self, blocking_threshold_ms: float = 0):
+        # A positive threshold also starts the watchdog thread that logs blocked-loop stacks
+        self.task = asyncio.create_task(self.run())
+        if blocking_threshold_ms > 0:
+            self.watchdog = BlockingWatchdog(self, blocking_threshold_ms / 1000)
+            self.watchdog.start()
+        return self.task
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.watchdog is not None:
+            self.watchdog.stop()
+
+    def stats(self) -> dict:
+        return {
+            'last_lag_ms': round(self.last_lag * 1000, 1),
+            'max_lag_ms': round(self.max_lag * 1000, 1),
+            'seconds_since_tick': round(time.time() - self.last_tick, 1) if self.last_tick else None,
+            'blocked_episodes': self.blocked_episodes,
+        }
+
+
+class BlockingWatchdog(threading.Thread):
+    """
+    Runs outside the event loop and logs the loop thread's stack once per blocking episode,
+    i.e. whenever the monitor's heartbeat is older than its sleep interval plus the threshold
+    """
+
+    def __init__(self, monitor: EventLoopLagMonitor, threshold: float):
+        super().__init__(name='event-loop-watchdog', daemon=True)
+        self.monitor = monitor
+        self.threshold = threshold
+        self.stopped = threading.Event()
+
+    def run(self):
+        reported_heartbeat = None
+        while not self.stopped.wait(min(self.threshold, self.monitor.interval) / 2):
+            heartbeat = self.monitor.heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.monitor.interval
+            if blocked_for < self.threshold or heartbeat == reported_heartbeat:
+                continue
+
+            reported_heartbeat = heartbeat
+            self.monitor.blocked_episodes += 1
+            frame = sys._current_frames().get(self.monitor.loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else '<no stack>'
+            print(f"Event loop blocked for {blocked_for * 1000:.0f} ms, loop thread stack:\n{stack}")
+
+    def stop(self):
+        self.stopped.set()
+
+
+loop_monitor = EventLoopLagMonitor()
@@ -1,11 +1,88 @@
-from fastapi import FastAPI, Form, Request
+import asyncio
+import json
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+from integrations.registry import CONNECTOR_MODULES, get_connector, get_crawl, preload_connectors, unsupported_load_options
+from integrations.pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate_snapshot, parse_fields
+from integrations.webhooks import (
+    CrawlAccounts,
+    crawl_overlays,
+    receive_airtable_webhook,
+    receive_hubspot_webhook,
+    receive_notion_webhook,
+    run_webhook_worker,
+    watch_accounts,
+)
+from integrations.integration_item import IntegrationItem
+from shared_cache import get_or_load, invalidate, make_cache_key, run_invalidation_listener
+from snapshots import (
+    SnapshotExpired,
+    SnapshotWriter,
+    get_overlay,
+    get_snapshot,
+    iter_overlaid_items,
+    read_snapshot_items,
+)
+from scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE, crawl_scheduler
+from http_cache import (
+    GZIP_MINIMUM_SIZE,
+    SUMMARY_CACHE_CONTROL,
+    StreamingAwareGZipMiddleware,
+    cached_response,
+    compute_etag,
+    etag_matches,
+    json_response,
+    not_modified_response,
+    request_etag,
+    serialize_json,
+)
+from redis_client import close_redis_client, init_redis_client, ping_redis
+from loop_monitor import loop_monitor
+from health import check_readiness, record_provider_result
+from integrations.checkpoints import account_fingerprint, clear_checkpoints, crawl_options, list_checkpoints
+from integrations.outbound import upstream_metrics
+from federated import FEDERATED_PROVIDER_TIMEOUT_SECONDS, federated_items
+from columnar_export import EXPORT_FORMATS
+from diagnostics import BLOCKING_THRESHOLD_MS, DIAGNOSTICS_ENABLED, get_profile, profile_request, wants_profile
+
+# Comma separated connectors to import in the background after startup; empty disables warm-up
+PRELOAD_CONNECTORS = os.environ.get('PRELOAD_CONNECTORS', ','.join(CONNECTOR_MODULES))
+STARTUP_REDIS_TIMEOUT_SECONDS = float(os.environ.get('STARTUP_REDIS_TIMEOUT', 5))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_redis_client()
+    try:
+        await asyncio.wait_for(ping_redis(), STARTUP_REDIS_TIMEOUT_SECONDS)
+    except Exception as e:
+        # Keep starting: OAuth state and caching fail per request until Redis is reachable
+        print(f"Redis health check failed at startup: {str(e)}")
 
-from integrations.airtable import authorize_airtable, get_items_airtable, oauth2callback_airtable, get_airtable_credentials
-from integrations.notion import authorize_notion, get_items_notion, oauth2callback_notion, get_notion_credentials
-from integrations.hubspot import authorize_hubspot, get_hubspot_credentials, get_items_hubspot, oauth2callback_hubspot, get_hubspot_integration_summary, search_hubspot_objects
+    # Import connectors off the event loop so the app serves immediately while they warm up
+    providers = [provider for provider in PRELOAD_CONNECTORS.split(',') if provider]
+    app.state.connector_warmup = asyncio.create_task(asyncio.to_thread(preload_connectors, providers))
+    loop_monitor.start(BLOCKING_THRESHOLD_MS)
+    app.state.webhook_worker = asyncio.create_task(run_webhook_worker())
+    app.state.cache_invalidation_listener = asyncio.create_task(run_invalidation_listener())
 
-app = FastAPI()
+    yield
+
+    loop_monitor.stop()
+    app.state.webhook_worker.cancel()
+    app.state.cache_invalidation_listener.cancel()
+    await close_redis_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",  # React app address
@@ -17,69 +94,470 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Profile-Id"],
 )
+app.add_middleware(StreamingAwareGZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
+if DIAGNOSTICS_ENABLED:
+    # Registered only in diagnostics mode, so normal requests and streamed responses skip the extra middleware
+    @app.middleware('http')
+    async def profiling_middleware(request: Request, call_next):
+        if wants_profile(request):
+            return await profile_request(request, call_next)
+        return await call_next(request)
+
+SNAPSHOT_EXPIRED_DETAIL = 'The crawl this cursor belongs to has expired, start again from the first page'
+SNAPSHOT_ACCOUNT_DETAIL = 'This cursor belongs to another account'
+# Webhook events change a snapshot's pages through its overlay, so clients revalidate them by ETag
+SNAPSHOT_PAGE_CACHE_CONTROL = 'private, no-cache'
+
+
+def credentials_account(credentials: str) -> str:
+    """Fingerprint of the account a provider's credentials JSON belongs to (see account_fingerprint)"""
+    try:
+        access_token = json.loads(credentials).get('access_token')
+    except (json.JSONDecodeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f'Invalid credentials format: {str(e)}')
+    return account_fingerprint(access_token or '')
+
+
+def check_snapshot_account(snapshot, account):
+    # A cursor alone must not give access to another account's provider data
+    if snapshot.get('account') != account:
+        raise HTTPException(status_code=403, detail=SNAPSHOT_ACCOUNT_DETAIL)
+
+
+def provider_load(provider, org_id, credentials, options, resume=False):
+    """
+    Build a provider's crawl for the given load options (see crawl_options), and the cache key parts identifying it.
+    resume continues interrupted crawls from their checkpoints; it yields the same load, so the key is unchanged.
+    """
+    crawl = get_crawl(provider)
+    # Notion's crawl is a single request, so only the paged connectors take an org_id for checkpoints
+    kwargs = options if provider == 'notion' else {**options, 'org_id': org_id, 'resume': resume}
+    return (lambda: crawl(credentials, **kwargs)), (credentials, options)
+
+
+async def load_snapshot_cached(provider, org_id, load, *key_parts, refresh=False):
+    """
+    Crawl into a snapshot through the shared cache, so page requests and other replicas reuse one crawl.
+    load returns either a list of items or an async iterator, which is written out as it streams.
+    refresh drops the cached result first, so the crawl really runs.
+    key_parts start with the credentials (see provider_load): the snapshot is bound to their account,
+    and the accounts they reach are watched for webhook events, which the snapshot's overlays then merge.
+    Only an actual crawl takes a scheduler slot. Returns the snapshot descriptor.
+    """
+    key = make_cache_key(f'load:{provider}', *key_parts)
+    if refresh:
+        await invalidate(key)
+
+    async def crawl():
+        async with crawl_scheduler.slot(org_id, PRIORITY_BULK):
+            try:
+                items = load()
+                writer = SnapshotWriter(credentials_account(key_parts[0]))
+                accounts = CrawlAccounts(provider, key_parts[0])
+                if hasattr(items, '__aiter__'):
+                    async for item in items:
+                        item = item.to_dict() if isinstance(item, IntegrationItem) else item
+                        accounts.observe(item)
+                        await writer.add(item)
+                else:
+                    for item in await items:
+                        item = item.to_dict() if isinstance(item, IntegrationItem) else item
+                        accounts.observe(item)
+                        await writer.add(item)
+                account_ids = await accounts.resolve()
+                snapshot = await writer.close(crawl_overlays(provider, account_ids))
+                await watch_accounts(provider, account_ids, key, key_parts[0])
+            except Exception as e:
+                record_provider_result(provider, False, str(e))
+                raise
+        record_provider_result(provider, True)
+        return snapshot
+
+    snapshot = await get_or_load(key, crawl)
+    try:
+        # Redis may evict a snapshot before the cache entry pointing at it expires
+        return await get_snapshot(snapshot['id'])
+    except SnapshotExpired:
+        await invalidate(key)
+        return await get_or_load(key, crawl)
+
+
+async def load_items_page(provider, org_id, load, key_parts, limit, cursor, item_type, modified_since, fields):
+    """
+    Serve one page of a provider load. The first page crawls, or reuses the cached crawl, into a snapshot;
+    later pages read the snapshot named in their cursor and never re-run the crawl, once the
+    credentials are checked to belong to the account the snapshot was crawled for.
+    """
+    snapshot_id, position = decode_cursor(cursor)
+    try:
+        if snapshot_id:
+            snapshot = await get_snapshot(snapshot_id)
+            check_snapshot_account(snapshot, credentials_account(key_parts[0]))
+        else:
+            snapshot = await load_snapshot_cached(provider, org_id, load, *key_parts)
+        return await paginate_snapshot(snapshot, limit, position, item_type, modified_since, fields)
+    except SnapshotExpired:
+        raise HTTPException(status_code=410, detail=SNAPSHOT_EXPIRED_DETAIL)
 
 @app.get('/')
 def read_root():
     return {'Ping': 'Pong'}
 
+@app.get('/health/live')
+def liveness():
+    # Answering at all means the process and its event loop are alive
+    return {'status': 'alive'}
+
+@app.get('/health/ready')
+async def readiness():
+    report = await check_readiness({
+        'webhook_worker': app.state.webhook_worker,
+        'cache_invalidation_listener': app.state.cache_invalidation_listener,
+        'event_loop_monitor': loop_monitor.task,
+    })
+    return JSONResponse(report, status_code=200 if report['status'] == 'ok' else 503)
+
+if DIAGNOSTICS_ENABLED:
+    @app.get('/diagnostics/profiles/{profile_id}')
+    async def get_request_profile(profile_id: str):
+        return await get_profile(profile_id)
+
+@app.get('/metrics/scheduler')
+def get_scheduler_metrics():
+    return crawl_scheduler.metrics()
+
+@app.get('/metrics/upstream')
+def get_upstream_metrics():
+    return upstream_metrics()
+
+
+def federated_loader(provider, org_id, credentials):
+    """
+    Build a provider's load with default options, going through the shared crawl cache and scheduler
+    """
+    async def load():
+        crawl, key_parts = provider_load(provider, org_id, credentials, {})
+        snapshot = await load_snapshot_cached(provider, org_id, crawl, *key_parts)
+        return await read_snapshot_items(snapshot)
+
+    return load
+
+
+@app.get('/integrations/items')
+async def get_items_page(
+    request: Request,
+    cursor: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    type: Optional[str] = None,
+    modified_since: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Fetch the page a /load cursor points at, for the account whose access token is sent as
+    "Authorization: Bearer <access_token>". The snapshot behind a cursor is immutable and its id
+    is derived from its content, so the ETag comes from the query, the account and the version of
+    the webhook overlay merged into it. A matching If-None-Match is answered without reading the
+    snapshot's items, even after an identical re-crawl.
+    """
+    snapshot_id, position = decode_cursor(cursor)
+    if snapshot_id is None:
+        raise HTTPException(status_code=400, detail='cursor is required')
+    scheme, _, access_token = request.headers.get('authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not access_token:
+        raise HTTPException(status_code=401, detail='Send the access token the cursor was issued for as a Bearer token')
+    account = account_fingerprint(access_token)
+
+    try:
+        snapshot = await get_snapshot(snapshot_id)
+        check_snapshot_account(snapshot, account)
+        overlay = await get_overlay(snapshot)
+        etag = request_etag(snapshot_id, position, limit, type, modified_since, fields, account, overlay.version)
+        if etag_matches(request, etag):
+            response = not_modified_response(etag, SNAPSHOT_PAGE_CACHE_CONTROL)
+            response.headers['Vary'] = 'Authorization'
+            return response
+        page = await paginate_snapshot(snapshot, limit, position, type, modified_since, fields, overlay)
+    except SnapshotExpired:
+        raise HTTPException(status_code=410, detail=SNAPSHOT_EXPIRED_DETAIL)
+    return json_response(page, headers={'ETag': etag, 'Cache-Control': SNAPSHOT_PAGE_CACHE_CONTROL, 'Vary': 'Authorization'})
+
+
+# Federated
+@app.post('/integrations/load')
+async def federated_load_integration(
+    credentials: str = Form(...),
+    org_id: Optional[str] = Form(None),
+    timeout: float = Form(FEDERATED_PROVIDER_TIMEOUT_SECONDS),
+):
+    """
+    Load several providers at once. credentials is a JSON object of provider -> credentials,
+    e.g. {"hubspot": {...}, "notion": {...}}. Responds with an NDJSON stream.
+    """
+    try:
+        credentials_by_provider = json.loads(credentials)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f'Invalid credentials format: {str(e)}')
+
+    unknown = [provider for provider in credentials_by_provider if provider not in CONNECTOR_MODULES]
+    if unknown or not credentials_by_provider:
+        raise HTTPException(status_code=400, detail=f'Expected credentials for any of {list(CONNECTOR_MODULES)}, got {unknown or "none"}')
+
+    loaders = {
+        provider: federated_loader(provider, org_id, json.dumps(provider_credentials))
+        for provider, provider_credentials in credentials_by_provider.items()
+    }
+
+    return StreamingResponse(federated_items(loaders, timeout), media_type='application/x-ndjson')
+
+
+# Crawl checkpoints
+@app.get('/integrations/checkpoints')
+async def list_crawl_checkpoints(org_id: Optional[str] = None):
+    return await list_checkpoints(org_id)
+
+@app.delete('/integrations/checkpoints')
+async def clear_crawl_checkpoints(org_id: Optional[str] = None, provider: Optional[str] = None):
+    return {'cleared': await clear_checkpoints(org_id, provider)}
+
+@app.post('/integrations/{provider}/resume')
+async def resume_crawl_integration(provider: str, credentials: str = Form(...), org_id: Optional[str] = Form(None)):
+    """
+    Resume this account's interrupted crawls. Each checkpointed load is re-run with the options it was
+    started with, bypassing the crawl cache, so its stored pages are replayed and it continues from its last cursor.
+    This is the only way stored pages are replayed. Checkpoints a crawl is running under are skipped.
+    Only checkpoints the resumed crawls actually completed are reported as resumed.
+    """
+    if provider not in CONNECTOR_MODULES:
+        raise HTTPException(status_code=404, detail=f'Unknown integration provider: {provider}')
+    account = credentials_account(credentials)
+
+    async def account_checkpoints():
+        return [
+            checkpoint for checkpoint in await list_checkpoints(org_id)
+            if checkpoint['provider'] == provider and checkpoint['account'] == account and not checkpoint['running']
+        ]
+
+    pending = await account_checkpoints()
+    if not pending:
+        raise HTTPException(status_code=404, detail=f'No interrupted {provider} crawl to resume')
+
+    # Several checkpoints (e.g. one per HubSpot object type) usually belong to the same load
+    loads = {json.dumps(checkpoint['options'], sort_keys=True): checkpoint['options'] for checkpoint in pending}
+    total = 0
+    errors = []
+    for options in loads.values():
+        crawl, key_parts = provider_load(provider, org_id, credentials, options, resume=True)
+        try:
+            snapshot = await load_snapshot_cached(provider, org_id, crawl, *key_parts, refresh=True)
+            total += snapshot['total']
+        except Exception as e:
+            errors.append(getattr(e, 'detail', None) or str(e))
+
+    remaining = {checkpoint['object_type'] for checkpoint in await account_checkpoints()}
+    return {
+        'resumed': [checkpoint['object_type'] for checkpoint in pending if checkpoint['object_type'] not in remaining],
+        'remaining': [checkpoint['object_type'] for checkpoint in pending if checkpoint['object_type'] in remaining],
+        'total': total,
+        'errors': errors,
+    }
+
+
+# Columnar export
+async def _write_export_file(snapshot, export_format, columns, flatten):
+    """
+    Stream a snapshot, with its webhook overlay merged, into an export file a chunk at a time, returns its path
+    """
+    # Imported lazily: pyarrow is only needed by export requests
+    from columnar_export import write_item_stream
+
+    # Read once, so a flattened export's schema and write passes see the same items
+    overlay = await get_overlay(snapshot)
+
+    async def open_items():
+        async for _, item in iter_overlaid_items(snapshot, overlay):
+            yield item
+
+    suffix = EXPORT_FORMATS[export_format][1]
+    with tempfile.NamedTemporaryFile(suffix=f'.{suffix}', delete=False) as f:
+        path = f.name
+    try:
+        await write_item_stream(open_items, path, export_format, columns, flatten)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+@app.post('/integrations/{provider}/export')
+async def export_integration_items(
+    provider: str,
+    credentials: str = Form(...),
+    org_id: Optional[str] = Form(None),
+    format: str = Form('parquet'),
+    flatten: bool = Form(False),
+    fields: Optional[str] = Form(None),
+    include_records: bool = Form(False),
+    record_fields: Optional[str] = Form(None),
+    object_types: Optional[str] = Form(None),
+    properties: Optional[str] = Form(None),
+):
+    """
+    Export a provider's items as a Parquet or Arrow IPC file, with typed timestamp columns
+    and optionally api_response flattened into columns. Takes the same load options as the
+    provider's /load route, and shares its crawl cache.
+    """
+    if provider not in CONNECTOR_MODULES:
+        raise HTTPException(status_code=404, detail=f'Unknown integration provider: {provider}')
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f'Unsupported export format: {format}, expected one of {list(EXPORT_FORMATS)}')
+    options = crawl_options(
+        include_records=include_records,
+        record_fields=parse_fields(record_fields),
+        object_types=parse_fields(object_types),
+        properties=parse_fields(properties),
+    )
+    unsupported = unsupported_load_options(provider, options)
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f'{provider} does not take the load options {unsupported}')
+
+    crawl, key_parts = provider_load(provider, org_id, credentials, options)
+    snapshot = await load_snapshot_cached(provider, org_id, crawl, *key_parts)
+    try:
+        path = await _write_export_file(snapshot, format, parse_fields(fields), flatten)
+    except ImportError:
+        raise HTTPException(status_code=501, detail='Columnar export requires pyarrow')
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SnapshotExpired:
+        raise HTTPException(status_code=503, detail='The crawl expired while it was being exported, try again')
+
+    media_type, suffix = EXPORT_FORMATS[format]
+    return FileResponse(path, media_type=media_type, filename=f'{provider}_items.{suffix}', background=BackgroundTask(os.unlink, path))
+
 
 # Airtable
 @app.post('/integrations/airtable/authorize')
 async def authorize_airtable_integration(user_id: str = Form(...), org_id: str = Form(...)):
-    return await authorize_airtable(user_id, org_id)
+    return await get_connector('airtable').authorize_airtable(user_id, org_id)
 
 @app.get('/integrations/airtable/oauth2callback')
 async def oauth2callback_airtable_integration(request: Request):
-    return await oauth2callback_airtable(request)
+    return await get_connector('airtable').oauth2callback_airtable(request)
 
 @app.post('/integrations/airtable/credentials')
 async def get_airtable_credentials_integration(user_id: str = Form(...), org_id: str = Form(...)):
-    return await get_airtable_credentials(user_id, org_id)
+    return await get_connector('airtable').get_airtable_credentials(user_id, org_id)
 
 @app.post('/integrations/airtable/load')
-async def get_airtable_items(credentials: str = Form(...)):
-    return await get_items_airtable(credentials)
+async def get_airtable_items(
+    credentials: str = Form(...),
+    limit: int = Form(DEFAULT_PAGE_SIZE),
+    cursor: Optional[str] = Form(None),
+    type: Optional[str] = Form(None),
+    modified_since: Optional[str] = Form(None),
+    fields: Optional[str] = Form(None),
+    org_id: Optional[str] = Form(None),
+    include_records: bool = Form(False),
+    record_fields: Optional[str] = Form(None),
+):
+    options = crawl_options(include_records=include_records, record_fields=parse_fields(record_fields))
+    load, key_parts = provider_load('airtable', org_id, credentials, options)
+    page = await load_items_page('airtable', org_id, load, key_parts, limit, cursor, type, modified_since, fields)
+    return json_response(page)
+
+@app.post('/integrations/airtable/webhook')
+async def airtable_webhook_integration(request: Request):
+    return await receive_airtable_webhook(request)
 
 
 # Notion
 @app.post('/integrations/notion/authorize')
 async def authorize_notion_integration(user_id: str = Form(...), org_id: str = Form(...)):
-    return await authorize_notion(user_id, org_id)
+    return await get_connector('notion').authorize_notion(user_id, org_id)
 
 @app.get('/integrations/notion/oauth2callback')
 async def oauth2callback_notion_integration(request: Request):
-    return await oauth2callback_notion(request)
+    return await get_connector('notion').oauth2callback_notion(request)
 
 @app.post('/integrations/notion/credentials')
 async def get_notion_credentials_integration(user_id: str = Form(...), org_id: str = Form(...)):
-    return await get_notion_credentials(user_id, org_id)
+    return await get_connector('notion').get_notion_credentials(user_id, org_id)
 
 @app.post('/integrations/notion/load')
-async def get_notion_items(credentials: str = Form(...)):
-    return await get_items_notion(credentials)
+async def get_notion_items(
+    credentials: str = Form(...),
+    limit: int = Form(DEFAULT_PAGE_SIZE),
+    cursor: Optional[str] = Form(None),
+    type: Optional[str] = Form(None),
+    modified_since: Optional[str] = Form(None),
+    fields: Optional[str] = Form(None),
+    org_id: Optional[str] = Form(None),
+):
+    load, key_parts = provider_load('notion', org_id, credentials, {})
+    page = await load_items_page('notion', org_id, load, key_parts, limit, cursor, type, modified_since, fields)
+    return json_response(page)
+
+@app.post('/integrations/notion/webhook')
+async def notion_webhook_integration(request: Request):
+    return await receive_notion_webhook(request)
 
 # HubSpot
 @app.post('/integrations/hubspot/authorize')
 async def authorize_hubspot_integration(user_id: str = Form(...), org_id: str = Form(...)):
-    return await authorize_hubspot(user_id, org_id)
+    return await get_connector('hubspot').authorize_hubspot(user_id, org_id)
 
 @app.get('/integrations/hubspot/oauth2callback')
 async def oauth2callback_hubspot_integration(request: Request):
-    return await oauth2callback_hubspot(request)
+    return await get_connector('hubspot').oauth2callback_hubspot(request)
 
 @app.post('/integrations/hubspot/credentials')
 async def get_hubspot_credentials_integration(user_id: str = Form(...), org_id: str = Form(...)):
-    return await get_hubspot_credentials(user_id, org_id)
+    return await get_connector('hubspot').get_hubspot_credentials(user_id, org_id)
 
 @app.post('/integrations/hubspot/load')
-async def load_slack_data_integration(credentials: str = Form(...)):
-    return await get_items_hubspot(credentials)
+async def load_slack_data_integration(
+    credentials: str = Form(...),
+    limit: int = Form(DEFAULT_PAGE_SIZE),
+    cursor: Optional[str] = Form(None),
+    type: Optional[str] = Form(None),
+    modified_since: Optional[str] = Form(None),
+    fields: Optional[str] = Form(None),
+    org_id: Optional[str] = Form(None),
+    object_types: Optional[str] = Form(None),
+    properties: Optional[str] = Form(None),
+):
+    options = crawl_options(object_types=parse_fields(object_types), properties=parse_fields(properties))
+    load, key_parts = provider_load('hubspot', org_id, credentials, options)
+    page = await load_items_page('hubspot', org_id, load, key_parts, limit, cursor, type, modified_since, fields)
+    return json_response(page)
+
+# The summary is static, so it is serialized and hashed once per process
+_hubspot_summary_cache = None
 
+@app.get('/integrations/hubspot/summary')
 @app.post('/integrations/hubspot/summary')
-async def get_hubspot_summary_integration(credentials: str = Form(...)):
-    return await get_hubspot_integration_summary()
+async def get_hubspot_summary_integration(request: Request):
+    global _hubspot_summary_cache
+    if _hubspot_summary_cache is None:
+        body = serialize_json(await get_connector('hubspot').get_hubspot_integration_summary())
+        _hubspot_summary_cache = (body, compute_etag(body))
+    body, etag = _hubspot_summary_cache
+    return cached_response(request, body, etag, SUMMARY_CACHE_CONTROL)
 
 @app.post('/integrations/hubspot/search')
-async def search_hubspot_integration(credentials: str = Form(...), query: str = Form(...), type: str = Form("contacts")):
-    return await search_hubspot_objects(credentials, query, type)
\ No newline at end of file
+async def search_hubspot_integration(credentials: str = Form(...), query: str = Form(...), type: str = Form("contacts"), org_id: Optional[str] = Form(None), properties: Optional[str] = Form(None)):
+    async with crawl_scheduler.slot(org_id, PRIORITY_INTERACTIVE):
+        try:
+            results = await get_connector('hubspot').search_hubspot_objects(credentials, query, type, parse_fields(properties))
+        except Exception as e:
+            record_provider_result('hubspot', False, str(e))
+            raise
+    record_provider_result('hubspot', True)
+    return results
+
+@app.post('/integrations/hubspot/webhook')
+async def hubspot_webhook_integration(request: Request):
+    return await receive_hubspot_webhook(request)
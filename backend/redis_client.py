@@ -1,17 +1,126 @@
 import os
-import redis.asyncio as redis
-from kombu.utils.url import safequote
 
-redis_host = safequote(os.environ.get('REDIS_HOST', 'localhost'))
-redis_client = redis.Redis(host=redis_host, port=6379, db=0)
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 50))
+REDIS_POOL_TIMEOUT_SECONDS = float(os.environ.get('REDIS_POOL_TIMEOUT', 5))
+
+# Created by init_redis_client() from the app lifespan, or lazily on first use outside the app
+redis_client = None
+
+
+def init_redis_client():
+    global redis_client
+    if redis_client is None:
+        import redis.asyncio as redis
+        from kombu.utils.url import safequote
+
+        redis_host = safequote(os.environ.get('REDIS_HOST', 'localhost'))
+        # Bounded so saturation is observable; callers wait for a free connection instead of erroring
+        connection_pool = redis.BlockingConnectionPool(
+            host=redis_host,
+            port=6379,
+            db=0,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT_SECONDS,
+        )
+        redis_client = redis.Redis(connection_pool=connection_pool)
+    return redis_client
+
+async def close_redis_client():
+    global redis_client
+    if redis_client is not None:
+        await redis_client.close()
+        redis_client = None
+
+def get_redis_client():
+    return redis_client if redis_client is not None else init_redis_client()
+
+async def ping_redis():
+    return await get_redis_client().ping()
+
+def redis_pool_stats():
+    if redis_client is None:
+        return {'max_connections': REDIS_MAX_CONNECTIONS, 'created': 0, 'in_use': 0}
+    pool = redis_client.connection_pool
+    created = len(getattr(pool, '_connections', []))
+    # Idle connections sit in the blocking pool's queue; None entries are unopened slots
+    idle = sum(1 for connection in getattr(getattr(pool, 'pool', None), '_queue', []) if connection is not None)
+    return {'max_connections': pool.max_connections, 'created': created, 'in_use': created - idle}
 
 async def add_key_value_redis(key, value, expire=None):
-    await redis_client.set(key, value)
+    await get_redis_client().set(key, value)
     if expire:
-        await redis_client.expire(key, expire)
+        await get_redis_client().expire(key, expire)
 
 async def get_value_redis(key):
-    return await redis_client.get(key)
+    return await get_redis_client().get(key)
 
 async def delete_key_redis(key):
-    await redis_client.delete(key)
+    await get_redis_client().delete(key)
+
+async def add_key_value_redis_if_absent(key, value, expire=None):
+    return bool(await get_redis_client().set(key, value, ex=expire, nx=True))
+
+async def push_list_redis(key, *values):
+    await get_redis_client().lpush(key, *values)
+
+async def pop_list_redis(key, timeout=0):
+    result = await get_redis_client().brpop(key, timeout=timeout)
+    return result[1] if result else None
+
+async def add_set_members_redis(key, *members, expire=None):
+    await get_redis_client().sadd(key, *members)
+    if expire:
+        await get_redis_client().expire(key, expire)
+
+async def pop_set_members_redis(key):
+    """
+    Read and delete a set in one transaction, so members added concurrently are never lost
+    """
+    async with get_redis_client().pipeline(transaction=True) as pipe:
+        members, _ = await pipe.smembers(key).delete(key).execute()
+    return members
+
+async def acquire_lock_redis(key, token, expire_ms):
+    return bool(await get_redis_client().set(key, token, px=expire_ms, nx=True))
+
+# Only delete the lock if it still holds our token, so an expired lock taken over by someone else survives
+_release_lock_script = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+async def release_lock_redis(key, token):
+    return bool(await get_redis_client().eval(_release_lock_script, 1, key, token))
+
+_extend_lock_script = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+
+async def extend_lock_redis(key, token, expire_ms):
+    return bool(await get_redis_client().eval(_extend_lock_script, 1, key, token, expire_ms))
+
+async def publish_redis(channel, message):
+    await get_redis_client().publish(channel, message)
+
+def pubsub_redis():
+    return get_redis_client().pubsub()
+
+async def append_list_redis(key, value, expire=None):
+    await get_redis_client().rpush(key, value)
+    if expire:
+        await get_redis_client().expire(key, expire)
+
+async def get_list_range_redis(key, start, end):
+    return await get_redis_client().lrange(key, start, end)
+
+async def scan_keys_redis(pattern):
+    return [key async for key in get_redis_client().scan_iter(match=pattern)]
+
+async def set_hash_field_redis(key, field, value, expire=None):
+    await get_redis_client().hset(key, field, value)
+    if expire:
+        await get_redis_client().expire(key, expire)
+
+async def get_hash_field_redis(key, field):
+    return await get_redis_client().hget(key, field)
+
+async def get_hash_redis(key):
+    return await get_redis_client().hgetall(key)
+
+async def delete_hash_fields_redis(key, *fields):
+    await get_redis_client().hdel(key, *fields)
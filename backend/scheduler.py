@@ -0,0 +1,139 @@
+import asyncio
+import os
+from collections import deque, OrderedDict
+from contextlib import asynccontextmanager
+
+# Lower value runs first: interactive search jumps ahead of bulk loads
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_BULK: 'bulk'
+}
+
+DEFAULT_TENANT = 'default'
+
+
+class CrawlScheduler:
+    """
+    Fair scheduler for upstream crawls, keyed by org_id.
+    Caps concurrent crawls globally and per tenant, and hands free slots out
+    round-robin across tenants, highest priority first.
+    Part of both caps is reserved for interactive work: bulk crawls stop at the cap minus the reserve,
+    so long crawls can never take the slots a type-ahead search needs.
+    """
+
+    def __init__(self, global_limit: int, tenant_limit: int, interactive_reserve: int = 0, tenant_interactive_reserve: int = 0):
+        self.global_limit = global_limit
+        self.tenant_limit = tenant_limit
+        self.interactive_reserve = interactive_reserve
+        self.tenant_interactive_reserve = tenant_interactive_reserve
+        # priority -> (global cap, per tenant cap) on everything running; bulk always keeps at least one slot
+        self.limits = {
+            PRIORITY_INTERACTIVE: (global_limit, tenant_limit),
+            PRIORITY_BULK: (max(1, global_limit - interactive_reserve), max(1, tenant_limit - tenant_interactive_reserve)),
+        }
+        self.running = 0
+        self.running_by_tenant = {}
+        # priority -> tenant -> deque of waiter futures; dict order is the round-robin ring
+        self.queues = {priority: OrderedDict() for priority in PRIORITY_NAMES}
+        self.completed = 0
+
+    def _tenant_has_capacity(self, tenant, tenant_limit):
+        return self.running_by_tenant.get(tenant, 0) < tenant_limit
+
+    def _grant(self, tenant):
+        self.running += 1
+        self.running_by_tenant[tenant] = self.running_by_tenant.get(tenant, 0) + 1
+
+    def _dispatch(self):
+        for priority in sorted(self.queues):
+            ring = self.queues[priority]
+            global_limit, tenant_limit = self.limits[priority]
+            progressed = True
+            while self.running < global_limit and progressed:
+                progressed = False
+                for tenant in list(ring):
+                    if self.running >= global_limit:
+                        break
+                    waiters = ring[tenant]
+                    while waiters and waiters[0].done():
+                        waiters.popleft()
+                    if not waiters:
+                        del ring[tenant]
+                        continue
+                    if not self._tenant_has_capacity(tenant, tenant_limit):
+                        continue
+                    self._grant(tenant)
+                    waiters.popleft().set_result(None)
+                    # Move the tenant to the back of the ring so others get the next slot
+                    ring.move_to_end(tenant)
+                    progressed = True
+                    break
+            if self.running >= self.global_limit:
+                return
+
+    def _release(self, tenant):
+        self.running -= 1
+        self.running_by_tenant[tenant] -= 1
+        if not self.running_by_tenant[tenant]:
+            del self.running_by_tenant[tenant]
+        self.completed += 1
+        self._dispatch()
+
+    async def acquire(self, tenant: str, priority: int = PRIORITY_BULK):
+        waiter = asyncio.get_running_loop().create_future()
+        self.queues[priority].setdefault(tenant, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted just before cancellation, hand it back
+                self._release(tenant)
+            raise
+
+    @asynccontextmanager
+    async def slot(self, tenant: str = None, priority: int = PRIORITY_BULK):
+        """
+        Hold one crawl slot for the duration of the block
+        """
+        tenant = tenant or DEFAULT_TENANT
+        await self.acquire(tenant, priority)
+        try:
+            yield
+        finally:
+            self._release(tenant)
+
+    def metrics(self) -> dict:
+        queued_by_priority = {}
+        queued_by_tenant = {}
+        for priority, ring in self.queues.items():
+            depth = 0
+            for tenant, waiters in ring.items():
+                pending = sum(1 for waiter in waiters if not waiter.done())
+                depth += pending
+                if pending:
+                    queued_by_tenant[tenant] = queued_by_tenant.get(tenant, 0) + pending
+            queued_by_priority[PRIORITY_NAMES[priority]] = depth
+
+        return {
+            'global_limit': self.global_limit,
+            'tenant_limit': self.tenant_limit,
+            'interactive_reserve': self.interactive_reserve,
+            'tenant_interactive_reserve': self.tenant_interactive_reserve,
+            'running': self.running,
+            'running_by_tenant': dict(self.running_by_tenant),
+            'queued': sum(queued_by_priority.values()),
+            'queued_by_priority': queued_by_priority,
+            'queued_by_tenant': queued_by_tenant,
+            'completed': self.completed,
+        }
+
+
+crawl_scheduler = CrawlScheduler(
+    global_limit=int(os.environ.get('CRAWL_GLOBAL_CONCURRENCY', 16)),
+    tenant_limit=int(os.environ.get('CRAWL_TENANT_CONCURRENCY', 4)),
+    interactive_reserve=int(os.environ.get('CRAWL_INTERACTIVE_RESERVE', 4)),
+    tenant_interactive_reserve=int(os.environ.get('CRAWL_TENANT_INTERACTIVE_RESERVE', 1)),
+)
@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import time
+import zlib
+from collections import OrderedDict
+
+from redis.exceptions import RedisError
+
+from redis_client import (
+    acquire_lock_redis,
+    add_key_value_redis,
+    delete_key_redis,
+    extend_lock_redis,
+    get_value_redis,
+    publish_redis,
+    pubsub_redis,
+    release_lock_redis,
+)
+
+# Bump when the shape of cached values changes so replicas never read an old layout
+CACHE_VERSION = 2
+CACHE_PREFIX = f'cache:v{CACHE_VERSION}'
+INVALIDATION_CHANNEL = 'cache_invalidation'
+
+DEFAULT_TTL_SECONDS = int(os.environ.get('SHARED_CACHE_TTL', 300))
+LOCAL_TTL_SECONDS = int(os.environ.get('SHARED_CACHE_LOCAL_TTL', 30))
+LOCAL_MAX_ENTRIES = int(os.environ.get('SHARED_CACHE_LOCAL_MAX_ENTRIES', 128))
+COMPRESS_THRESHOLD_BYTES = 4096
+# The loading replica renews its lock every third of this while the loader runs, however long the crawl takes.
+# Waiters keep waiting while it is held; only a lock left to lapse (a dead replica) lets one of them take over.
+LOCK_TTL_MS = int(os.environ.get('SHARED_CACHE_LOCK_TTL_MS', 30000))
+LOCK_POLL_SECONDS = 0.2
+
+_PLAIN = b'j'
+_COMPRESSED = b'z'
+
+
+def make_cache_key(namespace: str, *parts) -> str:
+    """
+    Build a cache key from a namespace and a hash of the parts, so secrets never appear in Redis keys
+    """
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f'{namespace}:{digest[:40]}'
+
+
+def encode_value(value) -> bytes:
+    body = json.dumps(value, separators=(',', ':'), default=str).encode('utf-8')
+    if len(body) >= COMPRESS_THRESHOLD_BYTES:
+        return _COMPRESSED + zlib.compress(body, 3)
+    return _PLAIN + body
+
+
+def decode_value(raw: bytes):
+    marker, body = raw[:1], raw[1:]
+    if marker == _COMPRESSED:
+        body = zlib.decompress(body)
+    return json.loads(body)
+
+
+class LocalLRUCache:
+    """Small in-process LRU with per-entry expiry, sitting in front of Redis"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def delete(self, key):
+        self.entries.pop(key, None)
+
+
+local_cache = LocalLRUCache(LOCAL_MAX_ENTRIES)
+
+
+class _InflightLoad:
+    """A load running as its own task, shared by every caller waiting on the same key"""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+# Loads in progress in this process, so concurrent callers share one
+_inflight = {}
+
+
+def _data_key(key):
+    return f'{CACHE_PREFIX}:{key}'
+
+
+def _lock_key(key):
+    return f'{CACHE_PREFIX}:lock:{key}'
+
+
+async def _read_shared(key):
+    raw = await get_value_redis(_data_key(key))
+    return None if raw is None else decode_value(raw)
+
+
+async def _renew_lock(key, token):
+    """
+    Keep the load lock alive while the loader runs, so crawls of any length stay single-flight
+    """
+    while True:
+        await asyncio.sleep(LOCK_TTL_MS / 3000)
+        try:
+            if not await extend_lock_redis(_lock_key(key), token, LOCK_TTL_MS):
+                # Lapsed (e.g. Redis was unreachable too long) and maybe taken over; the load still finishes
+                print(f"Lost cache lock on {key} while loading")
+                return
+        except RedisError as e:
+            print(f"Failed to renew cache lock on {key}: {str(e)}")
+
+
+async def _load_shared(key, loader, ttl):
+    """
+    Read from Redis, or populate it under a distributed lock so only one replica calls the loader
+    """
+    value = await _read_shared(key)
+    if value is not None:
+        return value
+
+    token = secrets.token_hex(16)
+    while not await acquire_lock_redis(_lock_key(key), token, LOCK_TTL_MS):
+        await asyncio.sleep(LOCK_POLL_SECONDS)
+        value = await _read_shared(key)
+        if value is not None:
+            return value
+
+    heartbeat = asyncio.create_task(_renew_lock(key, token))
+    try:
+        # Another replica may have finished populating between our read and taking the lock
+        value = await _read_shared(key)
+        if value is None:
+            value = await loader()
+            await add_key_value_redis(_data_key(key), encode_value(value), expire=ttl)
+        return value
+    finally:
+        heartbeat.cancel()
+        try:
+            # Shielded: a cancelled load must still hand the lock to the next replica rather than let it lapse
+            await asyncio.shield(release_lock_redis(_lock_key(key), token))
+        except RedisError as e:
+            # The lock expires on its own; don't fail a load that already succeeded
+            print(f"Failed to release cache lock on {key}: {str(e)}")
+
+
+async def _load(key, loader, ttl):
+    try:
+        value = await _load_shared(key, loader, ttl)
+    except RedisError as e:
+        # The cache is an optimization; fall back to loading directly when Redis misbehaves
+        print(f"Shared cache unavailable for {key}: {str(e)}")
+        value = await loader()
+    local_cache.set(key, value, min(ttl, LOCAL_TTL_SECONDS))
+    return value
+
+
+async def get_or_load(key: str, loader, ttl: int = DEFAULT_TTL_SECONDS):
+    """
+    Return the cached value for key, calling the async loader at most once across
+    this process and all replicas sharing Redis when it is missing.
+    Values must be JSON serializable.
+    The load runs as its own task: a cancelled caller leaves it running for the others,
+    and it is only cancelled once no caller is waiting for it any more.
+    """
+    value = local_cache.get(key)
+    if value is not None:
+        return value
+
+    load = _inflight.get(key)
+    if load is None:
+        load = _InflightLoad(asyncio.create_task(_load(key, loader, ttl)))
+        _inflight[key] = load
+        load.task.add_done_callback(lambda task: _inflight.pop(key) if _inflight.get(key) is load else None)
+
+    load.waiters += 1
+    try:
+        return await asyncio.shield(load.task)
+    except asyncio.CancelledError:
+        if load.waiters == 1 and not load.task.done():
+            # Last one waiting: nobody wants the result, so stop the crawl and let the next caller start over
+            if _inflight.get(key) is load:
+                del _inflight[key]
+            load.task.cancel()
+        raise
+    finally:
+        load.waiters -= 1
+
+
+async def invalidate(key: str):
+    """
+    Drop a key from Redis and tell every replica to drop its local copy
+    """
+    local_cache.delete(key)
+    await delete_key_redis(_data_key(key))
+    await publish_redis(INVALIDATION_CHANNEL, key)
+
+
+async def run_invalidation_listener():
+    """
+    Evict local entries whenever any replica invalidates a key
+    """
+    while True:
+        pubsub = pubsub_redis()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get('type') != 'message':
+                    continue
+                key = message.get('data')
+                local_cache.delete(key.decode('utf-8') if isinstance(key, bytes) else key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Cache invalidation listener error: {str(e)}")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.close()
@@ -0,0 +1,232 @@
+"""
+Per-crawl snapshots of a load result, stored in Redis in fixed-size chunks.
+
+A crawl writes its items once; the shared cache only holds the small snapshot descriptor.
+Page cursors carry the snapshot id, so every page of a walk reads the same item list even
+if the cache entry expires or another crawl replaces it in the meantime.
+
+A snapshot's id is a hash of its account and content, so a re-crawl that finds the same data
+gets the same id, cursors and ETags, and clients revalidate instead of downloading it again.
+Its chunks are stored under a separate per-crawl data id, so a re-crawl never rewrites chunks
+that readers of the previous one are paging through.
+
+Webhook events don't touch snapshots: they are recorded in a per-account overlay of changed
+and deleted items, which readers merge into the snapshot (see SnapshotOverlay).
+"""
+import hashlib
+import os
+import secrets
+import time
+
+from redis_client import (
+    add_key_value_redis,
+    delete_hash_fields_redis,
+    get_hash_field_redis,
+    get_hash_redis,
+    get_value_redis,
+    set_hash_field_redis,
+)
+from shared_cache import DEFAULT_TTL_SECONDS, decode_value, encode_value
+
+SNAPSHOT_CHUNK_SIZE = int(os.environ.get('SNAPSHOT_CHUNK_SIZE', 1000))
+# How long a client has to walk all pages of one crawl; must outlive the cache entry pointing at it
+SNAPSHOT_TTL_SECONDS = max(int(os.environ.get('SNAPSHOT_TTL', 1800)), DEFAULT_TTL_SECONDS * 2)
+
+
+class SnapshotExpired(Exception):
+    """The snapshot a cursor or cache entry points at is gone from Redis"""
+
+
+def _meta_key(snapshot_id):
+    return f'snapshot:{snapshot_id}:meta'
+
+
+def _chunk_key(data_id, index):
+    return f'snapshot:{data_id}:{index}'
+
+
+class SnapshotWriter:
+    """
+    Write items into a new snapshot a chunk at a time, so a crawl never holds the full result
+    just to store it. The metadata is written last: a snapshot without it is incomplete.
+    account identifies who may read the snapshot (see account_fingerprint).
+    """
+
+    def __init__(self, account: str = '', chunk_size: int = SNAPSHOT_CHUNK_SIZE):
+        self.data_id = secrets.token_urlsafe(16)
+        self.account = account
+        self.digest = hashlib.sha256(f'{account}:{chunk_size}'.encode('utf-8'))
+        self.chunk_size = chunk_size
+        # Changes reported after the crawl started may be missing from it, so overlays apply from here
+        self.started_at = time.time()
+        self.buffer = []
+        self.chunks = 0
+        self.total = 0
+        self.type_counts = {}
+
+    async def _flush(self):
+        if not self.buffer:
+            return
+        chunk = encode_value(self.buffer)
+        self.digest.update(chunk)
+        await add_key_value_redis(_chunk_key(self.data_id, self.chunks), chunk, expire=SNAPSHOT_TTL_SECONDS)
+        self.chunks += 1
+        self.buffer = []
+
+    async def add(self, item: dict):
+        self.buffer.append(item)
+        self.total += 1
+        item_type = str(item.get('type') or '').lower()
+        self.type_counts[item_type] = self.type_counts.get(item_type, 0) + 1
+        if len(self.buffer) >= self.chunk_size:
+            await self._flush()
+
+    async def close(self, overlays=()) -> dict:
+        """
+        Flush the last chunk and publish the snapshot. Returns its descriptor.
+        overlays are the keys of the account overlays readers merge into it (see overlay_key).
+        """
+        await self._flush()
+        descriptor = {
+            'id': self.digest.hexdigest()[:32],
+            'data': self.data_id,
+            'account': self.account,
+            'total': self.total,
+            'chunks': self.chunks,
+            'chunk_size': self.chunk_size,
+            'type_counts': self.type_counts,
+            'created_at': time.time(),
+            'started_at': self.started_at,
+            'overlays': sorted(overlays),
+        }
+        # An identical earlier snapshot's metadata now points at these chunks, with the same content
+        await add_key_value_redis(_meta_key(descriptor['id']), encode_value(descriptor), expire=SNAPSHOT_TTL_SECONDS)
+        return descriptor
+
+
+async def get_snapshot(snapshot_id: str) -> dict:
+    """
+    Look up a snapshot's descriptor by id. Raises SnapshotExpired when it is gone.
+    """
+    raw = await get_value_redis(_meta_key(snapshot_id))
+    if raw is None:
+        raise SnapshotExpired(snapshot_id)
+    return decode_value(raw)
+
+
+async def iter_snapshot_items(snapshot: dict, start: int = 0):
+    """
+    Yield (position, item) from start onwards, reading one chunk at a time
+    """
+    chunk_size = snapshot['chunk_size']
+    for index in range(start // chunk_size, snapshot['chunks']):
+        raw = await get_value_redis(_chunk_key(snapshot.get('data', snapshot['id']), index))
+        if raw is None:
+            raise SnapshotExpired(snapshot['id'])
+        first = index * chunk_size
+        for offset, item in enumerate(decode_value(raw)):
+            if first + offset >= start:
+                yield first + offset, item
+
+
+async def read_snapshot_items(snapshot: dict) -> list:
+    overlay = await get_overlay(snapshot)
+    return [item async for _, item in iter_overlaid_items(snapshot, overlay)]
+
+
+# Webhook overlays
+
+def overlay_key(provider: str, account_id: str) -> str:
+    return f'snapshot_overlay:{provider}:{account_id}'
+
+
+async def record_overlay_change(key: str, item_id: str, item_type: str, item, at: float, created: bool = False):
+    """
+    Record an item's current state in an account's overlay, or its deletion when item is None.
+    at is when the change happened upstream; changes older than the one already recorded are dropped.
+    """
+    raw = await get_hash_field_redis(key, item_id)
+    existing = decode_value(raw) if raw else {}
+    if existing.get('at', 0) > at:
+        return
+    entry = {
+        'id': item_id,
+        'type': item_type,
+        'item': item,
+        'at': at,
+        # An item created after a crawl started is appended to its snapshot, even once changed again
+        'created_at': at if created else existing.get('created_at'),
+    }
+    await set_hash_field_redis(key, item_id, encode_value(entry), expire=SNAPSHOT_TTL_SECONDS)
+
+
+class SnapshotOverlay:
+    """
+    The changes webhooks reported after a snapshot's crawl started, merged into it when it is read:
+    changed items replace their snapshot version, deleted ones are skipped, and created ones are
+    appended after the snapshot's last position, in the order they were created.
+    version identifies the applied changes, and is empty when there are none.
+    """
+
+    def __init__(self, entries=(), since: float = 0):
+        self.changed = {}
+        self.deleted = {}
+        applied = sorted((entry for entry in entries if entry['at'] > since), key=lambda entry: (entry['at'], entry['id']))
+        created = []
+        for entry in applied:
+            if entry['created_at'] is not None and entry['created_at'] > since:
+                # Created and deleted again, the snapshot never had it
+                if entry['item'] is not None:
+                    created.append(entry)
+            elif entry['item'] is None:
+                self.deleted[entry['id']] = entry['type']
+            else:
+                self.changed[entry['id']] = entry['item']
+        self.created = [entry['item'] for entry in sorted(created, key=lambda entry: (entry['created_at'], entry['id']))]
+        self.version = hashlib.sha256(
+            ';'.join(f"{entry['id']}@{entry['at']}" for entry in applied).encode('utf-8')
+        ).hexdigest()[:16] if applied else ''
+
+    def total(self, snapshot: dict) -> int:
+        return snapshot['total'] + len(self.created) - len(self.deleted)
+
+    def type_count(self, snapshot: dict, item_type: str) -> int:
+        created = sum(1 for item in self.created if str(item.get('type') or '').lower() == item_type)
+        deleted = sum(1 for deleted_type in self.deleted.values() if str(deleted_type or '').lower() == item_type)
+        return snapshot['type_counts'].get(item_type, 0) + created - deleted
+
+
+async def get_overlay(snapshot: dict) -> SnapshotOverlay:
+    """
+    Read the overlays of the accounts a snapshot covers, pruning changes older than any live snapshot
+    """
+    entries = []
+    stale_before = time.time() - SNAPSHOT_TTL_SECONDS
+    for key in snapshot.get('overlays', ()):
+        stale = []
+        for field, raw in (await get_hash_redis(key)).items():
+            entry = decode_value(raw)
+            if entry['at'] < stale_before:
+                stale.append(field)
+            else:
+                entries.append(entry)
+        if stale:
+            await delete_hash_fields_redis(key, *stale)
+    return SnapshotOverlay(entries, snapshot.get('started_at', snapshot['created_at']))
+
+
+async def iter_overlaid_items(snapshot: dict, overlay: SnapshotOverlay, start: int = 0):
+    """
+    Yield (position, item) of a snapshot with its overlay merged, from start onwards.
+    Created items take the positions after the snapshot's last one.
+    """
+    total = snapshot['total']
+    if start < total:
+        async for position, item in iter_snapshot_items(snapshot, start):
+            item_id = item.get('id')
+            if item_id in overlay.deleted:
+                continue
+            yield position, overlay.changed.get(item_id, item)
+    for offset, item in enumerate(overlay.created):
+        if total + offset >= start:
+            yield total + offset, item
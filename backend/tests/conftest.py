@@ -0,0 +1,45 @@
+import os
+import sys
+
+import fakeredis
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# The load test's fake provider APIs double as test fixtures
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+
+import redis_client  # noqa: E402
+import shared_cache  # noqa: E402
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Point the app's Redis client at an in-memory fakeredis instance, with an empty process cache in front"""
+    client = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(redis_client, 'redis_client', client)
+    shared_cache.local_cache.entries.clear()
+    return client
+
+
+@pytest.fixture
+def fake_upstream(monkeypatch):
+    """
+    Route provider API calls to the load test's fake upstream; returns a function installing a FakeUpstream.
+    Everything install() patches is restored after the test.
+    """
+    import httpx
+    import requests
+
+    from fake_upstream import install
+    from integrations import outbound
+
+    monkeypatch.setattr(httpx, 'AsyncClient', httpx.AsyncClient)
+    monkeypatch.setattr(requests.Session, 'get_adapter', requests.Session.get_adapter)
+    monkeypatch.setattr(outbound, 'limiters', {})
+
+    def use(upstream):
+        install(upstream)
+        return upstream
+
+    return use
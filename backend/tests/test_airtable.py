@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from fake_upstream import FakeUpstream
+from integrations import airtable
+
+CREDENTIALS = json.dumps({'access_token': 'token'})
+
+
+class FailingAirtableUpstream(FakeUpstream):
+    """Airtable answering a fixed status for one path, optionally only for the first few calls"""
+
+    def __init__(self, failing_path, status_code, failures=None, **kwargs):
+        super().__init__(latency_ms=0, **kwargs)
+        self.failing_path = failing_path
+        self.status_code = status_code
+        self.failures = failures
+
+    def _airtable(self, request, path):
+        if path == self.failing_path and (self.failures is None or self.failures > 0):
+            if self.failures is not None:
+                self.failures -= 1
+            self._count(f'airtable {self.status_code}')
+            return httpx.Response(self.status_code, json={'error': {'type': 'FAILED'}})
+        return super()._airtable(request, path)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(airtable, 'RATE_LIMIT_BACKOFF_SECONDS', 0)
+    monkeypatch.setattr(airtable, 'base_rate_limiters', {})
+
+
+def test_throttled_table_listing_is_retried(fake_redis, fake_upstream):
+    upstream = fake_upstream(FailingAirtableUpstream('/v0/meta/bases/app1/tables', 429, failures=2))
+
+    items = asyncio.run(airtable.get_items_airtable(CREDENTIALS))
+
+    assert upstream.calls['airtable 429'] == 2
+    assert sum(1 for item in items if item.type == 'Table' and item.parent_id == 'app1_Base') == 3
+
+
+def test_failed_table_listing_fails_the_crawl(fake_redis, fake_upstream):
+    upstream = fake_upstream(FailingAirtableUpstream('/v0/meta/bases/app1/tables', 429))
+
+    with pytest.raises(HTTPException) as failed:
+        asyncio.run(airtable.get_items_airtable(CREDENTIALS))
+
+    assert failed.value.status_code == 429
+    assert upstream.calls['airtable 429'] == airtable.MAX_RATE_LIMIT_RETRIES + 1
+
+
+def test_failed_base_listing_fails_the_crawl(fake_redis, fake_upstream):
+    fake_upstream(FailingAirtableUpstream('/v0/meta/bases', 500))
+
+    with pytest.raises(HTTPException) as failed:
+        asyncio.run(airtable.get_items_airtable(CREDENTIALS))
+
+    assert failed.value.status_code == 500
+
+
+def test_failed_record_page_fails_the_crawl(fake_redis, fake_upstream):
+    fake_upstream(FailingAirtableUpstream('/v0/app0/tblapp01', 403))
+
+    with pytest.raises(HTTPException) as failed:
+        asyncio.run(airtable.get_items_airtable(CREDENTIALS, include_records=True))
+
+    assert failed.value.status_code == 403
+
+
+def test_concurrent_crawls_share_table_listings(fake_redis, fake_upstream):
+    from integrations import webhooks
+
+    upstream = fake_upstream(FakeUpstream(latency_ms=0, airtable_bases=2))
+    credentials = [json.dumps({'access_token': f'token-{n}'}) for n in range(5)]
+
+    async def run():
+        await asyncio.gather(*(airtable.get_items_airtable(user_credentials) for user_credentials in credentials))
+        listed = upstream.calls['airtable tables']
+        # A notification for a base may be a schema change, so its listing is fetched again
+        await webhooks.apply_webhook_event({'provider': 'airtable', 'account_id': 'app0', 'event': {}})
+        await airtable.get_items_airtable(credentials[0])
+        return listed, upstream.calls['airtable tables']
+
+    assert asyncio.run(run()) == (2, 3)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from fake_upstream import FakeUpstream
+from integrations.checkpoints import CrawlCheckpoint, clear_checkpoints, list_checkpoints, paginate_with_checkpoint
+
+PAGES = {None: (['a', 'b'], 'page2'), 'page2': (['c', 'd'], 'page3'), 'page3': (['e'], None)}
+NEVER = object()
+
+
+class Upstream:
+    """Cursor-paginated source that can fail on one cursor, recording every page requested"""
+
+    def __init__(self, fail_on=NEVER):
+        self.fail_on = fail_on
+        self.requested = []
+
+    async def fetch_page(self, cursor):
+        self.requested.append(cursor)
+        if cursor == self.fail_on:
+            raise RuntimeError(f'upstream failed on {cursor}')
+        return PAGES[cursor]
+
+
+def checkpoint(resume=False):
+    return CrawlCheckpoint('org', 'airtable', 'token', 'records:tbl1', {'include_records': True}, resume)
+
+
+async def crawl(upstream, resume=False):
+    return [item async for page in paginate_with_checkpoint(checkpoint(resume), upstream.fetch_page) for item in page]
+
+
+async def interrupted_crawl():
+    with pytest.raises(RuntimeError):
+        await crawl(Upstream(fail_on='page3'))
+
+
+def test_resume_replays_stored_pages_and_continues(fake_redis):
+    async def run():
+        await interrupted_crawl()
+        upstream = Upstream()
+        return await crawl(upstream, resume=True), upstream.requested, await checkpoint().load()
+
+    items, requested, state = asyncio.run(run())
+    assert items == ['a', 'b', 'c', 'd', 'e']
+    assert requested == ['page3']
+    # Finished: the checkpoint is cleared
+    assert state is None
+
+
+def test_new_crawl_discards_stored_pages(fake_redis):
+    async def run():
+        await interrupted_crawl()
+        upstream = Upstream(fail_on='page3')
+        with pytest.raises(RuntimeError):
+            await crawl(upstream)
+        stored = [page async for page in checkpoint().iter_pages()]
+        return upstream.requested, stored, await checkpoint().load()
+
+    requested, stored, state = asyncio.run(run())
+    # Fetched fresh from page one rather than replaying the old crawl
+    assert requested == [None, 'page2', 'page3']
+    # The old pages were dropped, so the stored pages and count describe only this crawl
+    assert stored == [['a', 'b'], ['c', 'd']]
+    assert state['pages'] == 2
+
+
+def test_crawl_runs_without_a_checkpoint_another_crawl_holds(fake_redis):
+    async def run():
+        holder = checkpoint()
+        assert await holder.acquire()
+        upstream = Upstream()
+        items = await crawl(upstream, resume=True)
+        stored = [page async for page in holder.iter_pages()]
+        await holder.release()
+        return items, upstream.requested, stored
+
+    items, requested, stored = asyncio.run(run())
+    assert items == ['a', 'b', 'c', 'd', 'e']
+    assert requested == [None, 'page2', 'page3']
+    assert stored == []
+
+
+def test_clear_skips_running_crawls(fake_redis):
+    async def run():
+        await interrupted_crawl()
+        other = CrawlCheckpoint('org', 'hubspot', 'token', 'contacts:abc', {})
+        await other.save_page(['x'], 'next', 1)
+
+        running = checkpoint()
+        assert await running.acquire()
+        listed = {entry['provider']: entry['running'] for entry in await list_checkpoints('org')}
+        cleared = await clear_checkpoints('org')
+        airtable_state = await running.load()
+        hubspot_state = await other.load()
+        await running.release()
+        return listed, cleared, airtable_state, hubspot_state
+
+    listed, cleared, airtable_state, hubspot_state = asyncio.run(run())
+    assert listed == {'airtable': True, 'hubspot': False}
+    assert cleared == 1
+    assert airtable_state is not None
+    assert hubspot_state is None
+
+
+class PagedRecordsUpstream(FakeUpstream):
+    """Airtable serving each table's records in two pages; second pages fail while failing is set"""
+
+    failing = True
+
+    def _airtable(self, request, path):
+        if path.startswith('/v0/meta/'):
+            return super()._airtable(request, path)
+        offset = request.url.params.get('offset')
+        self._count(f'airtable records {offset or "first"}')
+        if offset is None:
+            return httpx.Response(200, json={'records': [{'id': 'rec1', 'fields': {}}], 'offset': 'second'})
+        if self.failing:
+            return httpx.Response(500, json={'error': 'boom'})
+        return httpx.Response(200, json={'records': [{'id': 'rec2', 'fields': {}}]})
+
+
+def test_resume_endpoint_continues_interrupted_crawls(fake_redis, fake_upstream, monkeypatch):
+    import main
+    from integrations import airtable
+
+    monkeypatch.setattr(airtable, 'base_rate_limiters', {})
+    upstream = fake_upstream(PagedRecordsUpstream(latency_ms=0, airtable_bases=1, airtable_tables_per_base=2))
+    credentials = json.dumps({'access_token': 'token'})
+
+    async def run():
+        crawl_fn, key_parts = main.provider_load('airtable', 'org', credentials, {'include_records': True})
+        with pytest.raises(Exception):
+            await main.load_snapshot_cached('airtable', 'org', crawl_fn, *key_parts)
+        interrupted = await list_checkpoints('org')
+        first_pages = upstream.calls['airtable records first']
+
+        upstream.failing = False
+        result = await main.resume_crawl_integration('airtable', credentials, 'org')
+        return interrupted, first_pages, upstream.calls['airtable records first'], result
+
+    interrupted, first_pages_before, first_pages_after, result = asyncio.run(run())
+    assert len(interrupted) == 2
+    assert result['errors'] == []
+    assert result['remaining'] == []
+    assert sorted(result['resumed']) == sorted(entry['object_type'] for entry in interrupted)
+    # Records + tables + bases: 1 base, 2 tables, 2 records per table
+    assert result['total'] == 1 + 2 + 4
+    # Resumed tables replay their stored first page instead of fetching it again
+    assert first_pages_after == first_pages_before
@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet  # noqa: E402
+
+from columnar_export import iter_items_file, write_item_stream  # noqa: E402
+from snapshots import SnapshotWriter, iter_snapshot_items  # noqa: E402
+
+
+def make_item(i):
+    return {
+        'id': f'{i}_Record',
+        'name': f'Record {i}',
+        'type': 'Record',
+        'creation_time': '2024-01-01T00:00:00+00:00',
+        'api_response': {'id': f'rec{i}', 'fields': {'count': i, 'ratio': i / 2, 'big': 2 ** 70 if i == 3 else i}},
+    }
+
+
+class CountingSource:
+    """An item source that counts how often it is opened"""
+
+    def __init__(self, total):
+        self.total = total
+        self.opened = 0
+
+    def __call__(self):
+        self.opened += 1
+        return self._iter()
+
+    async def _iter(self):
+        for i in range(self.total):
+            yield make_item(i)
+
+
+def test_flatten_reads_the_stream_twice_and_types_columns(tmp_path):
+    source = CountingSource(25)
+    output = tmp_path / 'items.parquet'
+
+    count = asyncio.run(write_item_stream(source, str(output), 'parquet', flatten=True, batch_size=10))
+
+    table = pa.parquet.read_table(output)
+    assert count == table.num_rows == 25
+    assert source.opened == 2
+    assert table.schema.field('api_response.fields.count').type == pa.int64()
+    assert table.schema.field('api_response.fields.ratio').type == pa.float64()
+    # One value beyond int64 keeps the whole column as exact strings
+    assert table.schema.field('api_response.fields.big').type == pa.string()
+    assert table.column('api_response.fields.big').to_pylist()[3] == str(2 ** 70)
+
+
+def test_without_flatten_the_stream_is_read_once(tmp_path):
+    source = CountingSource(5)
+
+    count = asyncio.run(write_item_stream(source, str(tmp_path / 'items.arrow'), 'arrow', batch_size=2))
+
+    assert count == 5
+    assert source.opened == 1
+
+
+def test_empty_export_keeps_its_schema(tmp_path):
+    output = tmp_path / 'empty.parquet'
+
+    assert asyncio.run(write_item_stream(CountingSource(0), str(output), 'parquet', columns=['id', 'name'])) == 0
+    assert pa.parquet.read_table(output).schema.names == ['id', 'name']
+
+
+def test_snapshot_is_exported_chunk_by_chunk(fake_redis, tmp_path):
+    output = tmp_path / 'snapshot.parquet'
+
+    async def run():
+        writer = SnapshotWriter(chunk_size=4)
+        for i in range(10):
+            await writer.add(make_item(i))
+        snapshot = await writer.close()
+
+        async def open_items():
+            async for _, item in iter_snapshot_items(snapshot):
+                yield item
+
+        return await write_item_stream(open_items, str(output), 'parquet', flatten=True, batch_size=3)
+
+    assert asyncio.run(run()) == 10
+    assert pa.parquet.read_table(output).column('id').to_pylist() == [f'{i}_Record' for i in range(10)]
+
+
+@pytest.mark.parametrize('layout', ['ndjson', 'page', 'pretty'])
+def test_items_file_layouts(tmp_path, layout):
+    items = [make_item(i) for i in range(3)]
+    path = tmp_path / 'items.json'
+    if layout == 'ndjson':
+        lines = [json.dumps({'provider': 'airtable', 'item': item}) for item in items] + [json.dumps({'providers': {}})]
+        path.write_text('\n'.join(lines) + '\n')
+    elif layout == 'page':
+        path.write_text(json.dumps({'items': items, 'next_cursor': None}))
+    else:
+        path.write_text(json.dumps(items, indent=2))
+
+    async def read():
+        return [item async for item in iter_items_file(str(path))]
+
+    assert asyncio.run(read()) == items
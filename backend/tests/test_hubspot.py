@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from fake_upstream import FakeUpstream
+from integrations import hubspot
+
+CREDENTIALS = json.dumps({'access_token': 'token'})
+
+
+class ThrottledDealsUpstream(FakeUpstream):
+    """HubSpot answering 429 for every deals page"""
+
+    def _hubspot(self, request, path):
+        if path == '/crm/v3/objects/deals':
+            return httpx.Response(429, json={'message': 'You have reached your secondly limit'})
+        return super()._hubspot(request, path)
+
+
+def test_failed_object_type_fails_the_crawl(fake_redis, fake_upstream):
+    fake_upstream(ThrottledDealsUpstream(latency_ms=0, hubspot_objects_per_type=150))
+
+    async def run():
+        with pytest.raises(HTTPException) as failed:
+            await hubspot.get_items_hubspot(CREDENTIALS)
+        return failed.value, await fake_redis.get(hubspot._object_count_key(1234, 'deals'))
+
+    error, deals_count = asyncio.run(run())
+    assert error.status_code == 500
+    assert 'Failed to fetch deals' in error.detail
+    # The count from HubSpot's search stands; the failed crawl must not overwrite it with what it managed to fetch
+    assert deals_count == b'150'
+
+
+def test_successful_crawl_records_object_counts(fake_redis, fake_upstream):
+    fake_upstream(FakeUpstream(latency_ms=0, hubspot_objects_per_type=150))
+
+    async def run():
+        items = await hubspot.get_items_hubspot(CREDENTIALS, object_types=['contacts', 'deals'])
+        return items, await fake_redis.get(hubspot._object_count_key(1234, 'deals'))
+
+    items, deals_count = asyncio.run(run())
+    assert len(items) == 300
+    assert deals_count == b'150'
@@ -0,0 +1,79 @@
+import asyncio
+import itertools
+
+from integrations.outbound import AdaptiveConcurrencyLimiter, is_overloaded, route_class
+
+
+def simulate(limiter, routes, workers=40, requests_per_worker=100, overloaded=lambda: False):
+    """
+    Drive the limiter like a healthy provider whose latency depends only on the endpoint, not on load.
+    Latencies are reported rather than slept, so the simulation runs instantly.
+    """
+    calls = itertools.cycle(routes)
+
+    async def worker():
+        for _ in range(requests_per_worker):
+            await limiter.acquire()
+            route, latency = next(calls)
+            await asyncio.sleep(0)
+            limiter.release(latency, overloaded=overloaded(), route=route)
+
+    async def run():
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+    asyncio.run(run())
+
+
+def test_mixed_endpoint_latencies_do_not_collapse_the_limit():
+    limiter = AdaptiveConcurrencyLimiter('hubspot', 10)
+    simulate(limiter, [('GET /crm/v3/properties/contacts', 0.02), ('POST /crm/v3/objects/contacts/search', 0.1)])
+
+    assert limiter.decreases == 0
+    assert limiter.limit > 10
+
+
+def test_widely_mixed_latencies_do_not_collapse_the_limit():
+    limiter = AdaptiveConcurrencyLimiter('hubspot', 10)
+    simulate(limiter, [('GET /oauth/v1/access-tokens/*', 0.01), ('GET /crm/v3/objects/deals', 0.05)])
+
+    assert limiter.decreases == 0
+    assert limiter.limit > 10
+
+
+def test_throttling_backs_off():
+    limiter = AdaptiveConcurrencyLimiter('airtable', 10)
+    # Decreases are paced by the smoothed latency, so report none to count every 429
+    limiter.smoothed_latency = 0
+    for _ in range(3):
+        limiter.in_flight += 1
+        limiter.release(overloaded=True)
+
+    assert limiter.throttled == 3
+    assert limiter.limit < 10 * 0.7 * 0.7 + 0.01
+
+
+def test_slow_route_holds_the_limit():
+    limiter = AdaptiveConcurrencyLimiter('notion', 4)
+    limiter.in_flight = 4
+    limiter.release(0.01, route='POST /v1/search')
+    grown = limiter.limit
+    for _ in range(20):
+        limiter.in_flight = 4
+        limiter.release(1.0, route='POST /v1/search')
+
+    assert limiter.limit == grown
+    assert limiter.decreases == 0
+
+
+def test_overload_statuses():
+    assert is_overloaded(429)
+    assert is_overloaded(500)
+    assert is_overloaded(503)
+    assert not is_overloaded(404)
+    assert not is_overloaded(200)
+
+
+def test_route_class_masks_ids():
+    assert route_class('GET', 'https://api.airtable.com/v0/app123/tbl456?offset=x') == 'GET /v0/*/*'
+    assert route_class('GET', 'https://api.airtable.com/v0/meta/bases/app1/tables') == 'GET /v0/meta/bases/*/tables'
+    assert route_class('POST', 'https://api.hubapi.com/crm/v3/objects/contacts/search') == 'POST /crm/v3/objects/contacts/search'
@@ -0,0 +1,123 @@
+import asyncio
+
+from scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE, CrawlScheduler
+
+
+async def hold(scheduler, tenant, priority, started, release):
+    async with scheduler.slot(tenant, priority):
+        started.append((tenant, priority))
+        await release.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_interactive_runs_while_a_tenant_saturates_its_bulk_share():
+    async def run():
+        scheduler = CrawlScheduler(global_limit=16, tenant_limit=4, interactive_reserve=4, tenant_interactive_reserve=1)
+        started, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(scheduler, 'org', PRIORITY_BULK, started, release)) for _ in range(4)]
+        await settle()
+        bulk_running = len(started)
+
+        search = asyncio.create_task(hold(scheduler, 'org', PRIORITY_INTERACTIVE, started, release))
+        await settle()
+        search_started = ('org', PRIORITY_INTERACTIVE) in started
+
+        release.set()
+        await asyncio.gather(*tasks, search)
+        return bulk_running, search_started
+
+    bulk_running, search_started = asyncio.run(run())
+    # Bulk stops one short of the tenant cap, leaving the reserved slot to the search
+    assert bulk_running == 3
+    assert search_started
+
+
+def test_interactive_runs_while_bulk_saturates_the_global_share():
+    async def run():
+        scheduler = CrawlScheduler(global_limit=8, tenant_limit=4, interactive_reserve=2, tenant_interactive_reserve=1)
+        started, release = [], asyncio.Event()
+        tasks = [
+            asyncio.create_task(hold(scheduler, f'org{i % 4}', PRIORITY_BULK, started, release))
+            for i in range(12)
+        ]
+        await settle()
+        bulk_running = scheduler.running
+
+        # A tenant with nothing running still finds reserved global capacity
+        search = asyncio.create_task(hold(scheduler, 'quiet org', PRIORITY_INTERACTIVE, started, release))
+        await settle()
+        search_started = ('quiet org', PRIORITY_INTERACTIVE) in started
+
+        release.set()
+        await asyncio.gather(*tasks, search)
+        return bulk_running, search_started
+
+    bulk_running, search_started = asyncio.run(run())
+    assert bulk_running == 6
+    assert search_started
+
+
+def test_freed_slot_goes_to_interactive_before_bulk():
+    async def run():
+        scheduler = CrawlScheduler(global_limit=1, tenant_limit=1)
+        order = []
+        first_release = asyncio.Event()
+        release = asyncio.Event()
+        release.set()
+
+        first = asyncio.create_task(hold(scheduler, 'org', PRIORITY_BULK, order, first_release))
+        await settle()
+        bulk = asyncio.create_task(hold(scheduler, 'org', PRIORITY_BULK, order, release))
+        search = asyncio.create_task(hold(scheduler, 'org', PRIORITY_INTERACTIVE, order, release))
+        await settle()
+        first_release.set()
+        await asyncio.gather(first, bulk, search)
+        return order
+
+    assert asyncio.run(run()) == [('org', PRIORITY_BULK), ('org', PRIORITY_INTERACTIVE), ('org', PRIORITY_BULK)]
+
+
+def test_slots_are_shared_round_robin_across_tenants():
+    async def run():
+        scheduler = CrawlScheduler(global_limit=1, tenant_limit=1)
+        order = []
+        release = asyncio.Event()
+        release.set()
+        gate = asyncio.Event()
+
+        blocker = asyncio.create_task(hold(scheduler, 'blocker', PRIORITY_BULK, [], gate))
+        await settle()
+        # A busy tenant queues many crawls before a second tenant queues one
+        tasks = [asyncio.create_task(hold(scheduler, 'busy', PRIORITY_BULK, order, release)) for _ in range(3)]
+        await settle()
+        tasks.append(asyncio.create_task(hold(scheduler, 'light', PRIORITY_BULK, order, release)))
+        await settle()
+        gate.set()
+        await asyncio.gather(blocker, *tasks)
+        return [tenant for tenant, _ in order]
+
+    order = asyncio.run(run())
+    assert order.index('light') <= 1
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def run():
+        scheduler = CrawlScheduler(global_limit=1, tenant_limit=1)
+        started, release = [], asyncio.Event()
+        running = asyncio.create_task(hold(scheduler, 'org', PRIORITY_BULK, started, release))
+        await settle()
+        waiting = asyncio.create_task(hold(scheduler, 'org', PRIORITY_BULK, started, release))
+        await settle()
+        waiting.cancel()
+        release.set()
+        await running
+        await asyncio.gather(waiting, return_exceptions=True)
+        return scheduler.metrics()
+
+    metrics = asyncio.run(run())
+    assert metrics['running'] == 0
+    assert metrics['queued'] == 0
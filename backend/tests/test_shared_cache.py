@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+import shared_cache
+from shared_cache import _load_shared, _lock_key, get_or_load, invalidate, local_cache, make_cache_key
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(fake_redis):
+    local_cache.entries.clear()
+    shared_cache._inflight.clear()
+    yield
+    local_cache.entries.clear()
+    shared_cache._inflight.clear()
+
+
+def counting_loader(delay=0.05, value='value'):
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return {'value': value, 'call': len(calls)}
+
+    return loader, calls
+
+
+def test_concurrent_callers_share_one_load():
+    loader, calls = counting_loader()
+    key = make_cache_key('test', 'concurrent')
+
+    async def run():
+        return await asyncio.gather(*(get_or_load(key, loader) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == {'value': 'value', 'call': 1} for result in results)
+
+
+def test_replicas_share_one_load():
+    # _load_shared is the cross-replica path: each call stands for another replica with its own process cache
+    loader, calls = counting_loader()
+    key = make_cache_key('test', 'replicas')
+
+    async def run():
+        return await asyncio.gather(*(_load_shared(key, loader, 60) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert len({result['call'] for result in results}) == 1
+
+
+def test_cancelled_leader_leaves_the_load_running_for_others():
+    loader, calls = counting_loader(delay=0.1)
+    key = make_cache_key('test', 'cancelled leader')
+
+    async def run():
+        leader = asyncio.create_task(get_or_load(key, loader))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(get_or_load(key, loader))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == {'value': 'value', 'call': 1}
+    assert len(calls) == 1
+
+
+def test_last_cancelled_caller_stops_the_load_and_releases_the_lock(fake_redis):
+    loader, calls = counting_loader(delay=1)
+    key = make_cache_key('test', 'abandoned')
+
+    async def run():
+        caller = asyncio.create_task(get_or_load(key, loader))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0.05)
+        return await fake_redis.get(_lock_key(key))
+
+    assert asyncio.run(run()) is None
+    assert key not in shared_cache._inflight
+
+
+def test_lock_is_renewed_for_loads_longer_than_its_ttl(monkeypatch):
+    monkeypatch.setattr(shared_cache, 'LOCK_TTL_MS', 150)
+    monkeypatch.setattr(shared_cache, 'LOCK_POLL_SECONDS', 0.02)
+    loader, calls = counting_loader(delay=0.6)
+    key = make_cache_key('test', 'long load')
+
+    async def run():
+        first = asyncio.create_task(_load_shared(key, loader, 60))
+        await asyncio.sleep(0.01)
+        # Arrives while the first load is held far past LOCK_TTL_MS; it must wait rather than load again
+        second = asyncio.create_task(_load_shared(key, loader, 60))
+        return await asyncio.gather(first, second)
+
+    first, second = asyncio.run(run())
+    assert len(calls) == 1
+    assert first == second
+
+
+def test_lapsed_lock_of_a_dead_replica_is_taken_over(fake_redis, monkeypatch):
+    monkeypatch.setattr(shared_cache, 'LOCK_POLL_SECONDS', 0.02)
+    loader, calls = counting_loader(delay=0)
+    key = make_cache_key('test', 'dead replica')
+
+    async def run():
+        # A replica died holding the lock: nobody renews it, so it lapses after its TTL
+        await fake_redis.set(_lock_key(key), 'dead replica', px=200)
+        return await _load_shared(key, loader, 60)
+
+    assert asyncio.run(run()) == {'value': 'value', 'call': 1}
+    assert len(calls) == 1
+
+
+def test_invalidate_forces_a_new_load():
+    loader, calls = counting_loader(delay=0)
+    key = make_cache_key('test', 'invalidate')
+
+    async def run():
+        await get_or_load(key, loader)
+        await invalidate(key)
+        return await get_or_load(key, loader)
+
+    assert asyncio.run(run()) == {'value': 'value', 'call': 2}
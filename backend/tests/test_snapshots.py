@@ -0,0 +1,136 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import main
+from integrations.checkpoints import account_fingerprint
+from integrations.pagination import decode_cursor
+from shared_cache import invalidate, make_cache_key
+from snapshots import SnapshotWriter, overlay_key, read_snapshot_items, record_overlay_change
+
+CREDENTIALS = json.dumps({'access_token': 'token'})
+OTHER_CREDENTIALS = json.dumps({'access_token': 'other token'})
+ITEMS = [{'id': f'item-{n}', 'type': 'Item'} for n in range(10)]
+
+
+def items_request(cursor, access_token=None, etag=None) -> Request:
+    headers = {}
+    if access_token:
+        headers['authorization'] = f'Bearer {access_token}'
+    if etag:
+        headers['if-none-match'] = etag
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    scope = {
+        'type': 'http',
+        'method': 'GET',
+        'scheme': 'http',
+        'server': ('testserver', 80),
+        'path': '/integrations/items',
+        'query_string': f'cursor={cursor}'.encode('utf-8'),
+        'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()],
+    }
+    return Request(scope, receive)
+
+
+async def first_page(credentials=CREDENTIALS, items=ITEMS):
+    async def crawl():
+        return items
+
+    return await main.load_items_page('notion', None, crawl, (credentials, {}), 4, None, None, None, None)
+
+
+async def write(items, account='account'):
+    writer = SnapshotWriter(account, chunk_size=4)
+    for item in items:
+        await writer.add(item)
+    return await writer.close()
+
+
+def test_identical_crawls_get_the_same_snapshot_id(fake_redis):
+    async def run():
+        first = await write(ITEMS)
+        again = await write(ITEMS)
+        changed = await write(ITEMS[:-1] + [{'id': 'item-9', 'type': 'Item', 'name': 'renamed'}])
+        other_account = await write(ITEMS, account='other account')
+        return first, again, changed, other_account, await read_snapshot_items(first)
+
+    first, again, changed, other_account, items = asyncio.run(run())
+    assert first['id'] == again['id']
+    assert first['data'] != again['data']
+    assert changed['id'] != first['id']
+    assert other_account['id'] != first['id']
+    assert items == ITEMS
+
+
+def test_identical_recrawl_keeps_cursors_and_etags(fake_redis):
+    async def run():
+        page = await first_page()
+        cursor = page['next_cursor']
+        response = await main.get_items_page(items_request(cursor, 'token'), cursor, limit=4)
+
+        # The cache entry expired and the crawl ran again, finding the same data
+        await invalidate(make_cache_key('load:notion', CREDENTIALS, {}))
+        recrawled = await first_page()
+        revalidated = await main.get_items_page(
+            items_request(recrawled['next_cursor'], 'token', response.headers['etag']), recrawled['next_cursor'], limit=4
+        )
+        return cursor, recrawled['next_cursor'], response, revalidated
+
+    cursor, recrawled_cursor, response, revalidated = asyncio.run(run())
+    assert recrawled_cursor == cursor
+    assert response.status_code == 200
+    assert response.headers['vary'] == 'Authorization'
+    assert [item['id'] for item in json.loads(response.body)['items']] == ['item-4', 'item-5', 'item-6', 'item-7']
+    assert revalidated.status_code == 304
+
+
+def test_cursor_is_rejected_for_another_account(fake_redis):
+    async def run():
+        cursor = (await first_page())['next_cursor']
+        errors = []
+        for access_token in ('other token', None):
+            with pytest.raises(HTTPException) as error:
+                await main.get_items_page(items_request(cursor, access_token), cursor, limit=4)
+            errors.append(error.value.status_code)
+        with pytest.raises(HTTPException) as error:
+            await main.load_items_page('notion', None, None, (OTHER_CREDENTIALS, {}), 4, cursor, None, None, None)
+        errors.append(error.value.status_code)
+        own = await main.load_items_page('notion', None, None, (CREDENTIALS, {}), 4, cursor, None, None, None)
+        return cursor, errors, own
+
+    cursor, errors, own = asyncio.run(run())
+    assert errors == [403, 401, 403]
+    assert decode_cursor(own['next_cursor'])[1] == 8
+
+
+def test_snapshot_is_bound_to_the_credentials_account(fake_redis):
+    async def run():
+        page = await first_page()
+        snapshot_id, _ = decode_cursor(page['next_cursor'])
+        return await main.get_snapshot(snapshot_id)
+
+    assert asyncio.run(run())['account'] == account_fingerprint('token')
+
+
+def test_webhook_changes_move_the_etag(fake_redis):
+    credentials = json.dumps({'access_token': 'token', 'workspace_id': 'ws-1'})
+
+    async def run():
+        cursor = (await first_page(credentials))['next_cursor']
+        before = await main.get_items_page(items_request(cursor, 'token'), cursor, limit=4)
+        renamed = {'id': 'item-5', 'type': 'Item', 'name': 'renamed'}
+        await record_overlay_change(overlay_key('notion', 'ws-1'), 'item-5', 'Item', renamed, at=time.time())
+        after = await main.get_items_page(items_request(cursor, 'token', before.headers['etag']), cursor, limit=4)
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert after.status_code == 200
+    assert after.headers['etag'] != before.headers['etag']
+    assert json.loads(after.body)['items'][1] == {'id': 'item-5', 'type': 'Item', 'name': 'renamed'}
@@ -0,0 +1,325 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import re
+import time
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import main
+from fake_upstream import FakeUpstream
+from integrations import webhooks
+from integrations.registry import get_connector
+from shared_cache import get_or_load, make_cache_key
+from snapshots import SnapshotOverlay, get_overlay, overlay_key, record_overlay_change
+
+NOTION_TOKEN = 'secret_notion_verification_token'
+CREDENTIALS = json.dumps({'access_token': 'token'})
+AIRTABLE_MAC_SECRET = base64.b64encode(b'airtable mac secret').decode('utf-8')
+
+
+def make_request(body: bytes, headers: dict = None, path: str = '/webhooks/notion') -> Request:
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    scope = {
+        'type': 'http',
+        'method': 'POST',
+        'scheme': 'http',
+        'server': ('testserver', 80),
+        'path': path,
+        'query_string': b'',
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in (headers or {}).items()],
+    }
+    return Request(scope, receive)
+
+
+def hubspot_signature(method, url, body, timestamp):
+    source = f'{method}{url}{body.decode("utf-8")}{timestamp}'.encode('utf-8')
+    secret = get_connector('hubspot').CLIENT_SECRET.encode('utf-8')
+    return base64.b64encode(hmac.new(secret, source, hashlib.sha256).digest()).decode('utf-8')
+
+
+def notion_signature(body, token=NOTION_TOKEN):
+    return 'sha256=' + hmac.new(token.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+# Signatures
+
+def test_hubspot_signature_accepts_valid_and_rejects_tampering():
+    url = 'https://example.com/webhooks/hubspot'
+    body = b'[{"eventId": 1}]'
+    timestamp = str(int(time.time() * 1000))
+    signature = hubspot_signature('POST', url, body, timestamp)
+
+    assert webhooks.verify_hubspot_signature('POST', url, body, signature, timestamp)
+    assert not webhooks.verify_hubspot_signature('POST', url, b'[{"eventId": 2}]', signature, timestamp)
+    assert not webhooks.verify_hubspot_signature('POST', url, body, None, timestamp)
+    assert not webhooks.verify_hubspot_signature('POST', url, body, signature, 'not a timestamp')
+
+
+def test_hubspot_signature_rejects_stale_timestamp():
+    url = 'https://example.com/webhooks/hubspot'
+    body = b'[]'
+    timestamp = str(int(time.time() * 1000) - webhooks.HUBSPOT_MAX_TIMESTAMP_SKEW_MS - 1000)
+
+    assert not webhooks.verify_hubspot_signature('POST', url, body, hubspot_signature('POST', url, body, timestamp), timestamp)
+
+
+def test_notion_signature():
+    body = b'{"id": "evt"}'
+
+    assert webhooks.verify_notion_signature(body, notion_signature(body), NOTION_TOKEN)
+    assert not webhooks.verify_notion_signature(body, notion_signature(body, 'other token'), NOTION_TOKEN)
+    assert not webhooks.verify_notion_signature(body, notion_signature(body), None)
+
+
+def test_airtable_signature():
+    body = b'{"base": {"id": "app1"}}'
+    signature = 'hmac-sha256=' + hmac.new(base64.b64decode(AIRTABLE_MAC_SECRET), body, hashlib.sha256).hexdigest()
+
+    assert webhooks.verify_airtable_signature(body, signature, AIRTABLE_MAC_SECRET)
+    assert not webhooks.verify_airtable_signature(body + b' ', signature, AIRTABLE_MAC_SECRET)
+    assert not webhooks.verify_airtable_signature(body, signature, '')
+
+
+# Deduplication
+
+def test_duplicate_events_are_queued_once(fake_redis):
+    async def run():
+        events = [('evt-1', '1234', {'eventId': 'evt-1'}), ('evt-2', '1234', {'eventId': 'evt-2'})]
+        first = await webhooks._enqueue_events('hubspot', events)
+        redelivered = await webhooks._enqueue_events('hubspot', events[:1])
+        return first, redelivered, await fake_redis.llen(webhooks.WEBHOOK_QUEUE_KEY)
+
+    first, redelivered, queued = asyncio.run(run())
+    assert first == {'accepted': 2, 'duplicates': 0}
+    assert redelivered == {'accepted': 0, 'duplicates': 1}
+    assert queued == 2
+
+
+def test_same_event_id_from_another_provider_is_not_a_duplicate(fake_redis):
+    async def run():
+        await webhooks._enqueue_events('hubspot', [('evt-1', '1234', {})])
+        return await webhooks._enqueue_events('notion', [('evt-1', 'workspace', {})])
+
+    assert asyncio.run(run()) == {'accepted': 1, 'duplicates': 0}
+
+
+# Notion verification token
+
+def test_notion_verification_token_is_stored_once(fake_redis, monkeypatch):
+    monkeypatch.delenv('NOTION_WEBHOOK_VERIFICATION_TOKEN', raising=False)
+
+    async def run():
+        first = await webhooks.receive_notion_webhook(make_request(json.dumps({'verification_token': NOTION_TOKEN}).encode()))
+        with pytest.raises(HTTPException) as replaced:
+            await webhooks.receive_notion_webhook(make_request(json.dumps({'verification_token': 'attacker'}).encode()))
+        return first, replaced.value.status_code, await fake_redis.get(webhooks.NOTION_VERIFICATION_TOKEN_KEY)
+
+    first, status_code, stored = asyncio.run(run())
+    assert first == {'verified': True}
+    assert status_code == 409
+    assert stored == NOTION_TOKEN.encode('utf-8')
+
+
+def test_notion_verification_token_is_ignored_when_configured(fake_redis, monkeypatch):
+    monkeypatch.setenv('NOTION_WEBHOOK_VERIFICATION_TOKEN', NOTION_TOKEN)
+
+    async def run():
+        with pytest.raises(HTTPException) as rejected:
+            await webhooks.receive_notion_webhook(make_request(json.dumps({'verification_token': 'attacker'}).encode()))
+        return rejected.value.status_code, await fake_redis.get(webhooks.NOTION_VERIFICATION_TOKEN_KEY)
+
+    assert asyncio.run(run()) == (409, None)
+
+
+def test_notion_event_is_verified_with_configured_token(fake_redis, monkeypatch):
+    monkeypatch.setenv('NOTION_WEBHOOK_VERIFICATION_TOKEN', NOTION_TOKEN)
+    body = json.dumps({'id': 'evt-1', 'type': 'page.content_updated', 'workspace_id': 'ws-1'}).encode()
+
+    async def run():
+        accepted = await webhooks.receive_notion_webhook(make_request(body, {'X-Notion-Signature': notion_signature(body)}))
+        with pytest.raises(HTTPException) as forged:
+            await webhooks.receive_notion_webhook(make_request(body, {'X-Notion-Signature': notion_signature(body, 'attacker')}))
+        return accepted, forged.value.status_code
+
+    assert asyncio.run(run()) == ({'accepted': 1, 'duplicates': 0}, 401)
+
+
+# Invalidation
+
+def test_airtable_event_invalidates_cached_loads_of_its_base(fake_redis):
+    crawls = []
+
+    async def crawl():
+        crawls.append(1)
+        return {'id': f'snapshot-{len(crawls)}'}
+
+    async def run():
+        key = make_cache_key('load:airtable', 'credentials', {})
+        other_key = make_cache_key('load:airtable', 'other credentials', {})
+        await webhooks.watch_accounts('airtable', {'app1'}, key, CREDENTIALS)
+        await webhooks.watch_accounts('airtable', {'app2'}, other_key, CREDENTIALS)
+        await get_or_load(key, crawl)
+        await get_or_load(other_key, crawl)
+
+        await webhooks.apply_webhook_event({'provider': 'airtable', 'account_id': 'app1', 'event': {}})
+        reloaded = await get_or_load(key, crawl)
+        untouched = await get_or_load(other_key, crawl)
+        return reloaded, untouched
+
+    reloaded, untouched = asyncio.run(run())
+    assert reloaded == {'id': 'snapshot-3'}
+    assert untouched == {'id': 'snapshot-2'}
+    assert len(crawls) == 3
+
+
+# Overlays
+
+class ChangingUpstream(FakeUpstream):
+    """Provider APIs serving single objects by id: HubSpot contact 1 renamed, contact 99 new, contact 2 gone"""
+
+    def route(self, request):
+        match = re.fullmatch(r'/v1/pages/(.+)', request.url.path)
+        if request.url.host == 'api.notion.com' and match:
+            self._count('notion page')
+            if match.group(1) == 'page-404':
+                return httpx.Response(404, json={'message': 'Not found'})
+            page = self._notion_page(match.group(1).removeprefix('page-'))
+            page['properties']['title']['title'][0]['text']['content'] = 'Renamed'
+            return httpx.Response(200, json=page)
+        return super().route(request)
+
+    def _hubspot(self, request, path):
+        match = re.fullmatch(r'/crm/v3/objects/([^/]+)/(\d+)', path)
+        if match:
+            self._count('hubspot object')
+            if match.group(2) == '2':
+                return httpx.Response(404, json={'message': 'Not found'})
+            contact = self._hubspot_object(match.group(1), int(match.group(2)))
+            contact['properties']['firstname'] = 'Renamed'
+            return httpx.Response(200, json=contact)
+        return super()._hubspot(request, path)
+
+
+def now_ms():
+    return int(time.time() * 1000) + 1
+
+
+def hubspot_event(subscription_type, object_id, **event):
+    return {'provider': 'hubspot', 'account_id': '1234', 'event': {
+        'subscriptionType': subscription_type, 'objectId': object_id, 'occurredAt': now_ms(), **event,
+    }}
+
+
+def test_hubspot_events_are_merged_into_cached_snapshots(fake_redis, fake_upstream):
+    upstream = fake_upstream(ChangingUpstream(latency_ms=0, hubspot_objects_per_type=4))
+    options = {'object_types': ['contacts']}
+
+    async def page():
+        load, key_parts = main.provider_load('hubspot', None, CREDENTIALS, options)
+        return await main.load_items_page('hubspot', None, load, key_parts, 50, None, None, None, None)
+
+    async def run():
+        before = await page()
+        await webhooks.apply_webhook_event(hubspot_event('contact.propertyChange', 1))
+        await webhooks.apply_webhook_event(hubspot_event('contact.deletion', 3))
+        await webhooks.apply_webhook_event(hubspot_event('contact.creation', 99))
+        # Deleted again before anyone read it: never appended
+        await webhooks.apply_webhook_event(hubspot_event('contact.creation', 2))
+        return before, await page()
+
+    before, after = asyncio.run(run())
+    assert [item['name'] for item in before['items']] == ['First0 Last0', 'First1 Last1', 'First2 Last2', 'First3 Last3']
+    assert [item['name'] for item in after['items']] == ['First0 Last0', 'Renamed Last1', 'First2 Last2', 'Renamed Last99']
+    assert after['total'] == 4
+    # The cached snapshot served both pages; only the changed objects were fetched
+    assert upstream.calls['hubspot objects'] == 1
+    assert upstream.calls['hubspot object'] == 3
+
+
+def test_notion_events_are_merged_into_cached_snapshots(fake_redis, fake_upstream):
+    fake_upstream(ChangingUpstream(latency_ms=0, notion_pages=3))
+    credentials = json.dumps({'access_token': 'token', 'workspace_id': 'ws-1'})
+
+    def notion_event(event_type, page_id):
+        return {'provider': 'notion', 'account_id': 'ws-1', 'event': {
+            'type': event_type,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'entity': {'id': page_id, 'type': 'page'},
+        }}
+
+    async def page():
+        load, key_parts = main.provider_load('notion', None, credentials, {})
+        return await main.load_items_page('notion', None, load, key_parts, 50, None, 'page', None, None)
+
+    async def run():
+        await page()
+        await webhooks.apply_webhook_event(notion_event('page.content_updated', 'page-0'))
+        await webhooks.apply_webhook_event(notion_event('page.deleted', 'page-1'))
+        # Not shared with the integration, so never part of a crawl
+        await webhooks.apply_webhook_event(notion_event('page.created', 'page-404'))
+        return await page()
+
+    after = asyncio.run(run())
+    assert [item['name'] for item in after['items']] == ['page Renamed', 'page Page 2']
+    assert after['total'] == 2
+
+
+def test_events_of_unwatched_accounts_fetch_nothing(fake_redis, fake_upstream):
+    upstream = fake_upstream(ChangingUpstream(latency_ms=0))
+
+    asyncio.run(webhooks.apply_webhook_event(hubspot_event('contact.propertyChange', 1)))
+    assert 'hubspot object' not in upstream.calls
+
+
+def test_overlay_applies_only_changes_after_the_crawl_started():
+    def entry(item_id, at, item=None, created_at=None):
+        return {'id': item_id, 'type': 'Contact', 'item': item, 'at': at, 'created_at': created_at}
+
+    overlay = SnapshotOverlay([
+        entry('old', 5, {'id': 'old'}),
+        entry('changed', 15, {'id': 'changed'}),
+        entry('deleted', 16),
+        entry('new', 18, {'id': 'new'}, created_at=17),
+        entry('created and deleted', 19, created_at=17),
+        entry('created before the crawl', 20, {'id': 'created before the crawl'}, created_at=5),
+    ], since=10)
+
+    assert set(overlay.changed) == {'changed', 'created before the crawl'}
+    assert overlay.deleted == {'deleted': 'Contact'}
+    assert overlay.created == [{'id': 'new'}]
+    assert overlay.total({'total': 10}) == 10
+    assert SnapshotOverlay([entry('old', 5, {'id': 'old'})], since=10).version == ''
+
+
+def test_older_changes_do_not_overwrite_newer_ones(fake_redis):
+    async def run():
+        key = overlay_key('hubspot', '1234')
+        now = time.time()
+        await record_overlay_change(key, 'item', 'Contact', {'name': 'new'}, at=now)
+        await record_overlay_change(key, 'item', 'Contact', {'name': 'old'}, at=now - 1)
+        return await get_overlay({'total': 0, 'created_at': 0, 'overlays': [key]})
+
+    assert asyncio.run(run()).changed == {'item': {'name': 'new'}}
+
+
+def test_crawl_accounts_collects_airtable_bases():
+    accounts = webhooks.CrawlAccounts('airtable', json.dumps({'access_token': 'token'}))
+    accounts.observe({'id': 'app1_Base', 'type': 'Base'})
+    accounts.observe({'id': 'tbl1_Table', 'type': 'Table'})
+
+    assert asyncio.run(accounts.resolve()) == {'app1'}
+
+
+def test_crawl_accounts_reads_notion_workspace():
+    accounts = webhooks.CrawlAccounts('notion', json.dumps({'access_token': 'token', 'workspace_id': 'ws-1'}))
+
+    assert asyncio.run(accounts.resolve()) == {'ws-1'}
@@ -27,7 +27,7 @@ export const DataForm = ({ integrationType, credentials, hideForTypes = [] }) =>
             const formData = new FormData();
             formData.append('credentials', JSON.stringify(credentials));
             const response = await axios.post(`http://localhost:8001/integrations/${endpoint}/load`, formData);
-            const data = response.data;
+            const data = response.data.items;
             setLoadedData(data);
         } catch (e) {
             alert(e?.response?.data?.detail);
@@ -21,7 +21,7 @@ export const AirtableIntegration = ({ user, org, integrationParams, setIntegrati
     const [searchLoading, setSearchLoading] = useState(false);
 
     // Use shared data hook
-    const { allItems, dataLoading, fetchAllItems, clearData } = useIntegrationData('Airtable', integrationParams?.credentials);
+    const { allItems, dataLoading, fetchAllItems, clearData } = useIntegrationData('Airtable', integrationParams?.credentials, org);
 
     // OAuth Connection Handler
     const handleConnectClick = async () => {
@@ -1,10 +1,14 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 
-export const useIntegrationData = (integrationType, credentials) => {
+const PAGE_SIZE = 200;
+
+export const useIntegrationData = (integrationType, credentials, orgId = null) => {
     const [allItems, setAllItems] = useState([]);
     const [dataLoading, setDataLoading] = useState(false);
     const [initialLoad, setInitialLoad] = useState(true);
+    // Incremented per load so pages from a superseded load are dropped
+    const loadIdRef = useRef(0);
 
     const endpointMapping = {
         'Notion': 'notion',
@@ -19,21 +23,48 @@ export const useIntegrationData = (integrationType, credentials) => {
         const endpoint = endpointMapping[integrationType];
         if (!endpoint) return;
 
+        const loadId = ++loadIdRef.current;
         setDataLoading(true);
+        setAllItems([]);
         try {
-            const formData = new FormData();
-            formData.append('credentials', JSON.stringify(credentialsToUse));
-            const response = await axios.post(`http://localhost:8001/integrations/${endpoint}/load`, formData);
-            setAllItems(response.data);
+            let cursor = null;
+            do {
+                let response;
+                if (cursor) {
+                    // Later pages are plain GETs against the crawl snapshot, so the browser can revalidate them by ETag.
+                    // The cursor only reads the snapshot together with the access token it was issued for.
+                    response = await axios.get('http://localhost:8001/integrations/items', {
+                        params: { cursor, limit: PAGE_SIZE },
+                        headers: { Authorization: `Bearer ${credentialsToUse.access_token}` },
+                    });
+                } else {
+                    const formData = new FormData();
+                    formData.append('credentials', JSON.stringify(credentialsToUse));
+                    formData.append('limit', PAGE_SIZE);
+                    if (orgId) formData.append('org_id', orgId);
+                    response = await axios.post(`http://localhost:8001/integrations/${endpoint}/load`, formData);
+                }
+                if (loadId !== loadIdRef.current) return;
+                // Append each page as it arrives instead of rendering everything at the end
+                const page = response.data.items;
+                setAllItems(prev => prev.concat(page));
+                cursor = response.data.next_cursor;
+            } while (cursor);
             setInitialLoad(false);
         } catch (e) {
-            alert(e?.response?.data?.detail || 'Failed to load data');
+            if (loadId === loadIdRef.current) {
+                alert(e?.response?.data?.detail || 'Failed to load data');
+            }
         } finally {
-            setDataLoading(false);
+            if (loadId === loadIdRef.current) {
+                setDataLoading(false);
+            }
         }
     };
 
     const clearData = () => {
+        loadIdRef.current++;
+        setDataLoading(false);
         setAllItems([]);
     };
 
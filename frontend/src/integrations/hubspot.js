@@ -33,7 +33,7 @@ export const HubspotIntegration = ({ user, org, integrationParams, setIntegratio
     const [searchLoading, setSearchLoading] = useState(false);
 
     // Use shared data hook
-    const { allItems, dataLoading, fetchAllItems, clearData } = useIntegrationData('HubSpot', integrationParams?.credentials);
+    const { allItems, dataLoading, fetchAllItems, clearData } = useIntegrationData('HubSpot', integrationParams?.credentials, org);
 
     // OAuth Connection Handler
     const handleConnectClick = async () => {
@@ -92,6 +92,7 @@ export const HubspotIntegration = ({ user, org, integrationParams, setIntegratio
             formData.append('credentials', JSON.stringify(integrationParams.credentials));
             formData.append('query', searchQuery);
             formData.append('type', searchType);
+            formData.append('org_id', org);
             const response = await axios.post('http://localhost:8001/integrations/hubspot/search', formData);
             setSearchResults(response.data);
         } catch (e) {
@@ -107,9 +108,8 @@ export const HubspotIntegration = ({ user, org, integrationParams, setIntegratio
 
         setSummaryLoading(true);
         try {
-            const formData = new FormData();
-            formData.append('credentials', JSON.stringify(integrationParams.credentials));
-            const response = await axios.post('http://localhost:8001/integrations/hubspot/summary', formData);
+            // GET so the browser can reuse its cached copy of the static summary
+            const response = await axios.get('http://localhost:8001/integrations/hubspot/summary');
             setSummary(response.data);
             setSummaryOpen(true);
         } catch (e) {
@@ -21,7 +21,7 @@ export const NotionIntegration = ({ user, org, integrationParams, setIntegration
     const [searchLoading, setSearchLoading] = useState(false);
 
     // Use shared data hook
-    const { allItems, dataLoading, fetchAllItems, clearData } = useIntegrationData('Notion', integrationParams?.credentials);
+    const { allItems, dataLoading, fetchAllItems, clearData } = useIntegrationData('Notion', integrationParams?.credentials, org);
 
     // OAuth Connection Handler
     const handleConnectClick = async () => {
@@ -1,3 +1,4 @@
+import { useState, useMemo, useCallback } from 'react';
 import {
     Table,
     TableBody,
@@ -12,8 +13,65 @@ import {
     Box
 } from '@mui/material';
 
-export const DataTable = ({ data, loading, emptyMessage = "No data available" }) => {
-    if (loading) {
+const ROW_HEIGHT = 53;
+const TABLE_HEIGHT = 400;
+const OVERSCAN = 10;
+
+// Only stringifies the raw payload once the tooltip is actually opened
+const ApiResponseCell = ({ apiResponse }) => {
+    const [open, setOpen] = useState(false);
+
+    return (
+        <Tooltip
+            open={open}
+            onOpen={() => setOpen(true)}
+            onClose={() => setOpen(false)}
+            title={open ? (
+                <pre style={{ maxWidth: 400, whiteSpace: 'pre-wrap', margin: 0 }}>
+                    {JSON.stringify(apiResponse, null, 2)}
+                </pre>
+            ) : ''}
+            arrow
+            placement="left"
+        >
+            <span style={{ cursor: 'pointer', color: '#1976d2', textDecoration: 'underline' }}>
+                View JSON
+            </span>
+        </Tooltip>
+    );
+};
+
+const DataRow = ({ item }) => (
+    <TableRow hover sx={{ height: ROW_HEIGHT }}>
+        <TableCell>{item.name || '-'}</TableCell>
+        <TableCell>{item.type || '-'}</TableCell>
+        <TableCell>{item.email || '-'}</TableCell>
+        <TableCell>
+            {item.creation_time ? new Date(item.creation_time).toLocaleString() : '-'}
+        </TableCell>
+        <TableCell>
+            <ApiResponseCell apiResponse={item.api_response} />
+        </TableCell>
+    </TableRow>
+);
+
+export const DataTable = ({ data, loading, emptyMessage = "No data available", virtualized = true }) => {
+    const [scrollTop, setScrollTop] = useState(0);
+    const handleScroll = useCallback((e) => setScrollTop(e.currentTarget.scrollTop), []);
+    const rowCount = data ? data.length : 0;
+
+    // Window of rows that intersects the scroll viewport, plus some overscan
+    const { start, end } = useMemo(() => {
+        if (!virtualized) {
+            return { start: 0, end: rowCount };
+        }
+        const first = Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - OVERSCAN);
+        const visible = Math.ceil(TABLE_HEIGHT / ROW_HEIGHT) + OVERSCAN * 2;
+        return { start: first, end: Math.min(rowCount, first + visible) };
+    }, [virtualized, scrollTop, rowCount]);
+
+    // Keep the spinner for the first page only; later pages append in place
+    if (loading && rowCount === 0) {
         return (
             <Box sx={{ width: '100%', mt: 2 }}>
                 <LinearProgress />
@@ -49,45 +107,40 @@ export const DataTable = ({ data, loading, emptyMessage = "No data available" })
     }
 
     return (
-        <TableContainer component={Paper} sx={{ mt: 2, maxHeight: 400, maxWidth: '100%', overflowX: 'auto' }}>
-            <Table stickyHeader>
-                <TableHead>
-                    <TableRow>
-                        <TableCell><strong>NAME</strong></TableCell>
-                        <TableCell><strong>TYPE</strong></TableCell>
-                        <TableCell><strong>EMAIL</strong></TableCell>
-                        <TableCell><strong>CREATED DATE</strong></TableCell>
-                        <TableCell><strong>API RESPONSE</strong></TableCell>
-                    </TableRow>
-                </TableHead>
-                <TableBody>
-                    {data.map((item, idx) => (
-                        <TableRow key={item.id || idx} hover>
-                            <TableCell>{item.name || '-'}</TableCell>
-                            <TableCell>{item.type || '-'}</TableCell>
-                            <TableCell>{item.email || '-'}</TableCell>
-                            <TableCell>
-                                {item.creation_time ? new Date(item.creation_time).toLocaleString() : '-'}
-                            </TableCell>
-                            <TableCell>
-                                <Tooltip
-                                    title={
-                                        <pre style={{ maxWidth: 400, whiteSpace: 'pre-wrap', margin: 0 }}>
-                                            {JSON.stringify(item.api_response, null, 2)}
-                                        </pre>
-                                    }
-                                    arrow
-                                    placement="left"
-                                >
-                                    <span style={{ cursor: 'pointer', color: '#1976d2', textDecoration: 'underline' }}>
-                                        View JSON
-                                    </span>
-                                </Tooltip>
-                            </TableCell>
+        <Box sx={{ mt: 2 }}>
+            <TableContainer
+                component={Paper}
+                onScroll={handleScroll}
+                sx={{ maxHeight: TABLE_HEIGHT, maxWidth: '100%', overflowX: 'auto' }}
+            >
+                <Table stickyHeader>
+                    <TableHead>
+                        <TableRow>
+                            <TableCell><strong>NAME</strong></TableCell>
+                            <TableCell><strong>TYPE</strong></TableCell>
+                            <TableCell><strong>EMAIL</strong></TableCell>
+                            <TableCell><strong>CREATED DATE</strong></TableCell>
+                            <TableCell><strong>API RESPONSE</strong></TableCell>
                         </TableRow>
-                    ))}
-                </TableBody>
-            </Table>
-        </TableContainer>
+                    </TableHead>
+                    <TableBody>
+                        {start > 0 && (
+                            <TableRow style={{ height: start * ROW_HEIGHT }}>
+                                <TableCell colSpan={5} sx={{ p: 0, border: 0 }} />
+                            </TableRow>
+                        )}
+                        {data.slice(start, end).map((item, idx) => (
+                            <DataRow key={item.id || start + idx} item={item} />
+                        ))}
+                        {end < rowCount && (
+                            <TableRow style={{ height: (rowCount - end) * ROW_HEIGHT }}>
+                                <TableCell colSpan={5} sx={{ p: 0, border: 0 }} />
+                            </TableRow>
+                        )}
+                    </TableBody>
+                </Table>
+            </TableContainer>
+            {loading && <LinearProgress />}
+        </Box>
     );
 };